@@ -0,0 +1,367 @@
+import argparse
+import http.client
+import io
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+import inference
+from inference import (
+    IMAGE_SIZE,
+    MODEL_CACHE_ROOT,
+    _tf,
+    _timed,
+    iter_image_paths,
+    load_image_array,
+    probabilities_from_logits,
+)
+from sidecar import DEFAULT_SOCKET, SidecarBackend
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BACKEND INFERENSI (SavedModel / TFLite float16 / TFLite dynamic-range / TFLite int8)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Semua backend punya antarmuka yang sama dengan ServingModel:
+#   backend(batch (N, 64, 64, 3) float32) -> logits (N, num_classes) NumPy
+#   backend.warmup(), backend.name, backend.num_classes
+# Pilih lewat env FRUITSCAN_BACKEND:
+#   savedmodel (default) | tflite-fp16 | tflite-dynamic | tflite-int8 | sidecar | remote | registry | stub
+# Model TFLite dikonversi sekali dari SavedModel lalu disimpan di MODEL_CACHE_ROOT/tflite.
+# Interpreter TFLite me-mmap file flatbuffer tersebut (read-only), jadi beberapa worker
+# yang memuat file yang sama berbagi halaman bobot di page cache OS, bukan menyalinnya.
+# "sidecar" mengirim batch ke satu proses sidecar.py lewat Unix socket (lihat sidecar.py).
+# "remote" memanggil server.py lewat HTTP (FRUITSCAN_REMOTE_URL), dan "stub" adalah model
+# NumPy deterministik tanpa TensorFlow untuk tes (mis. `python server.py --backend stub`).
+# "registry" memuat versi aktif dari model_registry.py dan menukarnya tanpa restart saat
+# versi baru dipublikasikan.
+
+TFLITE_MODES = ["tflite-fp16", "tflite-dynamic", "tflite-int8"]
+BACKEND_NAMES = ["savedmodel", *TFLITE_MODES, "sidecar", "remote", "registry", "stub"]
+DEFAULT_BACKEND = os.environ.get("FRUITSCAN_BACKEND", "savedmodel")
+TFLITE_THREADS = int(os.environ.get("FRUITSCAN_TFLITE_THREADS", str(os.cpu_count() or 1)))
+CALIBRATION_DIR = os.environ.get("FRUITSCAN_CALIBRATION_DIR") or None
+CALIBRATION_SAMPLES = 200
+TFLITE_CACHE_DIR = os.path.join(MODEL_CACHE_ROOT, "tflite")
+REMOTE_URL = os.environ.get("FRUITSCAN_REMOTE_URL", "http://127.0.0.1:8500")
+
+def _tflite_interpreter_class():
+    # LiteRT (ai-edge-litert) adalah pengganti resmi tf.lite.Interpreter; pakai kalau terpasang.
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+        return Interpreter
+    except ImportError:
+        return _tf().lite.Interpreter
+
+class TFLiteBackend:
+    def __init__(self, model_path: str, num_threads: int = TFLITE_THREADS, name: str = "tflite"):
+        self.name = name
+        self.model_path = model_path
+        # Nama file sudah memuat mode + sidik jari SavedModel sumber (tflite_model_path).
+        self.identity = os.path.splitext(os.path.basename(model_path))[0]
+        Interpreter = _tflite_interpreter_class()
+        self._interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self._input = self._interpreter.get_input_details()[0]
+        self._output = self._interpreter.get_output_details()[0]
+        self._batch_size = None
+        # Interpreter TFLite tidak thread-safe; batcher sudah serial, lock ini untuk pemanggil lain.
+        self._lock = threading.Lock()
+        self.num_classes = int(self._output["shape"][-1])
+
+    def _ensure_batch_size(self, n: int):
+        if self._batch_size != n:
+            self._interpreter.resize_tensor_input(self._input["index"], [n, IMAGE_SIZE[1], IMAGE_SIZE[0], 3])
+            self._interpreter.allocate_tensors()
+            self._input = self._interpreter.get_input_details()[0]
+            self._output = self._interpreter.get_output_details()[0]
+            self._batch_size = n
+
+    def __call__(self, img_array) -> np.ndarray:
+        batch = np.asarray(img_array, dtype=np.float32)
+        with self._lock:
+            self._ensure_batch_size(batch.shape[0])
+            in_dtype = self._input["dtype"]
+            if in_dtype != np.float32:
+                # Model full-integer: kuantisasi input sesuai skala/zero-point tensor.
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(in_dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(in_dtype)
+            self._interpreter.set_tensor(self._input["index"], batch)
+            self._interpreter.invoke()
+            out = self._interpreter.get_tensor(self._output["index"])
+            if self._output["dtype"] != np.float32:
+                scale, zero_point = self._output["quantization"]
+                out = (out.astype(np.float32) - zero_point) * scale
+            return np.array(out, dtype=np.float32, copy=True)
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        for n in batch_sizes:
+            self(np.zeros((n, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32))
+
+class StubBackend:
+    # Pengganti model untuk tes: proyeksi acak (seed tetap) dari rata-rata warna blok 8x8.
+    # Deterministik, cepat, dan tidak butuh TensorFlow maupun file model.
+    def __init__(self, num_classes: int = 50, seed: int = 0):
+        self.name = "stub"
+        self.identity = f"stub-{num_classes}-{seed}"
+        self.num_classes = num_classes
+        self.embedding_source = "embedding"
+        rng = np.random.default_rng(seed)
+        self._weights = rng.standard_normal((8 * 8 * 3, num_classes)).astype(np.float32) / 255.0
+
+    def __call__(self, img_array) -> np.ndarray:
+        return self.predict_with_embedding(img_array)[1]
+
+    def predict_with_embedding(self, img_array):
+        # Embedding = fitur blok 8x8 (192 dimensi) sebelum proyeksi ke logits.
+        batch = np.asarray(img_array, dtype=np.float32)
+        n, h, w, c = batch.shape
+        pooled = batch.reshape(n, 8, h // 8, 8, w // 8, c).mean(axis=(2, 4)).reshape(n, -1)
+        return pooled, pooled @ self._weights
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        pass
+
+class RemoteBackend:
+    # Klien server.py: kirim tensor .npy ke POST /predict, terima logits .npy.
+    # Satu koneksi keep-alive per thread.
+    def __init__(self, base_url: str = REMOTE_URL, timeout: float = 60.0):
+        parsed = urllib.parse.urlparse(base_url)
+        if parsed.scheme not in ("http", "https"):
+            raise ValueError(f"FRUITSCAN_REMOTE_URL harus http(s)://, bukan {base_url}")
+        self.name = "remote"
+        # Model ada di server lain dan bisa berganti tanpa sepengetahuan klien: tanpa identitas.
+        self.identity = None
+        self.base_url = base_url
+        self._scheme = parsed.scheme
+        self._netloc = parsed.netloc
+        self._path = parsed.path.rstrip("/") + "/predict"
+        self.timeout = timeout
+        self._local = threading.local()
+        self.num_classes = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            cls = http.client.HTTPSConnection if self._scheme == "https" else http.client.HTTPConnection
+            conn = cls(self._netloc, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def __call__(self, img_array) -> np.ndarray:
+        body = io.BytesIO()
+        np.save(body, np.asarray(img_array, dtype=np.float32), allow_pickle=False)
+        payload = body.getvalue()
+        headers = {"Content-Type": "application/x-npy", "Connection": "keep-alive"}
+
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", self._path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # Koneksi keep-alive bisa sudah ditutup server: buka ulang sekali.
+                conn.close()
+                self._local.conn = None
+                if attempt == 1:
+                    raise
+
+        if response.status != 200:
+            raise RuntimeError(f"Server inferensi membalas {response.status}: {data[:200].decode('utf-8', 'replace')}")
+        logits = np.load(io.BytesIO(data), allow_pickle=False)
+        self.num_classes = int(logits.shape[-1])
+        return logits
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        for n in batch_sizes:
+            self(np.zeros((n, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32))
+
+def iter_calibration_batches(calibration_dir: str, limit: int = CALIBRATION_SAMPLES):
+    n = 0
+    for path in iter_image_paths(calibration_dir):
+        if n >= limit:
+            break
+        try:
+            arr = load_image_array(path)
+        except Exception:
+            continue
+        n += 1
+        yield [np.expand_dims(arr, axis=0)]
+    if n == 0:
+        raise RuntimeError(f"Tidak ada gambar kalibrasi di {calibration_dir}")
+
+def convert_to_tflite(saved_model_dir: str, output_path: str, mode: str, calibration_dir: str = None):
+    tf = _tf()
+    converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+    if mode == "tflite-fp16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "tflite-dynamic":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    elif mode == "tflite-int8":
+        if not calibration_dir:
+            raise ValueError("Mode tflite-int8 butuh folder gambar kalibrasi (FRUITSCAN_CALIBRATION_DIR)")
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: iter_calibration_batches(calibration_dir)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        # Input/output tetap float32 supaya preprocess & softmax tidak berubah.
+    else:
+        raise ValueError(f"Mode konversi tidak dikenal: {mode}")
+
+    with _timed("tflite_convert"):
+        flatbuffer = converter.convert()
+
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(flatbuffer)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def tflite_model_path(mode: str, saved_model_dir: str) -> str:
+    # Nama file ikut identitas SavedModel sumber, supaya ganti model = konversi ulang.
+    return os.path.join(TFLITE_CACHE_DIR, f"{mode}-{inference.saved_model_identity(saved_model_dir)}.tflite")
+
+def load_backend(name: str = None, status_callback=None, num_threads: int = TFLITE_THREADS, calibration_dir: str = None):
+    name = name or DEFAULT_BACKEND
+    if name not in BACKEND_NAMES:
+        raise ValueError(f"Backend tidak dikenal: {name} (pilihan: {', '.join(BACKEND_NAMES)})")
+
+    if name == "savedmodel":
+        return inference.load_trained_model(status_callback=status_callback)
+
+    if name == "stub":
+        return StubBackend()
+
+    if name == "registry":
+        from model_registry import HotSwapModel
+        backend = HotSwapModel()
+        backend.start_watcher()
+        return backend
+
+    if name == "remote":
+        backend = RemoteBackend(REMOTE_URL)
+        backend.warmup()
+        return backend
+
+    if name == "sidecar":
+        backend = SidecarBackend(os.environ.get("FRUITSCAN_SIDECAR_SOCKET", DEFAULT_SOCKET))
+        # Warm-up sekaligus memastikan sidecar memang sudah berjalan.
+        backend.warmup()
+        return backend
+
+    saved_model_dir = inference.resolve_model_dir(status_callback=status_callback)
+    path = tflite_model_path(name, saved_model_dir)
+    if not os.path.exists(path):
+        inference._notify(status_callback, f"Mengonversi model ke {name}...")
+        convert_to_tflite(saved_model_dir, path, name, calibration_dir=calibration_dir or CALIBRATION_DIR)
+
+    with _timed("tflite_load"):
+        backend = TFLiteBackend(path, num_threads=num_threads, name=name)
+    with _timed("warmup"):
+        backend.warmup()
+    return backend
+
+def compare_backends(reference, candidate, images_dir: str, limit: int = 500, batch_size: int = 64) -> dict:
+    # Laporan biaya akurasi: seberapa sering top-1 kandidat sama dengan model asli.
+    paths = []
+    for path in iter_image_paths(images_dir):
+        if len(paths) >= limit:
+            break
+        paths.append(path)
+    if not paths:
+        raise RuntimeError(f"Tidak ada gambar di {images_dir}")
+
+    agree = 0
+    total = 0
+    max_prob_diff = 0.0
+    sum_prob_diff = 0.0
+    ref_seconds = 0.0
+    cand_seconds = 0.0
+    batch = np.empty((batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+
+    for start in range(0, len(paths), batch_size):
+        n = 0
+        for path in paths[start:start + batch_size]:
+            try:
+                load_image_array(path, out=batch[n])
+            except Exception:
+                continue
+            n += 1
+        if n == 0:
+            continue
+
+        t0 = time.perf_counter()
+        ref_probs = probabilities_from_logits(reference(batch[:n]))
+        t1 = time.perf_counter()
+        cand_probs = probabilities_from_logits(candidate(batch[:n]))
+        t2 = time.perf_counter()
+        ref_seconds += t1 - t0
+        cand_seconds += t2 - t1
+
+        agree += int(np.sum(ref_probs.argmax(axis=1) == cand_probs.argmax(axis=1)))
+        diff = np.abs(ref_probs - cand_probs).max(axis=1)
+        max_prob_diff = max(max_prob_diff, float(diff.max()))
+        sum_prob_diff += float(diff.sum())
+        total += n
+
+    return {
+        "reference": getattr(reference, "name", "savedmodel"),
+        "candidate": getattr(candidate, "name", "unknown"),
+        "images": total,
+        "top1_agreement": agree / total if total else 0.0,
+        "mean_max_prob_diff": sum_prob_diff / total if total else 0.0,
+        "max_prob_diff": max_prob_diff,
+        "reference_ms_per_image": ref_seconds * 1000.0 / max(total, 1),
+        "candidate_ms_per_image": cand_seconds * 1000.0 / max(total, 1),
+        "candidate_size_mb": os.path.getsize(candidate.model_path) / 1e6 if hasattr(candidate, "model_path") else None,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Konversi & bandingkan backend inferensi FruitScan.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_convert = sub.add_parser("convert", help="Konversi SavedModel ke TFLite")
+    p_convert.add_argument("--mode", choices=TFLITE_MODES, required=True)
+    p_convert.add_argument("--calibration-dir", default=CALIBRATION_DIR, help="Folder gambar contoh (wajib untuk int8)")
+    p_convert.add_argument("--output", default=None)
+
+    p_compare = sub.add_parser("compare", help="Bandingkan top-1 backend TFLite dengan SavedModel asli")
+    p_compare.add_argument("--mode", choices=TFLITE_MODES, required=True)
+    p_compare.add_argument("--images", required=True, help="Folder gambar untuk perbandingan")
+    p_compare.add_argument("--calibration-dir", default=CALIBRATION_DIR)
+    p_compare.add_argument("--limit", type=int, default=500)
+    p_compare.add_argument("--threads", type=int, default=TFLITE_THREADS)
+
+    args = parser.parse_args(argv)
+    log = lambda msg: print(msg, file=sys.stderr)
+
+    if args.command == "convert":
+        saved_model_dir = inference.resolve_model_dir(status_callback=log)
+        output = args.output or tflite_model_path(args.mode, saved_model_dir)
+        convert_to_tflite(saved_model_dir, output, args.mode, args.calibration_dir)
+        print(f"{args.mode}: {output} ({os.path.getsize(output) / 1e6:.1f} MB)")
+        return 0
+
+    reference = inference.load_trained_model(status_callback=log)
+    candidate = load_backend(args.mode, status_callback=log, num_threads=args.threads, calibration_dir=args.calibration_dir)
+    report = compare_backends(reference, candidate, args.images, limit=args.limit)
+    for key, value in report.items():
+        print(f"{key:24s} {value:.4f}" if isinstance(value, float) else f"{key:24s} {value}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
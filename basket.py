@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+import time
+
+import numpy as np
+
+from inference import get_display_name
+from nutrisi import CLASS_NAMES, NUTRIENT_COLUMNS, NUTRITION
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# KERANJANG / MENU: TOTAL NUTRISI BANYAK ITEM (per sesi)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Item disimpan sebagai array paralel (indeks kelas int32, berat gram float32) yang tumbuh
+# berlipat dua, jadi menambah item murah dan total dihitung tanpa loop Python:
+#   gram_per_kelas = bincount(kelas, weights=gram)         -> (n_kelas,)
+#   total          = gram_per_kelas @ NUTRITION.matrix / 100 -> (len(NUTRIENT_COLUMNS),)
+# `version` naik di setiap perubahan; UI memakainya untuk tahu kapan grafik perlu diperbarui.
+
+DEFAULT_GRAMS = 100.0
+EXPORT_FIELDS = ["class_index", "class_name", "display_name", "grams", "source", "added_at", *NUTRIENT_COLUMNS]
+
+class Basket:
+    def __init__(self, capacity: int = 16):
+        capacity = max(1, int(capacity))
+        self._classes = np.empty(capacity, dtype=np.int32)
+        self._grams = np.empty(capacity, dtype=np.float32)
+        self._sources = []
+        self._added_at = []
+        self._size = 0
+        self.version = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _reserve(self, extra: int):
+        needed = self._size + extra
+        if needed <= len(self._classes):
+            return
+        capacity = max(needed, 2 * len(self._classes))
+        for name in ("_classes", "_grams"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self._size] = old[:self._size]
+            setattr(self, name, new)
+
+    def add_many(self, class_indices, grams=DEFAULT_GRAMS, source: str = "scan") -> int:
+        # grams: satu angka untuk semua item, atau satu nilai per item.
+        class_indices = np.asarray(class_indices, dtype=np.int32).reshape(-1)
+        grams = np.broadcast_to(np.asarray(grams, dtype=np.float32), class_indices.shape)
+        if class_indices.size == 0:
+            return 0
+        if class_indices.min() < 0 or class_indices.max() >= len(CLASS_NAMES):
+            raise ValueError(f"Indeks kelas di luar 0..{len(CLASS_NAMES) - 1}")
+        if not np.all(np.isfinite(grams)) or np.any(grams <= 0):
+            raise ValueError("Berat harus angka positif (gram)")
+
+        n = class_indices.size
+        self._reserve(n)
+        self._classes[self._size:self._size + n] = class_indices
+        self._grams[self._size:self._size + n] = grams
+        self._sources.extend([source] * n)
+        self._added_at.extend([time.time()] * n)
+        self._size += n
+        self.version += 1
+        return n
+
+    def add(self, class_index: int, grams: float = DEFAULT_GRAMS, source: str = "scan") -> int:
+        return self.add_many([class_index], grams, source=source)
+
+    def add_detections(self, detections, grams_per_item: float = DEFAULT_GRAMS) -> int:
+        # Satu item per region hasil detection.detect_fruits.
+        return self.add_many([d["class_index"] for d in detections], grams_per_item, source="deteksi")
+
+    def remove(self, position: int):
+        if not 0 <= position < self._size:
+            raise IndexError(position)
+        for arr in (self._classes, self._grams):
+            arr[position:self._size - 1] = arr[position + 1:self._size]
+        del self._sources[position]
+        del self._added_at[position]
+        self._size -= 1
+        self.version += 1
+
+    def clear(self):
+        self._size = 0
+        self._sources.clear()
+        self._added_at.clear()
+        self.version += 1
+
+    @property
+    def class_indices(self) -> np.ndarray:
+        return self._classes[:self._size]
+
+    @property
+    def grams(self) -> np.ndarray:
+        return self._grams[:self._size]
+
+    def grams_per_class(self) -> np.ndarray:
+        # (n_kelas,) float64: total gram tiap kelas di keranjang (0 untuk yang tidak ada).
+        return np.bincount(self.class_indices, weights=self.grams, minlength=len(CLASS_NAMES))
+
+    def nutrients_per_class(self) -> np.ndarray:
+        # (n_kelas, len(NUTRIENT_COLUMNS)): kontribusi tiap kelas, nilai NUTRITION per 100 g.
+        return self.grams_per_class()[:, None] * NUTRITION.matrix / 100.0
+
+    def item_nutrients(self) -> np.ndarray:
+        # (n_item, len(NUTRIENT_COLUMNS)) untuk tabel & ekspor.
+        return NUTRITION.matrix[self.class_indices] * (self.grams[:, None] / 100.0)
+
+    def totals(self) -> dict:
+        total = self.grams_per_class() @ NUTRITION.matrix / 100.0
+        result = {name: float(v) for name, v in zip(NUTRIENT_COLUMNS, total)}
+        result["grams"] = float(self.grams.sum(dtype=np.float64))
+        result["items"] = self._size
+        return result
+
+    def breakdown(self):
+        # -> [(indeks kelas, gram, nutrisi per kolom)] hanya kelas yang ada, urut kalori terbesar.
+        per_class = self.nutrients_per_class()
+        grams = self.grams_per_class()
+        present = np.flatnonzero(grams)
+        order = present[np.argsort(-per_class[present, 0], kind="stable")]
+        return [(int(i), float(grams[i]), per_class[i]) for i in order]
+
+    def rows(self) -> list:
+        nutrients = self.item_nutrients()
+        rows = []
+        for pos in range(self._size):
+            idx = int(self._classes[pos])
+            row = {
+                "class_index": idx,
+                "class_name": CLASS_NAMES[idx],
+                "display_name": get_display_name(CLASS_NAMES[idx]),
+                "grams": round(float(self._grams[pos]), 1),
+                "source": self._sources[pos],
+                "added_at": round(self._added_at[pos], 3),
+            }
+            row.update({name: round(float(v), 2) for name, v in zip(NUTRIENT_COLUMNS, nutrients[pos])})
+            rows.append(row)
+        return rows
+
+    def to_csv(self) -> str:
+        buf = io.StringIO()
+        writer = csv.DictWriter(buf, fieldnames=EXPORT_FIELDS)
+        writer.writeheader()
+        writer.writerows(self.rows())
+        return buf.getvalue()
+
+    def to_json(self) -> str:
+        totals = self.totals()
+        return json.dumps(
+            {
+                "items": self.rows(),
+                "totals": {k: round(v, 2) if isinstance(v, float) else v for k, v in totals.items()},
+                "units": {"grams": "g", "kalori_kcal": "kcal", "serat_g": "g"},
+            },
+            ensure_ascii=False,
+            indent=2,
+        )
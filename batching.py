@@ -0,0 +1,163 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import metrics
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MICRO-BATCHING INFERENSI (dipakai bersama oleh semua sesi Streamlit)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Setiap sesi mengirim array (n, 64, 64, 3) lewat submit(). Satu thread pekerja
+# mengumpulkan request yang menunggu sampai batas max_batch_size baris ATAU
+# max_wait_ms sejak request pertama di batch, lalu menjalankan SATU panggilan
+# model untuk semuanya dan membagikan baris hasil ke masing-masing Future.
+
+class _PendingRequest:
+    __slots__ = ("array", "future", "enqueued_at")
+
+    def __init__(self, array: np.ndarray):
+        self.array = array
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+class InferenceBatcher:
+    def __init__(self, predict_fn, max_batch_size: int = 32, max_wait_ms: float = 5.0, stats_window: int = 1000):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size minimal 1")
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms tidak boleh negatif")
+
+        self.predict_fn = predict_fn
+        self.max_batch_size = int(max_batch_size)
+        self.max_wait_s = float(max_wait_ms) / 1000.0
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=stats_window)
+        self._queue_waits_ms = deque(maxlen=stats_window)
+        self._total_batches = 0
+        self._total_requests = 0
+        self._total_rows = 0
+        self._total_errors = 0
+
+        self._worker = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, img_array: np.ndarray) -> Future:
+        arr = np.asarray(img_array, dtype=np.float32)
+        if arr.ndim == 3:
+            arr = np.expand_dims(arr, axis=0)
+        if arr.ndim != 4:
+            raise ValueError(f"Input harus berbentuk (n, H, W, C), bukan {arr.shape}")
+
+        req = _PendingRequest(arr)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("InferenceBatcher sudah ditutup")
+            self._pending.append(req)
+            self._cond.notify()
+        return req.future
+
+    def predict(self, img_array: np.ndarray, timeout: float = None) -> np.ndarray:
+        return self.submit(img_array).result(timeout=timeout)
+
+    def close(self, timeout: float = None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join(timeout=timeout)
+
+    def _collect_batch(self):
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+
+            # Tunggu sampai batch penuh atau batas waktu request tertua habis.
+            deadline = self._pending[0].enqueued_at + self.max_wait_s
+            while not self._closed:
+                queued_rows = sum(r.array.shape[0] for r in self._pending)
+                remaining = deadline - time.perf_counter()
+                if queued_rows >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(timeout=remaining)
+
+            batch, rows = [], 0
+            while self._pending:
+                n = self._pending[0].array.shape[0]
+                # Request yang lebih besar dari max_batch_size tetap jalan sendirian.
+                if batch and rows + n > self.max_batch_size:
+                    break
+                batch.append(self._pending.popleft())
+                rows += n
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            if not batch:
+                return
+
+            started = time.perf_counter()
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                inputs = batch[0].array if len(batch) == 1 else np.concatenate([r.array for r in batch], axis=0)
+                outputs = np.asarray(self.predict_fn(inputs))
+            except Exception as e:
+                with self._stats_lock:
+                    self._total_errors += 1
+                metrics.inc("predict_errors")
+                for r in batch:
+                    r.future.set_exception(e)
+                continue
+
+            finished = time.perf_counter()
+            offset = 0
+            for r in batch:
+                n = r.array.shape[0]
+                r.future.set_result(outputs[offset:offset + n])
+                offset += n
+
+            metrics.observe("batch_predict", (finished - started) * 1000.0)
+            for r in batch:
+                metrics.observe("queue_wait", (started - r.enqueued_at) * 1000.0)
+
+            with self._stats_lock:
+                self._total_batches += 1
+                self._total_requests += len(batch)
+                self._total_rows += int(inputs.shape[0])
+                self._batch_sizes.append(int(inputs.shape[0]))
+                for r in batch:
+                    self._queue_waits_ms.append((started - r.enqueued_at) * 1000.0)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            sizes = np.asarray(self._batch_sizes, dtype=np.float64)
+            waits = np.asarray(self._queue_waits_ms, dtype=np.float64)
+            result = {
+                "total_batches": self._total_batches,
+                "total_requests": self._total_requests,
+                "total_rows": self._total_rows,
+                "total_errors": self._total_errors,
+            }
+        with self._cond:
+            result["queue_depth"] = len(self._pending)
+
+        result["batch_size_mean"] = float(sizes.mean()) if sizes.size else 0.0
+        result["batch_size_max"] = int(sizes.max()) if sizes.size else 0
+        if waits.size:
+            p50, p95, p99 = np.percentile(waits, [50, 95, 99])
+            result.update(queue_wait_ms_p50=float(p50), queue_wait_ms_p95=float(p95), queue_wait_ms_p99=float(p99))
+        else:
+            result.update(queue_wait_ms_p50=0.0, queue_wait_ms_p95=0.0, queue_wait_ms_p99=0.0)
+        return result
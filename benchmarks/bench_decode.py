@@ -0,0 +1,181 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageOps
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK DECODE: jalur lama (decode penuh) vs decode_image (draft + EXIF)
+# ═══════════════════════════════════════════════════════════════════════════════
+# - Latensi median per gambar untuk beberapa ukuran foto JPEG sintetis
+# - Kenaikan memori puncak (VmHWM/ru_maxrss) tiap jalur diukur di subprocess terpisah
+# - Kesamaan prediksi: top-1 dan selisih logit maksimum decode cepat vs decode penuh
+#   (+ exif_transpose) memakai model (stub atau SavedModel); separuh foto uji diberi tag EXIF
+#   Orientation=6 seperti foto HP
+#
+#   python -m benchmarks.bench_decode --sizes 12mp,3mp --repeats 10
+#   python -m benchmarks.bench_decode --model-dir /tmp/fruitscan_stub --agreement-images 100
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from inference import decode_image, preprocess_image  # noqa: E402
+
+SIZES = {
+    "12mp": (4000, 3000),
+    "3mp": (2000, 1500),
+    "1mp": (1152, 864),
+    "vga": (640, 480),
+}
+
+def synthetic_photo(size, seed: int = 0, quality: int = 90, orientation: int = 1) -> bytes:
+    # Gradien warna + blob halus + sedikit noise, supaya mirip foto (bukan warna rata).
+    w, h = size
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    cx, cy = rng.uniform(0.3, 0.7) * w, rng.uniform(0.3, 0.7) * h
+    r = np.sqrt((xx - cx) ** 2 + (yy - cy) ** 2) / (0.35 * min(w, h))
+    blob = np.clip(1.0 - r, 0, 1)[..., None]
+    base = rng.uniform(40, 220, size=3).astype(np.float32)
+    fruit = rng.uniform(0, 255, size=3).astype(np.float32)
+    img = base * (1 - blob) + fruit * blob + (xx[..., None] / w) * 30
+    img += rng.normal(0, 6, size=(h, w, 1)).astype(np.float32)
+    out = io.BytesIO()
+    pil = Image.fromarray(np.clip(img, 0, 255).astype(np.uint8))
+    exif = Image.Exif()
+    if orientation != 1:
+        exif[0x0112] = orientation
+    pil.save(out, "JPEG", quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+def legacy_decode(data: bytes) -> np.ndarray:
+    # Jalur sebelum decode_image: decode penuh + preview penuh di memori.
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return preprocess_image(image)[0]
+
+def reference_decode(data: bytes) -> np.ndarray:
+    # Acuan kebenaran untuk cek prediksi: decode penuh dengan orientasi EXIF diterapkan.
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    return preprocess_image(image)[0]
+
+def fast_decode(data: bytes) -> np.ndarray:
+    return decode_image(data)[0]
+
+PATHS = {"legacy": legacy_decode, "fast": fast_decode}
+
+def time_path(fn, data: bytes, repeats: int) -> float:
+    fn(data)
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn(data)
+        samples.append(time.perf_counter() - t0)
+    return float(np.median(samples) * 1000.0)
+
+def _peak_rss_kb() -> int:
+    # VmHWM milik proses ini sendiri; ru_maxrss di Linux mewarisi puncak parent lewat fork+exec.
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def peak_memory_mb(path_name: str, data: bytes) -> float:
+    # Subprocess baru per jalur supaya puncak memori tidak tercampur. Foto dibaca dari file
+    # (bukan dibuat di subprocess) agar buffer pembuatnya tidak ikut menaikkan puncak.
+    with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+        f.write(data)
+    code = (
+        "import sys; sys.path.insert(0, %r);"
+        "from benchmarks.bench_decode import PATHS, _peak_rss_kb;"
+        "data = open(%r, 'rb').read();"
+        "base = _peak_rss_kb();"
+        "PATHS[%r](data);"
+        "print((_peak_rss_kb() - base) / 1024.0)"
+    ) % (REPO_ROOT, f.name, path_name)
+    try:
+        out = subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True)
+    finally:
+        os.unlink(f.name)
+    return float(out.stdout.strip().splitlines()[-1])
+
+def prediction_agreement(model, n_images: int, size) -> dict:
+    agree = 0
+    max_input_diff = 0.0
+    max_logit_delta = 0.0
+    logit_std = []
+    for i in range(n_images):
+        data = synthetic_photo(size, seed=1000 + i, orientation=6 if i % 2 else 1)
+        a = reference_decode(data)
+        b = fast_decode(data)
+        max_input_diff = max(max_input_diff, float(np.abs(a - b).max()))
+        logits = np.asarray(model(np.stack([a, b])), dtype=np.float64)
+        agree += int(np.argmax(logits[0]) == np.argmax(logits[1]))
+        max_logit_delta = max(max_logit_delta, float(np.abs(logits[0] - logits[1]).max()))
+        logit_std.append(float(logits[0].std()))
+    return {
+        "images": n_images,
+        "top1_agreement": agree / max(n_images, 1),
+        "max_pixel_diff": max_input_diff,
+        "max_logit_delta": max_logit_delta,
+        # Sebaran logit antar kelas (decode penuh), skala pembanding untuk max_logit_delta.
+        "logit_std": float(np.mean(logit_std)) if logit_std else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark decode penuh vs decode cepat (draft).")
+    parser.add_argument("--sizes", default="12mp,3mp,1mp,vga")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--agreement-images", type=int, default=50)
+    parser.add_argument("--agreement-size", default="3mp")
+    parser.add_argument("--model-dir", default=None, help="SavedModel untuk cek prediksi (default: backend stub)")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args(argv)
+
+    results = {"decode": [], "agreement": None}
+    print(f"{'ukuran':8s} {'legacy ms':>10s} {'fast ms':>9s} {'speedup':>8s} {'legacy MB':>10s} {'fast MB':>8s}")
+    for size_name in [s.strip() for s in args.sizes.split(",") if s.strip()]:
+        data = synthetic_photo(SIZES[size_name])
+        row = {"size": size_name, "bytes": len(data)}
+        for path_name, fn in PATHS.items():
+            row[f"{path_name}_ms"] = time_path(fn, data, args.repeats)
+            row[f"{path_name}_peak_mb"] = peak_memory_mb(path_name, data)
+        results["decode"].append(row)
+        print(f"{size_name:8s} {row['legacy_ms']:>10.1f} {row['fast_ms']:>9.1f} {row['legacy_ms'] / row['fast_ms']:>7.1f}x "
+              f"{row['legacy_peak_mb']:>10.1f} {row['fast_peak_mb']:>8.1f}")
+
+    if args.agreement_images > 0:
+        if args.model_dir:
+            os.environ["FRUITSCAN_MODEL_DIR"] = os.path.abspath(args.model_dir)
+            # inference sudah di-import (env dibaca saat import), jadi override juga di modulnya.
+            import inference
+            inference.MODEL_DIR_OVERRIDE = os.environ["FRUITSCAN_MODEL_DIR"]
+            from backends import load_backend
+            model = load_backend("savedmodel")
+        else:
+            from backends import StubBackend
+            model = StubBackend()
+        results["agreement"] = prediction_agreement(model, args.agreement_images, SIZES[args.agreement_size])
+        a = results["agreement"]
+        print(f"\nKesamaan top-1 ({getattr(model, 'name', 'model')}, {a['images']} foto {args.agreement_size}): "
+              f"{a['top1_agreement'] * 100:.1f}% · selisih piksel maks {a['max_pixel_diff']:.1f} · "
+              f"selisih logit maks {a['max_logit_delta']:.2g} (std logit {a['logit_std']:.2g})")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK PENCARIAN GAMBAR MIRIP: exact (blok) vs IVF, pada vektor sintetis
+# ═══════════════════════════════════════════════════════════════════════════════
+# Vektor dibangkitkan di sekitar n_clusters pusat acak (mirip embedding per kelas), ditulis
+# ke EmbeddingStore (memmap float16) sementara, lalu dicari dengan search_blocked dan IVFIndex.
+# Recall@k IVF dihitung terhadap hasil exact.
+#
+#   python -m benchmarks.bench_embeddings --rows 1000000 --dim 128
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import embeddings  # noqa: E402
+
+def fill_store(store, rows: int, dim: int, n_clusters: int, chunk: int = 100000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    centers = embeddings.l2_normalize(rng.standard_normal((n_clusters, dim)))
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        labels = rng.integers(0, n_clusters, n)
+        vectors = centers[labels] + rng.standard_normal((n, dim)).astype(np.float32) * (0.6 / np.sqrt(dim))
+        store.append(vectors, labels % 50, np.ones(n), embedding_source="bench")
+    return centers
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Latensi top-k cosine: exact per blok vs IVF.")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--clusters", type=int, default=500, help="Jumlah pusat data sintetis")
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--lists", type=int, default=None, help="Cluster IVF (default sqrt(N))")
+    parser.add_argument("--probe", type=int, default=16)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args(argv)
+
+    root = tempfile.mkdtemp(prefix="fruitscan_emb_bench_")
+    try:
+        store = embeddings.EmbeddingStore(root)
+        started = time.perf_counter()
+        centers = fill_store(store, args.rows, args.dim, args.clusters)
+        append_s = time.perf_counter() - started
+        rng = np.random.default_rng(1)
+        queries = centers[rng.integers(0, len(centers), args.queries)] + rng.standard_normal((args.queries, args.dim)) * (0.6 / np.sqrt(args.dim))
+
+        exact_ms = []
+        exact_ids = []
+        for q in queries:
+            started = time.perf_counter()
+            ids, _ = embeddings.search_blocked(store.vectors, q, k=args.k)
+            exact_ms.append((time.perf_counter() - started) * 1000.0)
+            exact_ids.append(ids[0])
+
+        started = time.perf_counter()
+        ivf = embeddings.IVFIndex.train(store, n_lists=args.lists, n_probe=args.probe)
+        train_s = time.perf_counter() - started
+        ivf_ms = []
+        recall = []
+        for q, ref in zip(queries, exact_ids):
+            started = time.perf_counter()
+            ids, _ = ivf.search(q, k=args.k)
+            ivf_ms.append((time.perf_counter() - started) * 1000.0)
+            recall.append(len(set(ids[0]) & set(ref)) / args.k)
+
+        results = {
+            "rows": args.rows,
+            "dim": args.dim,
+            "store_mb": store.vectors.nbytes / 1e6,
+            "append_s": append_s,
+            "exact_p50_ms": float(np.percentile(exact_ms, 50)),
+            "ivf_lists": ivf.n_lists,
+            "ivf_probe": args.probe,
+            "ivf_train_s": train_s,
+            "ivf_p50_ms": float(np.percentile(ivf_ms, 50)),
+            f"ivf_recall_at_{args.k}": float(np.mean(recall)),
+        }
+        for key, value in results.items():
+            print(f"{key:18s} {value:.3f}" if isinstance(value, float) else f"{key:18s} {value}")
+        if args.json:
+            with open(args.json, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
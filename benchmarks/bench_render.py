@@ -0,0 +1,148 @@
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK RENDER PANEL HASIL: jalur lama (bangun ulang tiap rerun) vs render_cache
+# ═══════════════════════════════════════════════════════════════════════════════
+# Satu "rerun" = kerja server untuk panel hasil satu foto: warna buah, kotak hasil, bar
+# confidence, 3 prediksi teratas, kartu nutrisi, grafik nutrisi (termasuk serialisasi yang
+# dilakukan st.plotly_chart) dan blok CSS. Urutan kelas diambil acak dengan pengulangan
+# (rerun di aplikasi sungguhan kebanyakan untuk foto/kelas yang sama).
+#
+#   python -m benchmarks.bench_render --reruns 500
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import render_cache  # noqa: E402
+from nutrisi import CLASS_NAMES, NUTRITION  # noqa: E402
+
+def load_custom_css() -> str:
+    # Ambil literal CUSTOM_CSS dari streamlit_app.py tanpa menjalankan aplikasinya.
+    with open(os.path.join(REPO_ROOT, "streamlit_app.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "CUSTOM_CSS" for t in node.targets):
+            return ast.literal_eval(node.value)
+    raise RuntimeError("CUSTOM_CSS tidak ditemukan di streamlit_app.py")
+
+def serialize_chart(fig) -> str:
+    # Sama dengan yang dikerjakan st.plotly_chart untuk argumen Figure.
+    import plotly.io
+    import plotly.tools
+
+    return plotly.io.to_json(plotly.tools.return_figure_from_figure_or_data(fig, validate_figure=True), validate=False)
+
+def legacy_render(idx: int, confidence: float, top, css: str) -> int:
+    # Salinan jalur lama: warna dari aturan substring, f-string HTML per rerun, Figure baru.
+    display_name = CLASS_NAMES[idx]
+    color1, color2, shadow_color = render_cache.fruit_color(display_name)
+    parts = [css, f"""
+                <div class='result-box animate-pulse' style='background: linear-gradient(135deg, {color1} 0%, {color2} 100%); box-shadow: 0 8px 25px {shadow_color};'>
+                    <div class='result-label'>Buah Terdeteksi</div>
+                    <div class='result-value'>{display_name}</div>
+                    <div class='result-confidence'>Confidence: {confidence:.1f}%</div>
+                </div>
+                """, f"""
+                <div style='margin: 1rem 0;'>
+                    <div style='display:flex; justify-content:space-between; margin-bottom:0.5rem;'>
+                        <span style='font-weight:600; color:#1e293b;'>Tingkat Keyakinan</span>
+                        <span style='font-weight:700; color:{color1};'>{confidence:.1f}%</span>
+                    </div>
+                    <div class='confidence-bar-container'>
+                        <div class='confidence-bar' style='width:{confidence}%; background:{color1};'></div>
+                    </div>
+                </div>
+                """]
+    for rank, (name, prob) in enumerate(top, start=1):
+        parts.append(f"""
+                    <div class='prediction-item'>
+                        <div style='display:flex; align-items:center; gap:0.75rem;'>
+                            <div class='prediction-rank rank-{rank}'>{rank}</div>
+                            <span style='font-weight:600; color:#1e293b;'>{name}</span>
+                        </div>
+                        <span style='font-weight:700; color:#475569;'>{prob:.1f}%</span>
+                    </div>
+                    """)
+    for key, value in NUTRITION.labels[idx].items():
+        parts.append(f"""
+                            <div class='nutrition-item'>
+                                <div class='nutrition-label'>{key}</div>
+                                <div class='nutrition-value'>{value}</div>
+                            </div>
+                            """)
+    parts.append(serialize_chart(render_cache.nutrition_chart.__wrapped__(idx)))
+    return sum(len(p) for p in parts)
+
+def cached_render(idx: int, confidence: float, top, css: str) -> int:
+    confidence_text = f"{confidence:.1f}"
+    parts = [
+        render_cache.minify_css(css),
+        render_cache.result_box_html(idx, render_cache.DISPLAY_NAMES[idx], confidence_text, "Buah Terdeteksi"),
+        render_cache.confidence_bar_html(idx, confidence_text),
+    ]
+    for rank, (name, prob) in enumerate(top, start=1):
+        parts.append(render_cache.prediction_item_html(rank, name, f"{prob:.1f}"))
+    parts.extend(render_cache.nutrition_cards_html(idx))
+    parts.append(serialize_chart(render_cache.nutrition_chart(idx)))
+    return sum(len(p) for p in parts)
+
+PATHS = {"legacy": legacy_render, "cached": cached_render}
+
+def workload(n_reruns: int, n_photos: int, seed: int = 0):
+    # n_photos foto berbeda (kelas + confidence + top-3 tetap per foto), rerun memilih foto acak.
+    rng = np.random.default_rng(seed)
+    photos = []
+    for _ in range(n_photos):
+        idxs = rng.choice(len(CLASS_NAMES), size=3, replace=False)
+        probs = np.sort(rng.dirichlet(np.ones(3)) * 100.0)[::-1]
+        top = [(CLASS_NAMES[i], float(p)) for i, p in zip(idxs, probs)]
+        photos.append((int(idxs[0]), float(probs[0]), top))
+    return [photos[i] for i in rng.integers(0, n_photos, size=n_reruns)]
+
+def time_path(fn, reruns, css: str):
+    samples = np.empty(len(reruns), dtype=np.float64)
+    payload = 0
+    for i, (idx, confidence, top) in enumerate(reruns):
+        started = time.perf_counter()
+        payload = fn(idx, confidence, top, css)
+        samples[i] = (time.perf_counter() - started) * 1000.0
+    return samples, payload
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Waktu render panel hasil per rerun: lama vs render_cache.")
+    parser.add_argument("--reruns", type=int, default=500)
+    parser.add_argument("--photos", type=int, default=20, help="Jumlah foto berbeda dalam workload")
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args(argv)
+
+    css = load_custom_css()
+    reruns = workload(args.reruns, args.photos)
+    results = {}
+    print(f"{'jalur':8s} {'p50 ms':>8s} {'p95 ms':>8s} {'rerun pertama ms':>17s} {'payload KB':>11s}")
+    for name, fn in PATHS.items():
+        samples, payload = time_path(fn, reruns, css)
+        results[name] = {
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p95_ms": float(np.percentile(samples, 95)),
+            "first_ms": float(samples[0]),
+            "mean_ms": float(samples.mean()),
+            "payload_bytes": payload,
+        }
+        r = results[name]
+        print(f"{name:8s} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['first_ms']:>17.2f} {payload / 1024:>11.1f}")
+    print(f"speedup p50: {results['legacy']['p50_ms'] / max(results['cached']['p50_ms'], 1e-9):.1f}x")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"reruns": args.reruns, "photos": args.photos, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK TTA: AKURASI vs LATENSI UNTUK 1/4/8 VIEW (CPU)
+# ═══════════════════════════════════════════════════════════════════════════════
+# - Dengan --data-dir (folder berlabel <root>/<kelas>/*.jpg): akurasi top-1 sungguhan.
+# - Tanpa data: foto sintetis, label = prediksi model pada gambar bersih, lalu input diberi
+#   gangguan (cahaya, geser, terpotong sebagian) -> "konsistensi" sebagai proksi ketahanan.
+# Latensi diukur untuk 1 gambar (jalur UI) dan throughput untuk batch 32 (jalur batch/server).
+#
+#   python -m benchmarks.bench_tta --model-dir /tmp/fruitscan_stub --views 1,4,8
+#   python -m benchmarks.bench_tta --model-dir /srv/model --data-dir /data/val --perturb
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from inference import IMAGE_SIZE, decode_image, load_image_array  # noqa: E402
+from tta import MAX_VIEWS, predict_tta  # noqa: E402
+
+def perturb(batch: np.ndarray, seed: int = 0) -> np.ndarray:
+    # Gangguan "foto sulit": cahaya +-40%, geser s/d 12% (tepi di-replikasi), satu sisi tertutup.
+    rng = np.random.default_rng(seed)
+    n, h, w, _ = batch.shape
+    gain = rng.uniform(0.6, 1.4, size=(n, 1, 1, 1)).astype(np.float32)
+    out = np.clip(batch * gain, 0, 255)
+
+    dy = rng.integers(-h // 8, h // 8 + 1, size=n)
+    dx = rng.integers(-w // 8, w // 8 + 1, size=n)
+    rows = np.clip(np.arange(h)[None, :] - dy[:, None], 0, h - 1)
+    cols = np.clip(np.arange(w)[None, :] - dx[:, None], 0, w - 1)
+    out = out[np.arange(n)[:, None, None], rows[:, :, None], cols[:, None, :]]
+
+    cover = rng.integers(0, w // 5, size=n)
+    out *= (np.arange(w)[None, None, :, None] >= cover[:, None, None, None])
+    return out.astype(np.float32)
+
+def synthetic_batch(n_images: int, seed: int = 0) -> np.ndarray:
+    from benchmarks.bench_decode import synthetic_photo
+
+    batch = np.empty((n_images, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    for i in range(n_images):
+        decode_image(synthetic_photo((320, 240), seed=seed + i), out=batch[i])
+    return batch
+
+def labelled_batch(data_dir: str, limit: int):
+    from calibrate import labelled_paths
+
+    paths, labels, _ = labelled_paths(data_dir)
+    if limit and len(paths) > limit:
+        pick = np.random.default_rng(0).choice(len(paths), size=limit, replace=False)
+        paths = [paths[i] for i in pick]
+        labels = labels[pick]
+    batch = np.empty((len(paths), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        load_image_array(path, out=batch[i])
+    return batch, labels
+
+def predict_chunked(model, batch: np.ndarray, n_views: int, chunk: int = 32) -> np.ndarray:
+    return np.concatenate([predict_tta(model, batch[i:i + chunk], n_views) for i in range(0, len(batch), chunk)])
+
+def latency_ms(model, batch: np.ndarray, n_views: int, repeats: int) -> float:
+    predict_tta(model, batch, n_views)
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        predict_tta(model, batch, n_views)
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples) * 1000.0)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trade-off akurasi/latensi TTA.")
+    parser.add_argument("--model-dir", default=os.environ.get("FRUITSCAN_MODEL_DIR"), help="SavedModel (default: backend stub)")
+    parser.add_argument("--backend", default=None, help="Backend (default: savedmodel kalau --model-dir, selain itu stub)")
+    parser.add_argument("--data-dir", default=None, help="Folder berlabel untuk akurasi sungguhan")
+    parser.add_argument("--perturb", action="store_true", help="Beri gangguan juga pada --data-dir")
+    parser.add_argument("--views", default="1,4,8")
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--json", default=None)
+    args = parser.parse_args(argv)
+
+    if args.model_dir:
+        os.environ["FRUITSCAN_MODEL_DIR"] = os.path.abspath(args.model_dir)
+        # inference sudah di-import (env dibaca saat import), jadi override juga di modulnya.
+        import inference
+        inference.MODEL_DIR_OVERRIDE = os.environ["FRUITSCAN_MODEL_DIR"]
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    from backends import load_backend
+
+    model = load_backend(args.backend or ("savedmodel" if args.model_dir else "stub"))
+
+    if args.data_dir:
+        clean, labels = labelled_batch(args.data_dir, args.images)
+        inputs = perturb(clean) if args.perturb else clean
+        metric = "akurasi"
+    else:
+        clean = synthetic_batch(args.images)
+        labels = np.argmax(predict_chunked(model, clean, 1), axis=1)
+        inputs = perturb(clean)
+        metric = "konsistensi"
+
+    views_list = [min(int(v), MAX_VIEWS) for v in args.views.split(",") if v.strip()]
+    results = []
+    for n_views in views_list:
+        logits = predict_chunked(model, inputs, n_views)
+        results.append({
+            "views": n_views,
+            metric: float(np.mean(np.argmax(logits, axis=1) == labels)),
+            "latency_1_ms": latency_ms(model, inputs[:1], n_views, args.repeats),
+            "latency_32_ms": latency_ms(model, inputs[:32], n_views, max(3, args.repeats // 4)),
+        })
+
+    print(f"model: {getattr(model, 'name', '?')} · {len(inputs)} gambar · metrik: {metric}")
+    print(f"{'views':>5s} {metric:>12s} {'1 gbr ms':>9s} {'32 gbr ms':>10s} {'img/s':>8s}")
+    for r in results:
+        print(f"{r['views']:>5d} {r[metric] * 100:>11.1f}% {r['latency_1_ms']:>9.1f} {r['latency_32_ms']:>10.1f} "
+              f"{32000.0 / r['latency_32_ms']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"metric": metric, "results": results}, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,170 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# BENCHMARK MEMORI & THROUGHPUT MULTI-WORKER
+# ═══════════════════════════════════════════════════════════════════════════════
+# Menjalankan K proses worker (meniru K proses Streamlit) untuk tiap mode backend dan
+# mengukur memori per worker serta throughput gabungan:
+#   - RSS : resident set size (halaman shared dihitung penuh di tiap proses)
+#   - PSS : proportional set size (halaman shared dibagi rata) -> jumlah PSS = RAM nyata
+# Mode "sidecar" juga menghitung memori proses sidecar-nya.
+#
+#   python -m benchmarks.bench_workers --model-dir /tmp/fruitscan_stub --workers 4 \
+#       --modes savedmodel,tflite-fp16,sidecar --requests 200
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def memory_mb(pid="self") -> dict:
+    result = {"rss_mb": None, "pss_mb": None}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    result["rss_mb"] = int(line.split()[1]) / 1024.0
+                elif line.startswith("Pss:"):
+                    result["pss_mb"] = int(line.split()[1]) / 1024.0
+    except OSError:
+        import resource
+        # Fallback non-Linux: hanya RSS puncak proses ini.
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result["rss_mb"] = maxrss / (1024.0 * 1024.0 if sys.platform == "darwin" else 1024.0)
+    return result
+
+def run_worker(mode: str, requests: int, batch_size: int):
+    sys.path.insert(0, REPO_ROOT)
+    from backends import load_backend
+
+    model = load_backend(mode)
+    batch = np.random.default_rng(0).uniform(0, 255, (batch_size, 64, 64, 3)).astype(np.float32)
+    model(batch)
+
+    # Beri tahu parent sudah siap, lalu tunggu aba-aba supaya semua worker mulai bersamaan.
+    print("READY", flush=True)
+    sys.stdin.readline()
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        model(batch)
+    elapsed = time.perf_counter() - started
+
+    report = {"elapsed_s": elapsed, "images": requests * batch_size}
+    report.update(memory_mb())
+    print(json.dumps(report), flush=True)
+
+def _wait_for_socket(path: str, proc, timeout: float = 300.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if os.path.exists(path):
+            return
+        if proc.poll() is not None:
+            raise RuntimeError("Sidecar berhenti sebelum siap")
+        time.sleep(0.2)
+    raise TimeoutError("Sidecar tidak siap")
+
+def run_mode(mode: str, workers: int, requests: int, batch_size: int, env: dict) -> dict:
+    env = dict(env)
+    sidecar = None
+    if mode == "sidecar":
+        socket_path = os.path.join(tempfile.mkdtemp(prefix="fruitscan-bench-"), "sidecar.sock")
+        env["FRUITSCAN_SIDECAR_SOCKET"] = socket_path
+        sidecar = subprocess.Popen(
+            [sys.executable, os.path.join(REPO_ROOT, "sidecar.py"), "--socket", socket_path, "--backend", "savedmodel"],
+            env=env, cwd=REPO_ROOT, stderr=subprocess.DEVNULL,
+        )
+        _wait_for_socket(socket_path, sidecar)
+
+    procs = []
+    try:
+        for _ in range(workers):
+            procs.append(subprocess.Popen(
+                [sys.executable, "-m", "benchmarks.bench_workers", "--worker", "--modes", mode,
+                 "--requests", str(requests), "--batch-size", str(batch_size)],
+                env=env, cwd=REPO_ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL, text=True,
+            ))
+        for p in procs:
+            line = p.stdout.readline().strip()
+            if line != "READY":
+                raise RuntimeError(f"Worker {mode} gagal start")
+
+        wall_start = time.perf_counter()
+        for p in procs:
+            p.stdin.write("go\n")
+            p.stdin.flush()
+        reports = [json.loads(p.stdout.readline()) for p in procs]
+        wall = time.perf_counter() - wall_start
+
+        sidecar_mem = memory_mb(sidecar.pid) if sidecar is not None else {"rss_mb": 0.0, "pss_mb": 0.0}
+    finally:
+        for p in procs:
+            p.wait(timeout=60)
+        if sidecar is not None:
+            sidecar.terminate()
+            sidecar.wait(timeout=60)
+
+    def _mean(key):
+        values = [r[key] for r in reports if r.get(key) is not None]
+        return float(np.mean(values)) if values else None
+
+    worker_pss = [r["pss_mb"] for r in reports if r.get("pss_mb") is not None]
+    total_pss = (sum(worker_pss) + (sidecar_mem["pss_mb"] or 0.0)) if worker_pss else None
+    images = sum(r["images"] for r in reports)
+    return {
+        "mode": mode,
+        "workers": workers,
+        "worker_rss_mb": _mean("rss_mb"),
+        "worker_pss_mb": _mean("pss_mb"),
+        "sidecar_pss_mb": sidecar_mem["pss_mb"] if sidecar is not None else None,
+        "total_pss_mb": total_pss,
+        "throughput_img_s": images / wall,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark memori per worker & throughput gabungan.")
+    parser.add_argument("--model-dir", default=os.environ.get("FRUITSCAN_MODEL_DIR"), help="Folder SavedModel (mis. dari benchmarks.stub_model)")
+    parser.add_argument("--modes", default="savedmodel,tflite-fp16,sidecar")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=100, help="Request per worker")
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--json", default=None, help="Simpan hasil ke file JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args.modes, args.requests, args.batch_size)
+        return 0
+
+    env = dict(os.environ)
+    if args.model_dir:
+        env["FRUITSCAN_MODEL_DIR"] = os.path.abspath(args.model_dir)
+    env.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+
+    results = []
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        if mode.startswith("tflite"):
+            # Konversi sekali di depan supaya tidak ikut terukur (dan tidak balapan antar worker).
+            subprocess.run([sys.executable, os.path.join(REPO_ROOT, "backends.py"), "convert", "--mode", mode],
+                           env=env, cwd=REPO_ROOT, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        results.append(run_mode(mode, args.workers, args.requests, args.batch_size, env))
+
+    fmt = lambda v: "-" if v is None else f"{v:.1f}"
+    print(f"{'mode':14s} {'workers':>7s} {'RSS/worker':>11s} {'PSS/worker':>11s} {'PSS sidecar':>12s} {'PSS total':>10s} {'img/s':>9s}")
+    for r in results:
+        print(f"{r['mode']:14s} {r['workers']:>7d} {fmt(r['worker_rss_mb']):>11s} {fmt(r['worker_pss_mb']):>11s} "
+              f"{fmt(r['sidecar_pss_mb']):>12s} {fmt(r['total_pss_mb']):>10s} {fmt(r['throughput_img_s']):>9s}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import argparse
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SUITE BENCHMARK PIPELINE: decode -> preprocess -> predict -> rank -> render
+# ═══════════════════════════════════════════════════════════════════════════════
+# Offline & CPU saja: foto sintetis (JPEG/PNG, beberapa ukuran), model stub NumPy atau
+# SavedModel pengganti dengan signature yang sama (benchmarks.stub_model), tanpa download.
+# Tiap tahap diukur sendiri-sendiri, lalu end-to-end per ukuran batch (1..256).
+# Hasil -> JSON datar {"<tahap>/<varian>": {"median_ms": ..., ...}} yang bisa dibandingkan
+# dengan baseline tersimpan; exit code 1 kalau ada tahap yang melambat melewati ambang.
+#
+#   python -m benchmarks.run_suite --output bench.json                      # backend stub
+#   python -m benchmarks.run_suite --stub-savedmodel --output bench.json    # SavedModel kecil (butuh TF)
+#   python -m benchmarks.run_suite --baseline bench_main.json --threshold 0.15
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+import inference  # noqa: E402
+import render_cache  # noqa: E402
+from benchmarks.bench_decode import SIZES, synthetic_photo  # noqa: E402
+from benchmarks.bench_render import serialize_chart  # noqa: E402
+from inference import IMAGE_SIZE, decode_image, model_predict, preprocess_image, rank_predictions  # noqa: E402
+from nutrisi import CLASS_NAMES  # noqa: E402
+
+FORMATS = ("jpeg", "png")
+DEFAULT_BATCH_SIZES = "1,4,16,64,256"
+DEFAULT_THRESHOLD = 0.15
+# Selisih absolut minimum supaya dianggap regresi (tahap mikrodetik terlalu berisik).
+MIN_DELTA_MS = 0.05
+
+def encode(data: bytes, fmt: str) -> bytes:
+    if fmt == "jpeg":
+        return data
+    out = io.BytesIO()
+    with Image.open(io.BytesIO(data)) as img:
+        img.save(out, fmt.upper())
+    return out.getvalue()
+
+def measure(fn, repeats: int, min_time_s: float = 0.0) -> dict:
+    # Satu panggilan pemanasan, lalu minimal `repeats` sampel (lebih kalau total < min_time_s).
+    fn()
+    samples = []
+    started = time.perf_counter()
+    while len(samples) < repeats or time.perf_counter() - started < min_time_s:
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000.0)
+    samples = np.asarray(samples)
+    return {
+        "median_ms": float(np.median(samples)),
+        "p95_ms": float(np.percentile(samples, 95)),
+        "min_ms": float(samples.min()),
+        "samples": int(samples.size),
+    }
+
+def load_model(backend: str, model_dir: str = None):
+    if model_dir:
+        inference.MODEL_DIR_OVERRIDE = os.path.abspath(model_dir)
+    from backends import load_backend
+
+    return load_backend(backend)
+
+def build_stub_savedmodel() -> str:
+    from benchmarks.stub_model import export_stub_model
+
+    return export_stub_model(os.path.join(tempfile.mkdtemp(prefix="fruitscan_suite_"), "model"), arch="tiny")
+
+def bench_decode(results: dict, sizes, repeats: int):
+    for size_name in sizes:
+        jpeg = synthetic_photo(SIZES[size_name], seed=1)
+        for fmt in FORMATS:
+            data = encode(jpeg, fmt)
+            results[f"decode/{fmt}/{size_name}"] = measure(lambda: decode_image(data), repeats) | {"bytes": len(data)}
+
+def bench_preprocess(results: dict, sizes, repeats: int):
+    # Jalur lama preprocess_image (PIL penuh -> 64x64) dari gambar yang sudah di-decode.
+    for size_name in sizes:
+        with Image.open(io.BytesIO(synthetic_photo(SIZES[size_name], seed=2))) as img:
+            image = img.convert("RGB")
+        results[f"preprocess/{size_name}"] = measure(lambda: preprocess_image(image), repeats)
+
+def bench_predict(results: dict, model, batch_sizes, repeats: int):
+    rng = np.random.default_rng(0)
+    for bs in batch_sizes:
+        batch = rng.uniform(0, 255, (bs, IMAGE_SIZE[1], IMAGE_SIZE[0], 3)).astype(np.float32)
+        r = measure(lambda: model_predict(model, batch), repeats)
+        results[f"predict/b{bs}"] = r | {"per_image_ms": r["median_ms"] / bs}
+        logits = np.asarray(model_predict(model, batch), dtype=np.float32)
+        r = measure(lambda: rank_predictions(logits, k=3), repeats)
+        results[f"rank/b{bs}"] = r | {"per_image_ms": r["median_ms"] / bs}
+
+def bench_render(results: dict, repeats: int):
+    names = [render_cache.DISPLAY_NAMES[i] for i in range(len(CLASS_NAMES))]
+    results["render/color_rules_50"] = measure(lambda: [render_cache.fruit_color(n) for n in names], repeats)
+    results["render/color_table_50"] = measure(lambda: [render_cache.class_colors(i) for i in range(len(names))], repeats)
+    results["render/chart_build"] = measure(lambda: serialize_chart(render_cache.nutrition_chart.__wrapped__(3)), repeats)
+    results["render/chart_cached"] = measure(lambda: serialize_chart(render_cache.nutrition_chart(3)), repeats)
+    results["render/html_fragments"] = measure(
+        lambda: (
+            render_cache.result_box_html(3, names[3], "87.5", "Buah Terdeteksi"),
+            render_cache.confidence_bar_html(3, "87.5"),
+            render_cache.nutrition_cards_html(3),
+        ),
+        repeats,
+    )
+
+def bench_end_to_end(results: dict, model, batch_sizes, repeats: int, size_name: str):
+    # bytes JPEG -> decode ke buffer batch -> predict -> rank (+ render untuk batch 1 = jalur UI).
+    photos = [synthetic_photo(SIZES[size_name], seed=10 + i) for i in range(min(max(batch_sizes), 16))]
+    for bs in batch_sizes:
+        buffer = np.empty((bs, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+
+        def _run():
+            for i in range(bs):
+                decode_image(photos[i % len(photos)], out=buffer[i])
+            idxs, probs, _ = rank_predictions(model_predict(model, buffer), k=3)
+            if bs == 1:
+                idx = int(idxs[0, 0])
+                render_cache.result_box_html(idx, render_cache.DISPLAY_NAMES[idx], f"{probs[0, 0] * 100:.1f}", "Buah Terdeteksi")
+                serialize_chart(render_cache.nutrition_chart(idx))
+
+        r = measure(_run, max(3, repeats // max(1, bs // 16)))
+        results[f"e2e/{size_name}/b{bs}"] = r | {"per_image_ms": r["median_ms"] / bs, "images_per_s": 1000.0 * bs / r["median_ms"]}
+
+def environment(model) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit or None,
+        "backend": getattr(model, "name", type(model).__name__),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD, min_delta_ms: float = MIN_DELTA_MS, metric: str = "median_ms"):
+    # -> list baris perbandingan untuk kunci yang ada di kedua hasil; "regression" = lebih lambat
+    # dari baseline x (1 + threshold) DAN selisihnya >= min_delta_ms.
+    rows = []
+    for key in sorted(set(current) & set(baseline)):
+        now, before = current[key][metric], baseline[key][metric]
+        ratio = now / before if before > 0 else float("inf")
+        rows.append({
+            "key": key,
+            "baseline_ms": before,
+            "current_ms": now,
+            "ratio": ratio,
+            "regression": ratio > 1.0 + threshold and now - before >= min_delta_ms,
+        })
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark per tahap & end-to-end pipeline FruitScan (CPU, offline).")
+    parser.add_argument("--backend", default="stub", help="stub (default), savedmodel, tflite-fp32, ...")
+    parser.add_argument("--model-dir", default=None, help="Folder SavedModel untuk backend savedmodel/tflite")
+    parser.add_argument("--stub-savedmodel", action="store_true", help="Buat SavedModel pengganti kecil (butuh TensorFlow)")
+    parser.add_argument("--sizes", default="vga,1mp,3mp", help=f"Ukuran foto: {','.join(SIZES)}")
+    parser.add_argument("--batch-sizes", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--e2e-size", default="1mp", choices=list(SIZES))
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--stages", default="decode,preprocess,predict,render,e2e")
+    parser.add_argument("--output", "-o", default=None, help="Tulis hasil JSON ke file ini")
+    parser.add_argument("--baseline", default=None, help="Hasil JSON sebelumnya untuk dibandingkan")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Batas perlambatan relatif (0.15 = 15%%)")
+    parser.add_argument("--metric", choices=["median_ms", "min_ms", "p95_ms"], default="median_ms",
+                        help="Angka yang dibandingkan (min_ms lebih stabil di mesin yang berisik)")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    model_dir = args.model_dir
+    backend = args.backend
+    if args.stub_savedmodel:
+        model_dir = build_stub_savedmodel()
+        backend = "savedmodel" if backend == "stub" else backend
+    model = load_model(backend, model_dir)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(",") if b.strip()]
+    stages = {s.strip() for s in args.stages.split(",")}
+
+    results = {}
+    if "decode" in stages:
+        bench_decode(results, sizes, args.repeats)
+    if "preprocess" in stages:
+        bench_preprocess(results, sizes, args.repeats)
+    if "predict" in stages:
+        bench_predict(results, model, batch_sizes, args.repeats)
+    if "render" in stages:
+        bench_render(results, args.repeats)
+    if "e2e" in stages:
+        bench_end_to_end(results, model, batch_sizes, args.repeats, args.e2e_size)
+
+    print(f"backend: {getattr(model, 'name', '?')}")
+    print(f"{'tahap':28s} {'median ms':>10s} {'p95 ms':>9s} {'ms/gambar':>10s}")
+    for key, r in results.items():
+        per_image = f"{r['per_image_ms']:.3f}" if "per_image_ms" in r else ""
+        print(f"{key:28s} {r['median_ms']:>10.3f} {r['p95_ms']:>9.3f} {per_image:>10s}")
+
+    report = {"environment": environment(model), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base_backend = baseline.get("environment", {}).get("backend")
+    if base_backend and base_backend != report["environment"]["backend"]:
+        print(f"Peringatan: baseline memakai backend {base_backend}, sekarang {report['environment']['backend']}.", file=sys.stderr)
+    rows = compare(results, baseline.get("results", {}), threshold=args.threshold, metric=args.metric)
+    regressions = [r for r in rows if r["regression"]]
+    print(f"\nvs baseline {args.baseline} ({baseline.get('environment', {}).get('commit') or '?'}), ambang +{args.threshold * 100:.0f}% ({args.metric}):")
+    for r in rows:
+        flag = "  REGRESI" if r["regression"] else ""
+        print(f"{r['key']:28s} {r['baseline_ms']:>10.3f} -> {r['current_ms']:>10.3f} ({(r['ratio'] - 1) * 100:+6.1f}%){flag}")
+    if regressions:
+        print(f"{len(regressions)} tahap melambat melewati ambang.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import argparse
+import os
+import shutil
+import sys
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODEL PENGGANTI UNTUK BENCHMARK/TES OFFLINE
+# ═══════════════════════════════════════════════════════════════════════════════
+# Membuat SavedModel dengan signature yang sama seperti model asli
+# (input float32 (None, 64, 64, 3) piksel 0-255, output 50 logits) tanpa perlu download.
+#   --arch tiny     : beberapa layer kecil, cepat dibuat (untuk tes fungsional)
+#   --arch resnet50 : ResNet50 bobot acak, ukuran & latensi realistis (untuk benchmark)
+#
+#   python -m benchmarks.stub_model /tmp/fruitscan_stub --arch resnet50 --zip
+
+def build_stub_model(arch: str = "tiny", num_classes: int = 50, seed: int = 0):
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    inputs = tf.keras.Input((64, 64, 3), name="input_layer")
+    if arch == "resnet50":
+        x = tf.keras.applications.resnet50.preprocess_input(inputs)
+        backbone = tf.keras.applications.ResNet50(
+            include_top=False, weights=None, input_shape=(64, 64, 3), pooling="avg"
+        )
+        x = backbone(x)
+    elif arch == "tiny":
+        x = tf.keras.layers.Rescaling(1.0 / 255)(inputs)
+        x = tf.keras.layers.Conv2D(16, 3, strides=2, activation="relu")(x)
+        x = tf.keras.layers.Conv2D(32, 3, strides=2, activation="relu")(x)
+        x = tf.keras.layers.GlobalAveragePooling2D()(x)
+        x = tf.keras.layers.Dense(64, activation="relu", name="embedding")(x)
+    else:
+        raise ValueError(f"Arsitektur tidak dikenal: {arch}")
+    outputs = tf.keras.layers.Dense(num_classes, name="logits")(x)
+    return tf.keras.Model(inputs, outputs)
+
+def export_stub_model(export_dir: str, arch: str = "tiny", num_classes: int = 50, seed: int = 0, make_zip: bool = False):
+    # Ikut menyertakan signature "embedding" (layer sebelum logits), lihat embeddings.py.
+    from embeddings import export_with_embedding
+
+    model = build_stub_model(arch=arch, num_classes=num_classes, seed=seed)
+    if os.path.exists(export_dir):
+        shutil.rmtree(export_dir)
+    export_with_embedding(model, export_dir)
+    if make_zip:
+        return shutil.make_archive(export_dir, "zip", os.path.dirname(os.path.abspath(export_dir)), os.path.basename(export_dir))
+    return export_dir
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Buat SavedModel pengganti dengan signature FruitScan.")
+    parser.add_argument("export_dir")
+    parser.add_argument("--arch", choices=["tiny", "resnet50"], default="tiny")
+    parser.add_argument("--num-classes", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zip", action="store_true", help="Sekalian buat <export_dir>.zip (untuk FRUITSCAN_MODEL_URL)")
+    args = parser.parse_args(argv)
+
+    out = export_stub_model(args.export_dir, arch=args.arch, num_classes=args.num_classes, seed=args.seed, make_zip=args.zip)
+    print(out)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference import (
+    CALIBRATION_PATH,
+    IMAGE_SIZE,
+    Calibration,
+    expected_calibration_error,
+    fit_temperature,
+    get_display_name,
+    iter_image_paths,
+    load_image_array,
+    probabilities_from_logits,
+    softmax_nll,
+)
+from nutrisi import CLASS_NAMES
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# KALIBRASI CONFIDENCE (temperature scaling) DARI FOLDER BERLABEL
+# ═══════════════════════════════════════════════════════════════════════════════
+# Struktur folder: <root>/<nama kelas persis seperti CLASS_NAMES>/*.jpg
+# (mis. /data/val/Banana/foto.jpg; akhiran nomor varian seperti "Banana 3" juga diterima).
+# Folder yang namanya bukan kelas dilewati.
+# Hasil (suhu T + ambang penolakan "unknown") disimpan ke calibration.json yang
+# otomatis dibaca inference.get_calibration().
+#
+#   python calibrate.py /data/val --keep 0.95
+#   python calibrate.py /data/val --backend tflite-fp16 --output calibration.json
+
+def labelled_paths(root: str):
+    lookup = {name.lower(): i for i, name in enumerate(CLASS_NAMES)}
+    paths, labels, skipped = [], [], set()
+    for entry in sorted(os.listdir(root)):
+        class_dir = os.path.join(root, entry)
+        if not os.path.isdir(class_dir):
+            continue
+        # "Banana 3" (penomoran varian dataset) tetap dipetakan ke kelas "Banana".
+        label = lookup.get(entry.lower(), lookup.get(get_display_name(entry).lower()))
+        if label is None:
+            skipped.add(entry)
+            continue
+        for path in iter_image_paths(class_dir):
+            paths.append(path)
+            labels.append(label)
+    return paths, np.asarray(labels, dtype=np.int64), sorted(skipped)
+
+def collect_logits(model, paths, batch_size: int = 256, workers: int = 8, log=print):
+    logits, kept = [], []
+    batch = np.empty((batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor:
+        for start in range(0, len(paths), batch_size):
+            chunk = paths[start:start + batch_size]
+            n = 0
+            for i, ok in zip(range(start, start + len(chunk)), executor.map(_decode_ok, chunk)):
+                if ok is None:
+                    continue
+                batch[n] = ok
+                kept.append(i)
+                n += 1
+            if n:
+                logits.append(np.asarray(model(batch[:n]), dtype=np.float32))
+            log(f"{min(start + batch_size, len(paths))}/{len(paths)} gambar")
+    if not logits:
+        return np.empty((0, len(CLASS_NAMES)), dtype=np.float32), np.asarray(kept, dtype=np.int64)
+    return np.concatenate(logits, axis=0), np.asarray(kept, dtype=np.int64)
+
+def _decode_ok(path: str):
+    try:
+        return load_image_array(path)
+    except Exception:
+        return None
+
+def calibrate(logits: np.ndarray, labels: np.ndarray, keep: float = 0.95) -> Calibration:
+    temperature = fit_temperature(logits, labels)
+    before = probabilities_from_logits(logits)
+    after = probabilities_from_logits(logits / temperature)
+    pred = np.argmax(after, axis=1)
+    correct = pred == labels
+    conf_before, conf_after = before.max(axis=1), after.max(axis=1)
+
+    # Ambang penolakan: confidence terkalibrasi yang masih menerima `keep` bagian prediksi benar.
+    threshold = float(np.quantile(conf_after[correct], 1.0 - keep)) if correct.any() and keep < 1.0 else 0.0
+
+    return Calibration(
+        temperature=temperature,
+        reject_threshold=threshold,
+        meta={
+            "images": int(len(labels)),
+            "num_classes": int(logits.shape[1]),
+            "accuracy": float(correct.mean()) if len(labels) else 0.0,
+            "nll_before": softmax_nll(logits, labels),
+            "nll_after": softmax_nll(logits, labels, temperature),
+            "ece_before": expected_calibration_error(conf_before, correct),
+            "ece_after": expected_calibration_error(conf_after, correct),
+            "keep": keep,
+            "rejected_fraction": float((conf_after < threshold).mean()) if len(labels) else 0.0,
+        },
+    )
+
+def main(argv=None):
+    from backends import BACKEND_NAMES, DEFAULT_BACKEND, load_backend
+
+    parser = argparse.ArgumentParser(description="Fit temperature scaling & ambang 'unknown' dari folder berlabel.")
+    parser.add_argument("input_dir", help="Folder berisi subfolder per kelas")
+    parser.add_argument("--output", "-o", default=CALIBRATION_PATH)
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKEND_NAMES)
+    parser.add_argument("--keep", type=float, default=0.95, help="Bagian prediksi benar yang tetap diterima (0-1); 1 = tanpa penolakan")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=min(8, (os.cpu_count() or 1) + 4))
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Folder tidak ditemukan: {args.input_dir}")
+    if not 0.0 < args.keep <= 1.0:
+        parser.error("--keep harus di antara 0 dan 1")
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    paths, labels, skipped = labelled_paths(args.input_dir)
+    if skipped:
+        log(f"Folder bukan nama kelas, dilewati: {', '.join(skipped)}")
+    if not paths:
+        parser.error("Tidak ada gambar berlabel yang ditemukan")
+
+    model = load_backend(args.backend, status_callback=log)
+    logits, kept = collect_logits(model, paths, batch_size=args.batch_size, workers=args.workers, log=log)
+    if len(kept) == 0:
+        parser.error("Tidak ada gambar yang bisa dibaca")
+
+    calibration = calibrate(logits, labels[kept], keep=args.keep)
+    calibration.meta["backend"] = getattr(model, "name", args.backend)
+    calibration.save(args.output)
+
+    m = calibration.meta
+    print(
+        f"T = {calibration.temperature:.3f} · ambang unknown = {calibration.reject_threshold * 100:.1f}% "
+        f"({m['rejected_fraction'] * 100:.1f}% data validasi ditolak)\n"
+        f"NLL {m['nll_before']:.4f} -> {m['nll_after']:.4f} · ECE {m['ece_before']:.4f} -> {m['ece_after']:.4f} · "
+        f"akurasi {m['accuracy'] * 100:.1f}% ({m['images']} gambar) -> {args.output}"
+    )
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
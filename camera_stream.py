@@ -0,0 +1,296 @@
+import importlib
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from inference import IMAGE_EXTENSIONS, IMAGE_SIZE, Calibration, get_calibration, probabilities_from_logits, rank_predictions
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# KLASIFIKASI STREAM KAMERA / VIDEO (real-time)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Thread capture membaca frame secepat sumbernya dan menaruhnya di slot "latest frame wins":
+# kalau inferensi tertinggal, frame lama ditimpa (dihitung sebagai dropped), jadi hasil selalu
+# untuk frame terbaru dan antrian tidak pernah menumpuk. Thread inferensi mengambil frame
+# terbaru, resize ke 64x64, prediksi, lalu menghaluskan probabilitas dengan EMA supaya label
+# tidak berkedip antar frame. Hasil yang sudah dihaluskan diranking lewat rank_predictions dengan
+# ambang reject dari calibration.json, sama seperti mode foto, jadi benda asing tampil "unknown".
+# Streamlit tidak memberi tahu saat tab ditutup, jadi stream berhenti sendiri (dan melepas
+# webcam) kalau snapshot() tidak dipanggil selama IDLE_TIMEOUT_S detik.
+# Sumber: indeks webcam ("0"), file video (butuh OpenCV), atau folder berisi frame JPG/PNG.
+# OpenCV opsional: `pip install opencv-python-headless` untuk webcam & file video.
+
+DEFAULT_SOURCE = os.environ.get("FRUITSCAN_CAMERA_SOURCE", "0")
+IDLE_TIMEOUT_S = float(os.environ.get("FRUITSCAN_STREAM_IDLE_S", "30"))
+EMA_ALPHA = 0.3
+PREVIEW_WIDTH = 480
+STATS_WINDOW = 120
+
+def _cv2():
+    try:
+        return importlib.import_module("cv2")
+    except ImportError as e:
+        raise RuntimeError("OpenCV belum terpasang: pip install opencv-python-headless") from e
+
+def opencv_available() -> bool:
+    try:
+        _cv2()
+        return True
+    except RuntimeError:
+        return False
+
+class VideoSource:
+    # Webcam (indeks) atau file video lewat OpenCV. File diputar mengikuti FPS aslinya
+    # (realtime=True) supaya perilakunya sama seperti kamera sungguhan.
+    def __init__(self, source, realtime: bool = True, loop: bool = False):
+        cv2 = _cv2()
+        self._cv2 = cv2
+        self.is_file = not str(source).isdigit()
+        self._capture = cv2.VideoCapture(str(source) if self.is_file else int(source))
+        if not self._capture.isOpened():
+            raise RuntimeError(f"Sumber video tidak bisa dibuka: {source}")
+        fps = self._capture.get(cv2.CAP_PROP_FPS) or 0.0
+        self.fps = fps if fps > 0 else 30.0
+        self.realtime = realtime and self.is_file
+        self.loop = loop and self.is_file
+        self._next_at = None
+
+    def read(self):
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next_at is not None and now < self._next_at:
+                time.sleep(self._next_at - now)
+            self._next_at = max(now, self._next_at or now) + 1.0 / self.fps
+        ok, frame = self._capture.read()
+        if not ok and self.loop:
+            self._capture.set(self._cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self._capture.read()
+        if not ok:
+            return None
+        return self._cv2.cvtColor(frame, self._cv2.COLOR_BGR2RGB)
+
+    def close(self):
+        self._capture.release()
+
+class FolderSource:
+    # Folder berisi frame berurutan (frame_0001.jpg, ...); tanpa OpenCV, untuk tes & demo.
+    def __init__(self, folder: str, fps: float = 15.0, realtime: bool = True, loop: bool = False):
+        self.paths = sorted(
+            os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)
+        )
+        if not self.paths:
+            raise RuntimeError(f"Tidak ada frame gambar di {folder}")
+        self.fps = fps
+        self.realtime = realtime
+        self.loop = loop
+        self._pos = 0
+        self._next_at = None
+
+    def read(self):
+        if self._pos >= len(self.paths):
+            if not self.loop:
+                return None
+            self._pos = 0
+        if self.realtime:
+            now = time.perf_counter()
+            if self._next_at is not None and now < self._next_at:
+                time.sleep(self._next_at - now)
+            self._next_at = max(now, self._next_at or now) + 1.0 / self.fps
+        with Image.open(self.paths[self._pos]) as img:
+            frame = np.asarray(img.convert("RGB"))
+        self._pos += 1
+        return frame
+
+    def close(self):
+        pass
+
+def open_source(source, realtime: bool = True, loop: bool = False):
+    source = str(source).strip()
+    if os.path.isdir(source):
+        return FolderSource(source, realtime=realtime, loop=loop)
+    return VideoSource(source, realtime=realtime, loop=loop)
+
+class LatestFrameSlot:
+    # Antrian berkapasitas 1: put() selalu menimpa; frame yang belum sempat diambil = dropped.
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout: float = None):
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._item is not None or self._closed, timeout=timeout):
+                return None
+            item, self._item = self._item, None
+            return item
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+def frame_to_input(frame: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    # Crop persegi di tengah (buah biasanya di tengah meja kasir) lalu resize ke 64x64.
+    h, w = frame.shape[:2]
+    side = min(h, w)
+    y0, x0 = (h - side) // 2, (w - side) // 2
+    square = Image.fromarray(frame[y0:y0 + side, x0:x0 + side])
+    if out is None:
+        out = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    out[0] = np.asarray(square.resize(IMAGE_SIZE, Image.BILINEAR))
+    return out
+
+class StreamClassifier:
+    def __init__(self, source, predict_fn, ema_alpha: float = EMA_ALPHA, preview_width: int = PREVIEW_WIDTH,
+                 k: int = 3, idle_timeout: float = IDLE_TIMEOUT_S):
+        self.source = source
+        self.predict_fn = predict_fn
+        self.ema_alpha = float(ema_alpha)
+        self.preview_width = preview_width
+        self.k = k
+        self.idle_timeout = idle_timeout
+
+        self._slot = LatestFrameSlot()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._smoothed = None
+        self._ranked = None
+        self._preview = None
+        self._error = None
+        self._finished = False
+        self._idle_stopped = False
+        self._polled_at = None
+
+        self.frames_captured = 0
+        self.frames_inferred = 0
+        self._infer_ms = deque(maxlen=STATS_WINDOW)
+        self._e2e_ms = deque(maxlen=STATS_WINDOW)
+        self._inferred_at = deque(maxlen=STATS_WINDOW)
+        self._started_at = None
+
+        self._capture_thread = threading.Thread(target=self._capture_loop, name="stream-capture", daemon=True)
+        self._infer_thread = threading.Thread(target=self._infer_loop, name="stream-infer", daemon=True)
+
+    def start(self):
+        self._started_at = self._polled_at = time.perf_counter()
+        self._capture_thread.start()
+        self._infer_thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0):
+        self._stop.set()
+        self._slot.close()
+        for thread in (self._capture_thread, self._infer_thread):
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        self.source.close()
+
+    @property
+    def running(self) -> bool:
+        return self._infer_thread.is_alive()
+
+    def _capture_loop(self):
+        try:
+            while not self._stop.is_set():
+                frame = self.source.read()
+                if frame is None:
+                    break
+                self.frames_captured += 1
+                self._slot.put((time.perf_counter(), frame))
+        except Exception as e:
+            self._error = str(e)
+        finally:
+            self._finished = True
+            self._slot.close()
+            # Lepas webcam/file di thread pemiliknya, juga saat berhenti karena idle.
+            self.source.close()
+
+    def _infer_loop(self):
+        buffer = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+        calibration = get_calibration()
+        # Probabilitas sudah dibagi temperature sebelum EMA; ranking cukup pakai ambang reject-nya.
+        smoothed_calibration = Calibration(temperature=1.0, reject_threshold=calibration.reject_threshold)
+        while not self._stop.is_set():
+            if self.idle_timeout and time.perf_counter() - self._polled_at > self.idle_timeout:
+                self._idle_stopped = True
+                self._stop.set()
+                break
+            item = self._slot.get(timeout=0.5)
+            if item is None:
+                if self._finished:
+                    break
+                continue
+            captured_at, frame = item
+            try:
+                frame_to_input(frame, out=buffer)
+                started = time.perf_counter()
+                logits = np.asarray(self.predict_fn(buffer), dtype=np.float32)
+                done = time.perf_counter()
+            except Exception as e:
+                self._error = str(e)
+                break
+
+            probs = probabilities_from_logits(logits / calibration.temperature)[0]
+            preview = Image.fromarray(frame)
+            preview.thumbnail((self.preview_width, self.preview_width))
+            with self._lock:
+                if self._smoothed is None:
+                    self._smoothed = probs
+                else:
+                    self._smoothed = self.ema_alpha * probs + (1.0 - self.ema_alpha) * self._smoothed
+                smoothed_logits = np.log(np.maximum(self._smoothed, 1e-12))[np.newaxis]
+                self._ranked = rank_predictions(smoothed_logits, k=self.k, calibration=smoothed_calibration)
+                self._preview = preview
+                self.frames_inferred += 1
+                self._infer_ms.append((done - started) * 1000.0)
+                self._e2e_ms.append((done - captured_at) * 1000.0)
+                self._inferred_at.append(done)
+
+    def snapshot(self) -> dict:
+        self._polled_at = time.perf_counter()
+        with self._lock:
+            ranked = self._ranked
+            preview = self._preview
+            infer_ms = np.asarray(self._infer_ms, dtype=np.float64)
+            e2e_ms = np.asarray(self._e2e_ms, dtype=np.float64)
+            inferred_at = list(self._inferred_at)
+            frames_inferred = self.frames_inferred
+
+        elapsed = max(time.perf_counter() - (self._started_at or time.perf_counter()), 1e-9)
+        window_fps = 0.0
+        if len(inferred_at) >= 2:
+            window_fps = (len(inferred_at) - 1) / max(inferred_at[-1] - inferred_at[0], 1e-9)
+
+        top, unknown = [], False
+        if ranked is not None:
+            idxs, probs, rejected = ranked
+            top = [(int(i), float(p)) for i, p in zip(idxs[0], probs[0])]
+            unknown = bool(rejected[0])
+        return {
+            "top": top,
+            "unknown": unknown,
+            "preview": preview,
+            "fps": window_fps,
+            "capture_fps": self.frames_captured / elapsed,
+            "frames_captured": self.frames_captured,
+            "frames_inferred": frames_inferred,
+            "frames_dropped": self._slot.dropped,
+            "infer_ms_p50": float(np.percentile(infer_ms, 50)) if infer_ms.size else 0.0,
+            "infer_ms_p95": float(np.percentile(infer_ms, 95)) if infer_ms.size else 0.0,
+            "latency_ms_p50": float(np.percentile(e2e_ms, 50)) if e2e_ms.size else 0.0,
+            "running": self.running,
+            "finished": self._finished,
+            "idle_stopped": self._idle_stopped,
+            "error": self._error,
+        }
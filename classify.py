@@ -0,0 +1,223 @@
+import argparse
+import array
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from inference import (
+    IMAGE_SIZE,
+    UNKNOWN_LABEL,
+    get_display_name,
+    iter_image_paths,
+    load_image_array,
+    model_predict,
+    rank_predictions,
+)
+from nutrisi import CLASS_NAMES
+from tta import MAX_VIEWS, predict_tta
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CLI KLASIFIKASI MASSAL (tanpa Streamlit)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Contoh:
+#   python classify.py /data/foto --output hasil.jsonl --batch-size 256 --workers 8
+# Hasil ditulis per batch (append + flush), jadi kalau proses mati di tengah jalan,
+# jalankan perintah yang sama lagi dan file yang sudah tercatat akan dilewati. Baris dengan
+# `error` tidak dihitung selesai, jadi dicoba lagi; yang berlaku adalah baris terakhir per path.
+
+OUTPUT_FIELDS = ["path", "class_index", "class_name", "display_name", "confidence", "error"]
+
+def _repair_partial_tail(path: str):
+    # Kalau proses mati saat menulis, baris terakhir bisa terpotong: buang sampai newline terakhir.
+    with open(path, "rb+") as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b"\n":
+            return
+        block = 64 * 1024
+        pos = size
+        while pos > 0:
+            start = max(0, pos - block)
+            f.seek(start)
+            chunk = f.read(pos - start)
+            nl = chunk.rfind(b"\n")
+            if nl != -1:
+                f.truncate(start + nl + 1)
+                return
+            pos = start
+        f.truncate(0)
+
+def _path_key(path: str) -> int:
+    return int.from_bytes(hashlib.blake2b(os.fsencode(path), digest_size=8).digest(), "little")
+
+class DonePaths:
+    # Path yang sudah selesai disimpan sebagai hash 64-bit terurut (8 byte per file), bukan set
+    # string, supaya resume pada output jutaan baris tetap hemat memori.
+    def __init__(self, keys=None):
+        self._keys = np.sort(np.asarray(keys if keys is not None else [], dtype=np.uint64))
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, path: str) -> bool:
+        key = np.uint64(_path_key(path))
+        i = int(np.searchsorted(self._keys, key))
+        return i < len(self._keys) and self._keys[i] == key
+
+def load_done_paths(path: str, fmt: str) -> DonePaths:
+    if not os.path.exists(path):
+        return DonePaths()
+    _repair_partial_tail(path)
+    keys = array.array("Q")
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if fmt == "csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (_parse_json_row(line) for line in f)
+        for row in rows:
+            if row and row.get("path") and not row.get("error"):
+                keys.append(_path_key(row["path"]))
+    return DonePaths(np.frombuffer(keys, dtype=np.uint64) if keys else None)
+
+def _parse_json_row(line: str):
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+class ResultWriter:
+    def __init__(self, path: str, fmt: str):
+        self.fmt = fmt
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._f = open(path, "a", encoding="utf-8", newline="")
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.DictWriter(self._f, fieldnames=OUTPUT_FIELDS)
+            if is_new:
+                self._csv.writeheader()
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self._csv is not None:
+                self._csv.writerow(row)
+            else:
+                self._f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def close(self):
+        self._f.close()
+
+def _decode(path: str):
+    try:
+        return path, load_image_array(path), None
+    except Exception as e:
+        return path, None, str(e)
+
+def _prefetched(paths, executor, depth: int):
+    # Jaga maksimal `depth` decode yang berjalan/menunggu, supaya memori tetap terbatas.
+    pending = deque()
+    for path in paths:
+        pending.append(executor.submit(_decode, path))
+        if len(pending) >= depth:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def classify_directory(model, root: str, output: str, batch_size: int = 256, workers: int = 8, fmt: str = None, log=print, tta_views: int = 1):
+    fmt = fmt or ("csv" if output.lower().endswith(".csv") else "jsonl")
+    done = load_done_paths(output, fmt)
+    if done:
+        log(f"Resume: {len(done)} file sudah tercatat di {output}, dilewati.")
+
+    paths = (p for p in iter_image_paths(root) if p not in done)
+    writer = ResultWriter(output, fmt)
+    batch = np.empty((batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    batch_paths, error_rows = [], []
+    processed = 0
+    started = time.perf_counter()
+
+    def _flush():
+        nonlocal processed
+        rows = []
+        if batch_paths:
+            logits = predict_tta(lambda x: model_predict(model, x), batch[:len(batch_paths)], tta_views)
+            idxs, probs, rejected = rank_predictions(logits, k=1)
+            for path, idx, prob, is_unknown in zip(batch_paths, idxs[:, 0], probs[:, 0], rejected):
+                raw_name = UNKNOWN_LABEL if is_unknown else CLASS_NAMES[int(idx)]
+                rows.append({
+                    "path": path,
+                    "class_index": None if is_unknown else int(idx),
+                    "class_name": raw_name,
+                    "display_name": raw_name if is_unknown else get_display_name(raw_name),
+                    "confidence": round(float(prob * 100.0), 4),
+                    "error": None,
+                })
+        rows.extend(error_rows)
+        writer.write_rows(rows)
+        processed += len(rows)
+        batch_paths.clear()
+        error_rows.clear()
+        elapsed = time.perf_counter() - started
+        log(f"{processed} gambar selesai ({processed / max(elapsed, 1e-9):.1f} gambar/detik)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor:
+            for path, arr, err in _prefetched(paths, executor, depth=batch_size * 2):
+                if err is not None:
+                    error_rows.append({field: None for field in OUTPUT_FIELDS} | {"path": path, "error": err})
+                else:
+                    batch[len(batch_paths)] = arr
+                    batch_paths.append(path)
+                if len(batch_paths) == batch_size or len(error_rows) >= batch_size:
+                    _flush()
+            if batch_paths or error_rows:
+                _flush()
+    finally:
+        writer.close()
+
+    return processed
+
+def main(argv=None):
+    from backends import BACKEND_NAMES, DEFAULT_BACKEND, load_backend
+
+    parser = argparse.ArgumentParser(description="Klasifikasi semua gambar buah dalam satu folder (rekursif).")
+    parser.add_argument("input_dir", help="Folder berisi gambar .jpg/.jpeg/.png")
+    parser.add_argument("--output", "-o", default="predictions.jsonl", help="File hasil (.jsonl atau .csv)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="Paksa format output")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKEND_NAMES)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=min(8, (os.cpu_count() or 1) + 4), help="Thread decode gambar")
+    parser.add_argument("--tta-views", type=int, default=1, choices=range(1, MAX_VIEWS + 1), metavar=f"1-{MAX_VIEWS}",
+                        help="Test-time augmentation: jumlah view per gambar (1 = mati)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Folder tidak ditemukan: {args.input_dir}")
+
+    model = load_backend(args.backend, status_callback=lambda msg: print(msg, file=sys.stderr))
+    total = classify_directory(
+        model,
+        args.input_dir,
+        args.output,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        fmt=args.format,
+        log=lambda msg: print(msg, file=sys.stderr),
+        tta_views=args.tta_views,
+    )
+    print(f"Selesai: {total} gambar baru diklasifikasi -> {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
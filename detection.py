@@ -0,0 +1,179 @@
+import io
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from PIL import Image, ImageDraw, ImageOps
+
+from inference import IMAGE_SIZE, get_display_name, rank_predictions
+from nutrisi import CLASS_NAMES, NUTRITION
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DETEKSI BANYAK BUAH: TILING MULTI-SKALA + NMS (semua NumPy)
+# ═══════════════════════════════════════════════════════════════════════════════
+# 1. Foto di-decode SEKALI ke resolusi kerja (sisi panjang <= DETECTION_MAX_SIDE, JPEG lewat
+#    draft), jadi foto 4K dan foto 1 MP butuh kerja yang sama.
+# 2. Untuk tiap skala jendela (fraksi sisi pendek), gambar kerja di-resize supaya jendela
+#    tepat 64x64, lalu semua tile diambil dengan sliding_window_view (tanpa resize per tile).
+# 3. Semua tile dari semua skala -> satu batch -> satu panggilan model.
+# 4. Tile dengan confidence terkalibrasi >= min_score digabung dengan NMS per kelas.
+# Jumlah tile dibatasi max_tiles (stride dilebarkan kalau perlu) -> anggaran CPU tetap.
+
+DETECTION_MAX_SIDE = 768
+WINDOW_FRACTIONS = (1.0, 0.6, 0.35)
+STRIDE_FRACTION = 0.5
+MAX_TILES = 192
+MIN_SCORE = 0.5
+IOU_THRESHOLD = 0.3
+
+def load_detection_image(source, max_side: int = DETECTION_MAX_SIDE):
+    # -> (array uint8 (H, W, 3) resolusi kerja, faktor pengali ke koordinat foto asli).
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        # Sisi panjang tidak berubah oleh rotasi EXIF, jadi cukup dicatat sebelum draft.
+        original_long_side = max(img.size)
+        if img.format == "JPEG":
+            img.draft("RGB", (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.thumbnail((max_side, max_side))
+    scale = original_long_side / max(img.size)
+    return np.asarray(img), scale
+
+def _window_starts(length: int, window: int, stride: int) -> np.ndarray:
+    if length <= window:
+        return np.zeros(1, dtype=np.intp)
+    starts = np.arange(0, length - window + 1, max(1, stride))
+    if starts[-1] != length - window:
+        starts = np.append(starts, length - window)
+    return starts
+
+def _plan_scales(height: int, width: int, window_fractions, stride_fraction: float):
+    # Per skala: ukuran gambar setelah resize + posisi awal jendela (sumbu y dan x).
+    tile_h, tile_w = IMAGE_SIZE[1], IMAGE_SIZE[0]
+    short = min(height, width)
+    plans = []
+    for frac in window_fractions:
+        factor = tile_h / max(frac * short, 1.0)
+        h = max(tile_h, int(round(height * factor)))
+        w = max(tile_w, int(round(width * factor)))
+        stride = int(round(tile_h * stride_fraction))
+        plans.append((factor, h, w, _window_starts(h, tile_h, stride), _window_starts(w, tile_w, stride)))
+    return plans
+
+def tile_image(image: np.ndarray, window_fractions=WINDOW_FRACTIONS, stride_fraction: float = STRIDE_FRACTION, max_tiles: int = MAX_TILES):
+    # -> tiles float32 (T, 64, 64, 3) dan boxes float32 (T, 4) [x0, y0, x1, y1] di koordinat `image`.
+    height, width = image.shape[:2]
+    plans = _plan_scales(height, width, window_fractions, stride_fraction)
+    total = sum(len(ys) * len(xs) for _, _, _, ys, xs in plans)
+    while total > max_tiles and stride_fraction < 1.0:
+        stride_fraction = min(1.0, stride_fraction * np.sqrt(total / max_tiles))
+        plans = _plan_scales(height, width, window_fractions, stride_fraction)
+        total = sum(len(ys) * len(xs) for _, _, _, ys, xs in plans)
+
+    tile_h, tile_w = IMAGE_SIZE[1], IMAGE_SIZE[0]
+    tiles = np.empty((total, tile_h, tile_w, 3), dtype=np.float32)
+    boxes = np.empty((total, 4), dtype=np.float32)
+    source = Image.fromarray(image)
+    pos = 0
+    for factor, h, w, ys, xs in plans:
+        scaled = np.asarray(source.resize((w, h), Image.BILINEAR))
+        windows = sliding_window_view(scaled, (tile_h, tile_w), axis=(0, 1))  # (h', w', 3, 64, 64)
+        picked = windows[ys[:, None], xs[None, :]]                              # (ny, nx, 3, 64, 64)
+        n = picked.shape[0] * picked.shape[1]
+        tiles[pos:pos + n] = picked.reshape(n, 3, tile_h, tile_w).transpose(0, 2, 3, 1)
+
+        grid_y, grid_x = np.meshgrid(ys, xs, indexing="ij")
+        boxes[pos:pos + n, 0] = grid_x.ravel() / factor
+        boxes[pos:pos + n, 1] = grid_y.ravel() / factor
+        boxes[pos:pos + n, 2] = np.minimum((grid_x.ravel() + tile_w) / factor, width)
+        boxes[pos:pos + n, 3] = np.minimum((grid_y.ravel() + tile_h) / factor, height)
+        pos += n
+    return tiles[:pos], boxes[:pos]
+
+def box_iou(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    # (A, 4) x (B, 4) -> matriks IoU (A, B).
+    x0 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y0 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x1 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y1 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou_threshold: float = IOU_THRESHOLD) -> np.ndarray:
+    # NMS per kelas: matriks IoU dihitung sekali, box beda kelas tidak saling menekan.
+    # Loop hanya atas box yang lolos (biasanya sedikit), penekanan tiap langkah tervektorisasi.
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+    order = np.argsort(-scores, kind="stable")
+    boxes, classes = boxes[order], classes[order]
+    overlap = (box_iou(boxes, boxes) > iou_threshold) & (classes[:, None] == classes[None, :])
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    keep = []
+    for i in range(len(boxes)):
+        if suppressed[i]:
+            continue
+        keep.append(i)
+        suppressed |= overlap[i]
+    return order[np.asarray(keep, dtype=np.intp)]
+
+def detect_fruits(image: np.ndarray, predict_fn, scale_to_original: float = 1.0, min_score: float = MIN_SCORE,
+                  iou_threshold: float = IOU_THRESHOLD, window_fractions=WINDOW_FRACTIONS, max_tiles: int = MAX_TILES):
+    tiles, boxes = tile_image(image, window_fractions=window_fractions, max_tiles=max_tiles)
+    idxs, probs, rejected = rank_predictions(predict_fn(tiles), k=1)
+    classes, scores = idxs[:, 0], probs[:, 0]
+
+    candidates = np.flatnonzero((scores >= min_score) & ~rejected)
+    keep = candidates[nms(boxes[candidates], scores[candidates], classes[candidates], iou_threshold)]
+
+    detections = []
+    for i in keep:
+        raw_name = CLASS_NAMES[int(classes[i])]
+        detections.append({
+            "box": [round(float(v) * scale_to_original, 1) for v in boxes[i]],
+            "class_index": int(classes[i]),
+            "class_name": raw_name,
+            "display_name": get_display_name(raw_name),
+            "score": float(scores[i]),
+        })
+    return detections, len(tiles)
+
+def summarize_detections(detections):
+    # Satu baris per jenis buah (urut skor tertinggi); nutrisi diambil dari NUTRITION lewat class_index.
+    summary = {}
+    for det in detections:
+        row = summary.get(det["class_index"])
+        if row is None:
+            summary[det["class_index"]] = {
+                "class_index": det["class_index"],
+                "class_name": det["class_name"],
+                "display_name": det["display_name"],
+                "count": 1,
+                "best_score": det["score"],
+            }
+        else:
+            row["count"] += 1
+            row["best_score"] = max(row["best_score"], det["score"])
+    return sorted(summary.values(), key=lambda r: -r["best_score"])
+
+def total_kcal(summary) -> float:
+    # Jumlah kalori per 100g dari tiap jenis yang terdeteksi.
+    idxs = np.fromiter((row["class_index"] for row in summary), dtype=np.intp, count=len(summary))
+    return float(NUTRITION.kalori_kcal[idxs].sum())
+
+def draw_detections(image, detections, scale_from_original: float = 1.0, color=(16, 185, 129)):
+    # Gambar kotak + label di atas salinan preview (koordinat deteksi = foto asli).
+    canvas = image.convert("RGB").copy() if isinstance(image, Image.Image) else Image.fromarray(image)
+    draw = ImageDraw.Draw(canvas)
+    width = max(2, int(round(max(canvas.size) / 300)))
+    for det in detections:
+        x0, y0, x1, y1 = (v * scale_from_original for v in det["box"])
+        draw.rectangle([x0, y0, x1, y1], outline=color, width=width)
+        label = f"{det['display_name']} {det['score'] * 100:.0f}%"
+        text_box = draw.textbbox((x0, y0), label)
+        draw.rectangle([text_box[0] - 2, text_box[1] - 2, text_box[2] + 2, text_box[3] + 2], fill=color)
+        draw.text((x0, y0), label, fill=(255, 255, 255))
+    return canvas
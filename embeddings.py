@@ -0,0 +1,454 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+import metrics
+import model_download
+from nutrisi import CLASS_NAMES
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EMBEDDING & PENCARIAN GAMBAR MIRIP (QA: label salah, buah yang mirip)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Embedding = keluaran layer sebelum logits. SavedModel yang diekspor lewat
+# export_with_embedding() (juga benchmarks/stub_model.py) punya signature "embedding" yang
+# mengembalikan {"embedding", "logits"} dalam satu forward pass. Model lama yang hanya punya
+# serving_default memakai logits sebagai embedding (embedding_source = "logits").
+#
+# Penyimpanan (FRUITSCAN_EMBEDDINGS_DIR): matriks float16 ter-normalisasi L2 di file memmap
+# yang tumbuh berlipat dua, kolom kelas/confidence/waktu juga memmap, header.json menyimpan
+# jumlah baris yang sudah lengkap (ditulis atomik setelah data di-flush). Thumbnail opsional
+# di thumbs/<id>.jpg. Sebelum mencari, store mengecek stat header.json, jadi baris yang
+# ditambahkan proses lain (worker Streamlit lain, CLI index) langsung ikut dicari.
+# Pencarian: cosine = dot product vektor ter-normalisasi, dihitung per blok SEARCH_BLOCK_ROWS
+# baris (float16 -> float32 per blok) dengan top-k berjalan, jadi memori tetap kecil untuk
+# jutaan vektor. IVFIndex (k-means sferis) opsional: hanya n_probe cluster terdekat yang dicek.
+#
+#   python embeddings.py index folder_foto/        # isi store dari folder
+#   python embeddings.py train-ivf --lists 1024
+#   python embeddings.py search foto.jpg -k 5
+
+EMBEDDINGS_DIR = os.environ.get("FRUITSCAN_EMBEDDINGS_DIR") or None
+EMBEDDING_SIGNATURE = "embedding"
+SEARCH_BLOCK_ROWS = 65536
+SIMILAR_TOP_K = int(os.environ.get("FRUITSCAN_SIMILAR_TOP_K", "5"))
+# Baris joint_predict_fn disimpan terpisah dari logits saja di cache prediksi.
+CACHE_VARIANT = "+embedding"
+# Scan ulang foto yang sama tidak menambah baris baru. Hanya untuk embedding dari signature
+# "embedding": kalau logits dipakai sebagai embedding, foto berbeda dengan kelas yakin yang sama
+# bisa punya cosine setinggi ini, jadi dedupe dimatikan (lihat record_scan).
+DUPLICATE_COSINE = float(os.environ.get("FRUITSCAN_EMBEDDINGS_DUPLICATE_COSINE", "0.9995"))
+IVF_FILE = "ivf.npz"
+HEADER_FILE = "header.json"
+COLUMNS = {
+    "vectors": np.float16,
+    "class_index": np.int16,
+    "confidence": np.float16,
+    "added_at": np.float64,
+}
+
+def l2_normalize(x) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    return x / np.maximum(norms, 1e-12)
+
+def export_with_embedding(model, export_dir: str, layer_name: str = None):
+    # Ekspor ulang model Keras (mis. di notebook training) dengan signature tambahan "embedding".
+    # serving_default tetap sama, jadi aplikasi lama tidak terpengaruh.
+    import tensorflow as tf
+
+    layer = model.get_layer(layer_name) if layer_name else model.layers[-2]
+    embed_model = tf.keras.Model(model.inputs, [layer.output, model.outputs[0]])
+    spec = [tf.TensorSpec((None, *model.inputs[0].shape[1:]), tf.float32, name=model.inputs[0].name.split(":")[0])]
+
+    def _embedding(x):
+        emb, logits = embed_model(x, training=False)
+        return {"embedding": tf.reshape(emb, (tf.shape(emb)[0], -1)), "logits": logits}
+
+    archive = tf.keras.export.ExportArchive()
+    archive.track(model)
+    archive.track(embed_model)
+    archive.add_endpoint("serve", lambda x: model(x, training=False), input_signature=spec)
+    archive.add_endpoint(EMBEDDING_SIGNATURE, _embedding, input_signature=spec)
+    archive.write_out(export_dir)
+    return export_dir
+
+def extract_embeddings(model, batch):
+    # -> (embedding ter-normalisasi float32 (N, D), logits (N, C), sumber embedding).
+    predict_with_embedding = getattr(model, "predict_with_embedding", None)
+    with metrics.timer("embed"):
+        if predict_with_embedding is not None:
+            emb, logits = predict_with_embedding(batch)
+            source = getattr(model, "embedding_source", EMBEDDING_SIGNATURE)
+        else:
+            logits = np.asarray(model(batch))
+            emb, source = logits, "logits"
+    return l2_normalize(np.asarray(emb).reshape(len(logits), -1)), np.asarray(logits), source
+
+def joint_predict_fn(model):
+    # Satu forward pass -> baris [logits (C) | embedding ter-normalisasi (D)] float32, jadi
+    # embedding ikut lewat InferenceBatcher, cache prediksi, dan TTA seperti logits biasa.
+    def _predict(batch):
+        emb, logits, _ = extract_embeddings(model, batch)
+        return np.concatenate([logits.astype(np.float32), emb], axis=1)
+    return _predict
+
+def split_joint(rows, num_classes: int):
+    # Kebalikan joint_predict_fn -> (logits (N, C), embedding ter-normalisasi (N, D)); normalisasi
+    # ulang karena TTA merata-rata embedding beberapa view.
+    rows = np.asarray(rows, dtype=np.float32)
+    return rows[:, :num_classes], l2_normalize(rows[:, num_classes:])
+
+def _merge_topk(best_scores, best_ids, scores, ids, k: int):
+    scores = np.concatenate([best_scores, scores], axis=1)
+    ids = np.concatenate([best_ids, ids], axis=1)
+    keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(ids, keep, axis=1)
+
+def search_blocked(matrix, queries, k: int = SIMILAR_TOP_K, block_rows: int = SEARCH_BLOCK_ROWS, offset: int = 0):
+    # Top-k cosine exact. matrix: (N, D) ter-normalisasi (boleh memmap float16).
+    # -> (ids (Q, k) int64, skor (Q, k) float32), urut skor menurun; id -1 kalau N < k.
+    q = l2_normalize(np.atleast_2d(queries))
+    best_scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+    best_ids = np.full((len(q), k), -1, dtype=np.int64)
+    for start in range(0, len(matrix), block_rows):
+        block = np.asarray(matrix[start:start + block_rows], dtype=np.float32)
+        scores = q @ block.T
+        kk = min(k, scores.shape[1])
+        part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+        best_scores, best_ids = _merge_topk(
+            best_scores, best_ids, np.take_along_axis(scores, part, axis=1), part + start + offset, k
+        )
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best_ids, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+class EmbeddingStore:
+    # Satu penulis per folder (lock file); pembaca di proses lain melihat baris baru setelah refresh().
+    def __init__(self, root: str, initial_capacity: int = 1024):
+        self.root = root
+        self.initial_capacity = max(1, int(initial_capacity))
+        self.dim = None
+        self.count = 0
+        self.capacity = 0
+        self.embedding_source = None
+        self.ivf = None
+        self._maps = {}
+        self._header_stat = None
+        self._lock = threading.RLock()
+        os.makedirs(os.path.join(root, "thumbs"), exist_ok=True)
+        self.refresh()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _path(self, column: str) -> str:
+        return os.path.join(self.root, f"{column}.bin")
+
+    def _row_shape(self, column: str):
+        return (self.dim,) if column == "vectors" else ()
+
+    def _read_header(self):
+        # -> header atau None kalau belum ada / tidak berubah sejak dibaca terakhir (stat sama).
+        path = os.path.join(self.root, HEADER_FILE)
+        try:
+            st = os.stat(path)
+            stat = (st.st_ino, st.st_size, st.st_mtime_ns)
+            if stat == self._header_stat and self._maps:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                header = json.load(f)
+        except (OSError, ValueError):
+            return None
+        self._header_stat = stat
+        return header
+
+    def _write_header(self):
+        model_download.write_text_atomic(os.path.join(self.root, HEADER_FILE), json.dumps({
+            "dim": self.dim,
+            "count": self.count,
+            "capacity": self.capacity,
+            "embedding_source": self.embedding_source,
+        }))
+
+    def _map(self):
+        self._maps = {
+            column: np.memmap(self._path(column), dtype=dtype, mode="r+", shape=(self.capacity, *self._row_shape(column)))
+            for column, dtype in COLUMNS.items()
+        }
+
+    def _resize(self, capacity: int):
+        self._maps = {}
+        for column, dtype in COLUMNS.items():
+            row_bytes = np.dtype(dtype).itemsize * int(np.prod(self._row_shape(column), dtype=np.int64))
+            with open(self._path(column), "ab") as f:
+                f.truncate(capacity * row_bytes)
+        self.capacity = capacity
+        self._map()
+
+    def refresh(self):
+        with self._lock:
+            header = self._read_header()
+            if header is None:
+                return
+            self.dim = header["dim"]
+            self.embedding_source = header["embedding_source"]
+            self.count = header["count"]
+            if header["capacity"] != self.capacity or not self._maps:
+                self.capacity = header["capacity"]
+                self._map()
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._maps["vectors"][:self.count] if self._maps else np.empty((0, self.dim or 0), dtype=np.float16)
+
+    def column(self, name: str) -> np.ndarray:
+        return self._maps[name][:self.count]
+
+    def append(self, vectors, class_index, confidence, embedding_source: str = None, thumbnails=None) -> np.ndarray:
+        vectors = l2_normalize(np.atleast_2d(vectors))
+        n = len(vectors)
+        with self._lock, model_download.file_lock(os.path.join(self.root, ".lock")):
+            self.refresh()
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                self.embedding_source = embedding_source
+                self._resize(max(self.initial_capacity, n))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Dimensi embedding {vectors.shape[1]} != store {self.dim} (model berbeda?)")
+            elif embedding_source and embedding_source != self.embedding_source:
+                raise ValueError(f"Sumber embedding {embedding_source} != store {self.embedding_source}")
+            if self.count + n > self.capacity:
+                self._resize(max(self.count + n, 2 * self.capacity))
+
+            rows = slice(self.count, self.count + n)
+            self._maps["vectors"][rows] = vectors
+            self._maps["class_index"][rows] = class_index
+            self._maps["confidence"][rows] = confidence
+            self._maps["added_at"][rows] = time.time()
+            for m in self._maps.values():
+                m.flush()
+            ids = np.arange(self.count, self.count + n, dtype=np.int64)
+            for i, thumb in zip(ids, thumbnails or ()):
+                if thumb:
+                    with open(self.thumbnail_path(i), "wb") as f:
+                        f.write(thumb)
+            self.count += n
+            self._write_header()
+        metrics.inc("embeddings_added", n)
+        return ids
+
+    def thumbnail_path(self, idx: int) -> str:
+        return os.path.join(self.root, "thumbs", f"{int(idx)}.jpg")
+
+    def records(self, ids, scores=None) -> list:
+        records = []
+        for rank, i in enumerate(ids):
+            if i < 0:
+                continue
+            class_index = int(self._maps["class_index"][i])
+            thumb = self.thumbnail_path(i)
+            records.append({
+                "id": int(i),
+                "class_index": class_index,
+                "class_name": CLASS_NAMES[class_index],
+                "confidence": float(self._maps["confidence"][i]),
+                "added_at": float(self._maps["added_at"][i]),
+                "score": None if scores is None else float(scores[rank]),
+                "thumbnail": thumb if os.path.exists(thumb) else None,
+            })
+        return records
+
+    def search(self, queries, k: int = SIMILAR_TOP_K, use_ivf: bool = True):
+        self.refresh()
+        with metrics.timer("similar_search"):
+            if use_ivf and self.ivf is not None:
+                return self.ivf.search(queries, k)
+            return search_blocked(self.vectors, queries, k)
+
+class IVFIndex:
+    # Inverted file: centroid k-means sferis + daftar id per cluster (satu array id diurutkan
+    # per cluster + offset). Baris yang ditambahkan setelah training di-assign saat update().
+    def __init__(self, store: EmbeddingStore, centroids: np.ndarray, assignments: np.ndarray, n_probe: int = 8):
+        self.store = store
+        self.centroids = l2_normalize(centroids)
+        self.assignments = np.asarray(assignments, dtype=np.int32)
+        self.n_probe = n_probe
+        self._rebuild_lists()
+
+    @property
+    def n_lists(self) -> int:
+        return len(self.centroids)
+
+    def _rebuild_lists(self):
+        self.order = np.argsort(self.assignments, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(self.assignments, minlength=self.n_lists))])
+
+    def _assign(self, start: int, stop: int, block_rows: int = SEARCH_BLOCK_ROWS) -> np.ndarray:
+        out = np.empty(stop - start, dtype=np.int32)
+        for s in range(start, stop, block_rows):
+            block = np.asarray(self.store.vectors[s:min(s + block_rows, stop)], dtype=np.float32)
+            out[s - start:s - start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return out
+
+    @classmethod
+    def train(cls, store: EmbeddingStore, n_lists: int = None, iters: int = 20, sample_size: int = None, seed: int = 0, n_probe: int = 8):
+        n = len(store)
+        if n == 0:
+            raise ValueError("Store kosong")
+        # Default ~sqrt(N) list; centroid dilatih dari sampel ~32 titik per list.
+        n_lists = min(n, n_lists or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, sample_size or max(32 * n_lists, 10000))
+        sample = np.asarray(store.vectors[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)]
+        for _ in range(iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=n_lists)
+            present = np.flatnonzero(counts)
+            starts = np.concatenate([[0], np.cumsum(counts)])[present]
+            sums = np.zeros_like(centroids)
+            sums[present] = np.add.reduceat(sample[order], starts, axis=0)
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                # Cluster kosong diisi ulang titik acak supaya semua list terpakai.
+                sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+            centroids = l2_normalize(sums)
+        index = cls(store, centroids, np.empty(0, dtype=np.int32), n_probe=n_probe)
+        index.update()
+        return index
+
+    def update(self):
+        indexed = len(self.assignments)
+        if indexed < len(self.store):
+            self.assignments = np.concatenate([self.assignments, self._assign(indexed, len(self.store))])
+            self._rebuild_lists()
+
+    def search(self, queries, k: int = SIMILAR_TOP_K, n_probe: int = None):
+        self.update()
+        q = l2_normalize(np.atleast_2d(queries))
+        n_probe = min(self.n_lists, n_probe or self.n_probe)
+        probes = np.argpartition(-(q @ self.centroids.T), n_probe - 1, axis=1)[:, :n_probe]
+        ids = np.full((len(q), k), -1, dtype=np.int64)
+        scores = np.full((len(q), k), -np.inf, dtype=np.float32)
+        for qi, lists in enumerate(probes):
+            candidates = np.sort(np.concatenate([self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists]))
+            if candidates.size == 0:
+                continue
+            cand_scores = np.asarray(self.store.vectors[candidates], dtype=np.float32) @ q[qi]
+            kk = min(k, candidates.size)
+            top = np.argpartition(-cand_scores, kk - 1)[:kk]
+            top = top[np.argsort(-cand_scores[top], kind="stable")]
+            ids[qi, :kk] = candidates[top]
+            scores[qi, :kk] = cand_scores[top]
+        return ids, scores
+
+    def save(self, path: str = None):
+        path = path or os.path.join(self.store.root, IVF_FILE)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, assignments=self.assignments, n_probe=self.n_probe)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, store: EmbeddingStore, path: str = None):
+        path = path or os.path.join(store.root, IVF_FILE)
+        try:
+            with np.load(path) as data:
+                centroids, assignments, n_probe = data["centroids"], data["assignments"], int(data["n_probe"])
+        except (OSError, KeyError, ValueError):
+            return None
+        if store.dim is None or centroids.shape[1] != store.dim or len(assignments) > len(store):
+            return None
+        return cls(store, centroids, assignments, n_probe=n_probe)
+
+def open_store(root: str = None):
+    # None kalau FRUITSCAN_EMBEDDINGS_DIR tidak di-set (fitur QA mati).
+    root = root or EMBEDDINGS_DIR
+    if not root:
+        return None
+    store = EmbeddingStore(root)
+    store.ivf = IVFIndex.load(store)
+    return store
+
+def record_scan(store: EmbeddingStore, emb, class_index: int, confidence: float, embedding_source: str, thumbnail: bytes = None, k: int = SIMILAR_TOP_K) -> list:
+    # Cari k scan sebelumnya yang paling mirip, lalu simpan scan ini (kecuali duplikat persis).
+    # `emb` (1, D) ter-normalisasi, dari forward pass yang sama dengan prediksinya (split_joint).
+    emb = np.asarray(emb, dtype=np.float32).reshape(1, -1)
+    store.refresh()
+    similar = []
+    if len(store) and store.dim == emb.shape[1]:
+        ids, scores = store.search(emb[:1], k=k + 1)
+        similar = store.records(ids[0], scores[0])
+    dedupe = embedding_source != "logits"
+    if dedupe and similar and similar[0]["score"] >= DUPLICATE_COSINE:
+        # Foto yang sama: jangan tampilkan dirinya sendiri sebagai "mirip".
+        similar = similar[1:]
+    else:
+        store.append(emb, class_index, confidence, embedding_source=embedding_source, thumbnails=[thumbnail])
+    return similar[:k]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store embedding & pencarian gambar mirip.")
+    parser.add_argument("--store", default=EMBEDDINGS_DIR, help="Folder store (default FRUITSCAN_EMBEDDINGS_DIR)")
+    parser.add_argument("--backend", default=None, help="Backend model (default FRUITSCAN_BACKEND)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_index = sub.add_parser("index", help="Tambahkan semua gambar di folder ke store")
+    p_index.add_argument("images_dir")
+    p_index.add_argument("--batch-size", type=int, default=64)
+    p_ivf = sub.add_parser("train-ivf", help="Latih coarse quantizer (IVF) dari isi store")
+    p_ivf.add_argument("--lists", type=int, default=None, help="Jumlah cluster (default sqrt(N))")
+    p_ivf.add_argument("--probe", type=int, default=8)
+    p_ivf.add_argument("--iters", type=int, default=20)
+    p_search = sub.add_parser("search", help="Cari gambar paling mirip")
+    p_search.add_argument("image")
+    p_search.add_argument("-k", type=int, default=SIMILAR_TOP_K)
+    p_search.add_argument("--exact", action="store_true", help="Abaikan IVF, scan semua vektor")
+    args = parser.parse_args(argv)
+
+    if not args.store:
+        print("Error: set --store atau FRUITSCAN_EMBEDDINGS_DIR", file=sys.stderr)
+        return 1
+    store = open_store(args.store)
+
+    if args.command == "train-ivf":
+        started = time.perf_counter()
+        index = IVFIndex.train(store, n_lists=args.lists, iters=args.iters, n_probe=args.probe)
+        index.save()
+        print(f"IVF {index.n_lists} list dari {len(store)} vektor dalam {time.perf_counter() - started:.1f} s")
+        return 0
+
+    from backends import load_backend
+    from inference import iter_image_paths, load_image_array, rank_predictions
+
+    model = load_backend(args.backend)
+    if args.command == "index":
+        paths = list(iter_image_paths(args.images_dir))
+        for start in range(0, len(paths), args.batch_size):
+            chunk, batch = [], []
+            for path in paths[start:start + args.batch_size]:
+                try:
+                    batch.append(load_image_array(path))
+                except Exception:
+                    continue
+                chunk.append(path)
+            if not batch:
+                continue
+            emb, logits, source = extract_embeddings(model, np.stack(batch))
+            idxs, probs, _ = rank_predictions(logits, k=1)
+            store.append(emb, idxs[:, 0], probs[:, 0], embedding_source=source)
+        print(f"{len(store)} vektor di {args.store} (dim {store.dim}, sumber {store.embedding_source})")
+        return 0
+
+    emb, _, _ = extract_embeddings(model, load_image_array(args.image)[None])
+    ids, scores = store.search(emb, k=args.k, use_ivf=not args.exact)
+    for rec in store.records(ids[0], scores[0]):
+        print(f"#{rec['id']:<8d} {rec['score']:.4f}  {rec['class_name']}  ({rec['confidence'] * 100:.0f}%)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,286 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from calibrate import labelled_paths
+from inference import IMAGE_SIZE, load_image_array, model_predict, rank_predictions
+from nutrisi import CLASS_NAMES, NUTRISI_DATA, NUTRITION
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# EVALUASI MODEL PADA FOLDER BERLABEL (confusion matrix, precision/recall, top-k)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Struktur folder sama dengan calibrate.py: <root>/<nama kelas>/*.jpg.
+# Decode berjalan di process pool (per potongan CHUNK_SIZE path, dikirim balik sebagai uint8
+# karena piksel 64x64 memang bulat 0-255), inferensi per batch di proses utama. Hasil
+# dialirkan: hanya `depth` potongan yang menunggu sekaligus, jadi memori tidak tumbuh dengan
+# jumlah foto. Confusion matrix diakumulasi per batch dengan satu np.bincount.
+#
+#   python evaluate.py /data/val --output eval.json
+#   python evaluate.py /data/val --backend tflite-int8 --top-k 1,3,5 --workers 8
+
+DEFAULT_TOP_K = (1, 3, 5)
+CHUNK_SIZE = 64
+MOST_CONFUSED = 10
+
+def _decode_chunk(paths):
+    # Jalan di proses worker -> (piksel uint8 (N, 64, 64, 3), mask berhasil (N,)).
+    out = np.zeros((len(paths), IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.uint8)
+    ok = np.zeros(len(paths), dtype=bool)
+    buf = np.empty((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    for i, path in enumerate(paths):
+        try:
+            load_image_array(path, out=buf)
+        except Exception:
+            continue
+        out[i] = buf
+        ok[i] = True
+    return out, ok
+
+def _stream_decoded(paths, labels, executor, chunk_size: int, depth: int):
+    # -> (piksel, label) per potongan, urutan sama dengan input; decode gagal sudah dibuang.
+    pending = deque()
+    for start in range(0, len(paths), chunk_size):
+        pending.append((labels[start:start + chunk_size], executor.submit(_decode_chunk, paths[start:start + chunk_size])))
+        if len(pending) >= depth:
+            chunk_labels, future = pending.popleft()
+            pixels, ok = future.result()
+            yield pixels[ok], chunk_labels[ok], int((~ok).sum())
+    while pending:
+        chunk_labels, future = pending.popleft()
+        pixels, ok = future.result()
+        yield pixels[ok], chunk_labels[ok], int((~ok).sum())
+
+def legacy_nutrition_lookup_failures(class_names=CLASS_NAMES) -> list:
+    # Kelas yang tidak ketemu lewat lookup lama NUTRISI_DATA.get(raw_name.split()[0]).
+    # Aplikasi sekarang memakai NUTRITION per indeks kelas (lengkap, dicek saat import), tapi
+    # skrip/klien lama yang masih memakai kata pertama akan kehilangan data kelas-kelas ini.
+    return [name for name in class_names if name.split()[0] not in NUTRISI_DATA]
+
+class EvaluationAccumulator:
+    def __init__(self, num_classes: int = len(CLASS_NAMES), top_ks=DEFAULT_TOP_K):
+        self.num_classes = num_classes
+        self.top_ks = tuple(sorted(set(min(k, num_classes) for k in top_ks)))
+        self.confusion = np.zeros((num_classes, num_classes), dtype=np.int64)
+        self.topk_hits = np.zeros(len(self.top_ks), dtype=np.int64)
+        self.rejected = 0
+        self.total = 0
+
+    def update(self, labels: np.ndarray, ranked: np.ndarray, rejected: np.ndarray):
+        # ranked: (N, >= max top_k) indeks kelas urut skor menurun (hasil rank_predictions).
+        c = self.num_classes
+        labels = np.asarray(labels, dtype=np.int64)
+        self.confusion += np.bincount(labels * c + ranked[:, 0], minlength=c * c).reshape(c, c)
+        # hit_rank[i] = posisi label benar di peringkat (len kalau tidak ada).
+        hits = ranked == labels[:, None]
+        hit_rank = np.where(hits.any(axis=1), hits.argmax(axis=1), ranked.shape[1])
+        self.topk_hits += (hit_rank[:, None] < np.asarray(self.top_ks)[None, :]).sum(axis=0)
+        self.rejected += int(np.count_nonzero(rejected))
+        self.total += len(labels)
+
+    def per_class(self) -> dict:
+        tp = np.diag(self.confusion).astype(np.float64)
+        support = self.confusion.sum(axis=1)
+        predicted = self.confusion.sum(axis=0)
+        precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+        recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+        f1 = np.divide(2 * precision * recall, precision + recall, out=np.zeros_like(tp), where=(precision + recall) > 0)
+        return {"precision": precision, "recall": recall, "f1": f1, "support": support, "predicted": predicted}
+
+    def most_confused(self, n: int = MOST_CONFUSED) -> list:
+        off = self.confusion.copy()
+        np.fill_diagonal(off, 0)
+        flat = np.argsort(-off, axis=None, kind="stable")[:n]
+        pairs = []
+        for true_idx, pred_idx in zip(*np.unravel_index(flat, off.shape)):
+            count = int(off[true_idx, pred_idx])
+            if count == 0:
+                break
+            pairs.append({"true": CLASS_NAMES[true_idx], "predicted": CLASS_NAMES[pred_idx], "count": count})
+        return pairs
+
+    def report(self) -> dict:
+        stats = self.per_class()
+        present = stats["support"] > 0
+        legacy_failures = set(legacy_nutrition_lookup_failures())
+        total = max(self.total, 1)
+        return {
+            "images": self.total,
+            "accuracy": float(np.trace(self.confusion) / total),
+            "top_k_accuracy": {str(k): float(h / total) for k, h in zip(self.top_ks, self.topk_hits)},
+            "rejected_fraction": self.rejected / total,
+            # Rata-rata makro hanya atas kelas yang punya foto di folder evaluasi.
+            "macro_precision": float(stats["precision"][present].mean()) if present.any() else 0.0,
+            "macro_recall": float(stats["recall"][present].mean()) if present.any() else 0.0,
+            "macro_f1": float(stats["f1"][present].mean()) if present.any() else 0.0,
+            "per_class": [
+                {
+                    "class_index": i,
+                    "class_name": name,
+                    "support": int(stats["support"][i]),
+                    "predicted": int(stats["predicted"][i]),
+                    "precision": float(stats["precision"][i]),
+                    "recall": float(stats["recall"][i]),
+                    "f1": float(stats["f1"][i]),
+                    "nutrition_legacy_lookup_ok": name not in legacy_failures,
+                }
+                for i, name in enumerate(CLASS_NAMES)
+            ],
+            "most_confused": self.most_confused(),
+            "confusion_matrix": self.confusion.tolist(),
+        }
+
+def evaluate_directory(model, root: str, batch_size: int = 256, workers: int = None, chunk_size: int = CHUNK_SIZE, top_ks=DEFAULT_TOP_K, log=print) -> dict:
+    paths, labels, skipped = labelled_paths(root)
+    if skipped:
+        log(f"Folder bukan nama kelas, dilewati: {', '.join(skipped)}")
+    if not paths:
+        raise RuntimeError(f"Tidak ada gambar berlabel di {root}")
+
+    workers = workers or os.cpu_count() or 1
+    acc = EvaluationAccumulator(top_ks=top_ks)
+    batch = np.empty((batch_size, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    batch_labels = np.empty(batch_size, dtype=np.int64)
+    n = 0
+    decode_errors = 0
+    predict_s = 0.0
+    wait_s = 0.0
+    k_max = max(acc.top_ks)
+    started = time.perf_counter()
+
+    def _flush():
+        nonlocal n, predict_s
+        t0 = time.perf_counter()
+        logits = model_predict(model, batch[:n])
+        idxs, _, rejected = rank_predictions(logits, k=k_max)
+        predict_s += time.perf_counter() - t0
+        acc.update(batch_labels[:n], idxs, rejected)
+        n = 0
+        elapsed = time.perf_counter() - started
+        log(f"{acc.total}/{len(paths)} gambar ({acc.total / max(elapsed, 1e-9):.1f} gambar/detik)")
+
+    # "spawn": worker tidak ikut mewarisi state TensorFlow dari proses utama (fork + TF bisa macet).
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as executor:
+        stream = _stream_decoded(paths, labels, executor, chunk_size, depth=2 * workers)
+        while True:
+            t0 = time.perf_counter()
+            item = next(stream, None)
+            wait_s += time.perf_counter() - t0
+            if item is None:
+                break
+            pixels, chunk_labels, errors = item
+            decode_errors += errors
+            start = 0
+            while start < len(pixels):
+                take = min(batch_size - n, len(pixels) - start)
+                batch[n:n + take] = pixels[start:start + take]
+                batch_labels[n:n + take] = chunk_labels[start:start + take]
+                n += take
+                start += take
+                if n == batch_size:
+                    _flush()
+        if n:
+            _flush()
+
+    elapsed = time.perf_counter() - started
+    report = acc.report()
+    report.update({
+        "root": os.path.abspath(root),
+        "skipped_dirs": skipped,
+        "decode_errors": decode_errors,
+        "throughput": {
+            "elapsed_s": elapsed,
+            "images_per_s": acc.total / max(elapsed, 1e-9),
+            "predict_s": predict_s,
+            # Waktu proses utama menunggu decode; besar = tambah --workers.
+            "decode_wait_s": wait_s,
+            "workers": workers,
+            "batch_size": batch_size,
+        },
+        "nutrition": {
+            "legacy_first_word_failures": legacy_nutrition_lookup_failures(),
+            "index_lookup_complete": len(NUTRITION) == len(CLASS_NAMES),
+        },
+    })
+    return report
+
+def format_report(report: dict) -> str:
+    lines = [f"{'kelas':24s} {'n':>6s} {'prec':>6s} {'recall':>6s} {'f1':>6s}"]
+    for row in report["per_class"]:
+        if row["support"] == 0 and row["predicted"] == 0:
+            continue
+        flag = "  [nutrisi: lookup kata pertama gagal]" if not row["nutrition_legacy_lookup_ok"] else ""
+        lines.append(
+            f"{row['class_name']:24s} {row['support']:>6d} {row['precision']:>6.3f} {row['recall']:>6.3f} {row['f1']:>6.3f}{flag}"
+        )
+    topk = " · ".join(f"top-{k} {v * 100:.1f}%" for k, v in report["top_k_accuracy"].items())
+    tp = report["throughput"]
+    lines.append("")
+    lines.append(f"{report['images']} gambar · {topk} · macro F1 {report['macro_f1']:.3f} · unknown {report['rejected_fraction'] * 100:.1f}%")
+    lines.append(
+        f"{tp['images_per_s']:.1f} gambar/detik ({tp['elapsed_s']:.1f} s; prediksi {tp['predict_s']:.1f} s, "
+        f"menunggu decode {tp['decode_wait_s']:.1f} s, {tp['workers']} proses decode) · {report['decode_errors']} gagal decode"
+    )
+    if report["most_confused"]:
+        lines.append("Paling sering tertukar: " + ", ".join(
+            f"{p['true']} -> {p['predicted']} ({p['count']})" for p in report["most_confused"][:5]
+        ))
+    failures = report["nutrition"]["legacy_first_word_failures"]
+    if failures:
+        lines.append(f"Lookup nutrisi via raw_name.split()[0] gagal untuk {len(failures)} kelas: {', '.join(failures)}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    from backends import BACKEND_NAMES, DEFAULT_BACKEND, load_backend
+
+    parser = argparse.ArgumentParser(description="Evaluasi model pada folder berlabel (subfolder = nama kelas).")
+    parser.add_argument("input_dir", help="Folder berisi subfolder per kelas")
+    parser.add_argument("--output", "-o", default=None, help="Simpan laporan lengkap (JSON, termasuk confusion matrix)")
+    parser.add_argument("--backend", default=DEFAULT_BACKEND, choices=BACKEND_NAMES)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Proses decode gambar")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Path per tugas decode")
+    parser.add_argument("--top-k", default=",".join(map(str, DEFAULT_TOP_K)), help="Daftar k untuk akurasi top-k, mis. 1,3,5")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"Folder tidak ditemukan: {args.input_dir}")
+    try:
+        top_ks = [int(k) for k in args.top_k.split(",") if k.strip()]
+    except ValueError:
+        parser.error("--top-k harus daftar angka, mis. 1,3,5")
+    if not top_ks or min(top_ks) < 1:
+        parser.error("--top-k harus berisi angka >= 1")
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    model = load_backend(args.backend, status_callback=log)
+    try:
+        report = evaluate_directory(
+            model,
+            args.input_dir,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            top_ks=top_ks,
+            log=log,
+        )
+    except RuntimeError as e:
+        parser.error(str(e))
+    report["backend"] = getattr(model, "name", args.backend)
+
+    print(format_report(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        log(f"Laporan -> {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+import hashlib
+import io
+from collections import OrderedDict
+
+import numpy as np
+
+from inference import IMAGE_SIZE, PREVIEW_MAX_SIZE, decode_image
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# ARTEFAK TURUNAN PER UPLOAD (disimpan di session_state, bukan byte asli)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Satu kali decode per upload menghasilkan:
+#   - thumbnail : JPEG kecil untuk preview (st.image menerima bytes langsung)
+#   - pixels    : input model 64x64 uint8 (hasil resize bernilai bulat 0-255, jadi tanpa rugi)
+# Rerun berikutnya cukup memakai artefak ini; foto 12 MP asli tidak ditahan selama sesi hidup.
+# Tiap sesi punya anggaran byte sendiri (LRU), supaya foto-foto lama ikut terbuang.
+
+THUMBNAIL_QUALITY = 85
+
+def image_signature(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+class ImageArtifacts:
+    __slots__ = ("sig", "thumbnail", "thumbnail_size", "pixels")
+
+    def __init__(self, sig: str, thumbnail: bytes, thumbnail_size, pixels: np.ndarray):
+        self.sig = sig
+        self.thumbnail = thumbnail
+        self.thumbnail_size = thumbnail_size
+        self.pixels = pixels
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.thumbnail) + self.pixels.nbytes
+
+    def input_batch(self, out: np.ndarray = None) -> np.ndarray:
+        # (1, 64, 64, 3) float32 siap masuk model; nilainya identik dengan preprocess_image_bytes.
+        if out is None:
+            out = np.empty((1,) + self.pixels.shape, dtype=np.float32)
+        out[0] = self.pixels
+        return out
+
+def build_artifacts(data: bytes, sig: str = None, preview_max: int = PREVIEW_MAX_SIZE, quality: int = THUMBNAIL_QUALITY) -> ImageArtifacts:
+    pixels = np.empty((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    _, preview = decode_image(data, out=pixels, preview_max=preview_max)
+
+    thumb = io.BytesIO()
+    preview.save(thumb, "JPEG", quality=quality)
+    return ImageArtifacts(
+        sig=sig or image_signature(data),
+        thumbnail=thumb.getvalue(),
+        thumbnail_size=preview.size,
+        pixels=pixels.astype(np.uint8),
+    )
+
+class SessionArtifactStore:
+    def __init__(self, max_bytes: int = 2 * 1024 * 1024):
+        self.max_bytes = int(max_bytes)
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, sig: str):
+        artifacts = self._entries.get(sig)
+        if artifacts is not None:
+            self._entries.move_to_end(sig)
+            self.hits += 1
+        return artifacts
+
+    def put(self, artifacts: ImageArtifacts):
+        old = self._entries.pop(artifacts.sig, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+        self._entries[artifacts.sig] = artifacts
+        self._bytes += artifacts.nbytes
+        # Artefak terbaru selalu disimpan walau sendirian melebihi anggaran (sedang ditampilkan).
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self.evictions += 1
+        return artifacts
+
+    def get_or_build(self, data: bytes, sig: str = None, preview_max: int = PREVIEW_MAX_SIZE) -> ImageArtifacts:
+        sig = sig or image_signature(data)
+        artifacts = self.get(sig)
+        if artifacts is None:
+            artifacts = self.put(build_artifacts(data, sig=sig, preview_max=preview_max))
+            self.builds += 1
+        return artifacts
+
+    def discard(self, sig: str):
+        old = self._entries.pop(sig, None)
+        if old is not None:
+            self._bytes -= old.nbytes
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "builds": self.builds,
+            "evictions": self.evictions,
+        }
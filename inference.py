@@ -0,0 +1,592 @@
+import io
+import json
+import os
+import sys
+import importlib
+import hashlib
+import time
+import zipfile
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image, ImageOps
+
+import metrics
+import model_download
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# MODUL PREDIKSI TANPA UI
+# ═══════════════════════════════════════════════════════════════════════════════
+# Semua logika model (unduh, ekstrak, load, preprocess, prediksi) ada di sini supaya
+# bisa dipakai dari Streamlit, CLI, maupun skrip lain tanpa menginisialisasi UI.
+# TensorFlow dan gdown SENGAJA tidak di-import di level modul: keduanya baru dimuat saat
+# model pertama kali dibutuhkan (atau oleh warm-up di background), supaya halaman awal
+# tampil tanpa menunggu import beberapa detik.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_CACHE_ROOT = os.path.join(tempfile.gettempdir(), "fruit_scan_model")
+# Folder awal hanya placeholder; setelah ekstrak ZIP, MODEL_DIR akan diarahkan ke folder
+# yang benar (yang berisi saved_model.pb) lewat hasil scan/marker.
+MODEL_DIR = os.path.join(MODEL_CACHE_ROOT, "model")
+MODEL_DIR_MARKER = os.path.join(MODEL_CACHE_ROOT, ".model_dir_path")
+MODEL_DOWNLOAD_LOCK = os.path.join(MODEL_CACHE_ROOT, ".download.lock")
+GOOGLE_DRIVE_ID = "1Lli5EyHbikpE10LoaQ0s9HE7j7vSH0RG"
+
+# Sumber model alternatif (http(s)://, file:// atau path lokal) dan checksum yang di-pin.
+# Bisa juga lewat model_manifest.json di folder aplikasi: {"url": "...", "sha256": "..."}.
+MODEL_SOURCE_URL = os.environ.get("FRUITSCAN_MODEL_URL") or None
+MODEL_SHA256 = os.environ.get("FRUITSCAN_MODEL_SHA256") or None
+MODEL_MANIFEST_PATH = os.environ.get("FRUITSCAN_MODEL_MANIFEST", os.path.join(APP_DIR, "model_manifest.json"))
+# Folder SavedModel yang sudah ada (mis. hasil benchmarks/stub_model.py); melewati download.
+MODEL_DIR_OVERRIDE = os.environ.get("FRUITSCAN_MODEL_DIR") or None
+
+IMAGE_SIZE = (64, 64)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Jalur decode cepat: JPEG di-decode langsung di skala 1/2, 1/4 atau 1/8 (DCT scaling) selama
+# sisi terpendek hasilnya masih >= FAST_DECODE_MIN_SIDE, lalu baru di-resize ke 64x64.
+FAST_DECODE_MIN_SIDE = 4 * IMAGE_SIZE[0]
+PREVIEW_MAX_SIZE = 1024
+
+os.makedirs(MODEL_CACHE_ROOT, exist_ok=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# LAPORAN WAKTU STARTUP
+# ═══════════════════════════════════════════════════════════════════════════════
+STARTUP_STAGES = [
+    "import_tensorflow", "import_gdown", "download", "extract",
+    "saved_model_load", "tflite_convert", "tflite_load", "warmup",
+]
+_startup_timings = {}
+_startup_lock = threading.Lock()
+
+@contextmanager
+def _timed(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _startup_lock:
+            _startup_timings[stage] = _startup_timings.get(stage, 0.0) + elapsed
+            total = _startup_timings[stage]
+        metrics.set_gauge(f"startup_{stage}_seconds", total)
+
+def startup_report() -> dict:
+    # Detik per tahap; tahap yang belum/tidak terjadi tidak muncul (mis. download saat model sudah di cache).
+    with _startup_lock:
+        report = {stage: _startup_timings[stage] for stage in STARTUP_STAGES if stage in _startup_timings}
+    report["total"] = sum(report.values())
+    return report
+
+def _lazy_import(module_name: str, stage: str):
+    module = sys.modules.get(module_name)
+    if module is None:
+        with _timed(stage):
+            module = importlib.import_module(module_name)
+    return module
+
+def _tf():
+    return _lazy_import("tensorflow", "import_tensorflow")
+
+def _gdown():
+    return _lazy_import("gdown", "import_gdown")
+
+def _notify(status_callback, message: str):
+    if status_callback is not None:
+        status_callback(message)
+
+def _read_model_marker():
+    try:
+        with open(MODEL_DIR_MARKER, "r", encoding="utf-8") as f:
+            saved_dir = f.read().strip()
+    except OSError:
+        return None
+    if saved_dir and os.path.exists(os.path.join(saved_dir, "saved_model.pb")):
+        return saved_dir
+    return None
+
+def _download_model_zip(zip_path: str, source_url: str, status_callback=None):
+    metrics.inc("model_downloads")
+    try:
+        _fetch_model_zip(zip_path, source_url, status_callback=status_callback)
+    except Exception:
+        metrics.inc("model_download_errors")
+        raise
+
+def _fetch_model_zip(zip_path: str, source_url: str, status_callback=None):
+    if source_url:
+        _notify(status_callback, f"Mengunduh model dari {source_url}...")
+        with _timed("download"):
+            model_download.download_resumable(source_url, zip_path, status_callback=status_callback)
+        return
+
+    gdown = _gdown()
+    _notify(status_callback, "Mengunduh model dari Google Drive...")
+    with _timed("download"):
+        # resume=True: gdown melanjutkan file sementara yang tertinggal dari download sebelumnya.
+        gdown.download(id=GOOGLE_DRIVE_ID, output=zip_path, quiet=False, resume=True)
+
+def ensure_model_ready(status_callback=None):
+    global MODEL_DIR
+
+    saved_dir = _read_model_marker()
+    if saved_dir:
+        MODEL_DIR = saved_dir
+        return MODEL_DIR
+
+    if os.path.exists(os.path.join(MODEL_DIR, "saved_model.pb")):
+        return MODEL_DIR
+
+    # Hanya satu worker yang mengunduh; worker lain menunggu di sini lalu memakai hasilnya.
+    with model_download.file_lock(MODEL_DOWNLOAD_LOCK):
+        saved_dir = _read_model_marker()
+        if saved_dir:
+            MODEL_DIR = saved_dir
+            return MODEL_DIR
+
+        manifest = model_download.load_manifest(MODEL_MANIFEST_PATH)
+        source_url = MODEL_SOURCE_URL or manifest.get("url")
+        expected_sha256 = MODEL_SHA256 or manifest.get("sha256")
+
+        zip_path = os.path.join(MODEL_CACHE_ROOT, "model.zip")
+        if not os.path.exists(zip_path):
+            _download_model_zip(zip_path, source_url, status_callback=status_callback)
+
+        if expected_sha256:
+            _notify(status_callback, "Memverifikasi checksum model...")
+            model_download.verify_sha256(zip_path, expected_sha256)
+
+        if not zipfile.is_zipfile(zip_path):
+            os.remove(zip_path)
+            raise RuntimeError("File yang terunduh bukan ZIP yang valid")
+
+        _notify(status_callback, "Mengekstrak model...")
+        with _timed("extract"):
+            found_dir = model_download.extract_zip_atomic(zip_path, MODEL_DIR)
+
+        MODEL_DIR = found_dir
+        try:
+            model_download.write_text_atomic(MODEL_DIR_MARKER, MODEL_DIR)
+        except OSError:
+            pass
+        try:
+            os.remove(zip_path)
+        except OSError:
+            pass
+
+    return MODEL_DIR
+
+def resolve_model_dir(status_callback=None) -> str:
+    # Prioritas: FRUITSCAN_MODEL_DIR, saved_model.pb di folder aplikasi, kalau tidak ada unduh ke cache.
+    if MODEL_DIR_OVERRIDE:
+        if not os.path.exists(os.path.join(MODEL_DIR_OVERRIDE, "saved_model.pb")):
+            raise RuntimeError(f"saved_model.pb tidak ditemukan di FRUITSCAN_MODEL_DIR={MODEL_DIR_OVERRIDE}")
+        return MODEL_DIR_OVERRIDE
+    if os.path.exists(os.path.join(APP_DIR, "saved_model.pb")):
+        return APP_DIR
+    return ensure_model_ready(status_callback=status_callback)
+
+def saved_model_identity(saved_model_dir: str) -> str:
+    # Sidik jari murah SavedModel (path asli, ukuran & mtime saved_model.pb): berubah kalau model
+    # diunduh/diekstrak ulang atau folder diganti. Dipakai nama file TFLite dan namespace cache.
+    pb = os.path.join(saved_model_dir, "saved_model.pb")
+    stat = os.stat(pb)
+    identity = f"{os.path.realpath(pb)}:{stat.st_size}:{int(stat.st_mtime)}"
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()[:12]
+
+def load_trained_model(status_callback=None):
+    tf = _tf()
+    model_dir = resolve_model_dir(status_callback=status_callback)
+
+    # MEMUAT MODEL (Format SavedModel)
+    with _timed("saved_model_load"):
+        saved_model = tf.saved_model.load(model_dir)
+    serving = ServingModel(saved_model, identity=f"savedmodel-{saved_model_identity(model_dir)}")
+    with _timed("warmup"):
+        serving.warmup()
+    return serving
+
+class ServingModel:
+    # Pembungkus signature 'serving_default' yang dibangun SEKALI saat load:
+    # nama input/output sudah di-resolve, fungsi sudah di-trace dengan spec input tetap
+    # (batch dinamis), dan hasilnya langsung NumPy.
+    def __init__(self, saved_model, signature_key: str = "serving_default", identity: str = None):
+        tf = _tf()
+        self.name = "savedmodel"
+        self.identity = identity
+        self.saved_model = saved_model  # tetap dipegang supaya variabel model tidak di-GC
+        infer = saved_model.signatures[signature_key]
+
+        input_specs = infer.structured_input_signature[1]
+        self.input_name = list(input_specs.keys())[0]
+        self.output_name = list(infer.structured_outputs.keys())[0]
+        spec = input_specs[self.input_name]
+        self.input_spec = tf.TensorSpec([None, *spec.shape[1:]], spec.dtype, name=self.input_name)
+
+        input_name, output_name = self.input_name, self.output_name
+
+        @tf.function(input_signature=[self.input_spec])
+        def _serve(x):
+            # PENTING SEKALI: signature 'serving_default' sudah berjalan dengan training=False,
+            # jadi layer augmentasi (Flip/Rotate) di dalam model tidak aktif.
+            return infer(**{input_name: x})[output_name]
+
+        self.concrete_function = _serve.get_concrete_function()
+        self.num_classes = int(self.concrete_function.structured_outputs.shape[-1])
+
+        # Signature "embedding" opsional (embeddings.export_with_embedding): layer sebelum logits
+        # + logits dalam satu forward pass. Tanpa signature itu, logits dipakai sebagai embedding.
+        self.embedding_function = None
+        self.embedding_source = "logits"
+        if "embedding" in saved_model.signatures:
+            embed = saved_model.signatures["embedding"]
+            embed_input = list(embed.structured_input_signature[1].keys())[0]
+
+            @tf.function(input_signature=[self.input_spec])
+            def _embed(x):
+                out = embed(**{embed_input: x})
+                return out["embedding"], out["logits"]
+
+            self.embedding_function = _embed.get_concrete_function()
+            self.embedding_source = "embedding"
+
+    def __call__(self, img_array) -> np.ndarray:
+        batch = np.asarray(img_array, dtype=self.input_spec.dtype.as_numpy_dtype)
+        return self.concrete_function(batch).numpy()
+
+    def predict_with_embedding(self, img_array):
+        # -> (embedding (N, D), logits (N, C))
+        if self.embedding_function is None:
+            logits = self(img_array)
+            return logits, logits
+        batch = np.asarray(img_array, dtype=self.input_spec.dtype.as_numpy_dtype)
+        emb, logits = self.embedding_function(batch)
+        return emb.numpy(), logits.numpy()
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        # Panggilan pertama menginisialisasi graph/kernel; lakukan di sini, bukan di request user.
+        shape = tuple(self.input_spec.shape[1:])
+        for n in batch_sizes:
+            self(np.zeros((n, *shape), dtype=self.input_spec.dtype.as_numpy_dtype))
+
+# Satu model per proses. get_model() dipakai bersama oleh Streamlit dan warm-up background,
+# jadi kalau warm-up sedang berjalan, request yang butuh model cukup menunggu hasil yang sama.
+# _model_lock hanya menjaga cek state (model/thread warm-up) dan tidak pernah ditahan selama
+# load_backend; pemuatan diserialkan lewat _load_lock supaya rerun yang cuma memanggil
+# start_background_warmup()/model_status() tidak ikut terblokir.
+_model = None
+_model_lock = threading.Lock()
+_load_lock = threading.Lock()
+_warmup_thread = None
+_warmup_error = None
+
+def get_model(status_callback=None):
+    global _model
+    model = _model
+    if model is not None:
+        return model
+    with _load_lock:
+        if _model is None:
+            # Backend dipilih lewat FRUITSCAN_BACKEND (lihat backends.py); default SavedModel.
+            from backends import load_backend
+            model = load_backend(status_callback=status_callback)
+            with _model_lock:
+                _model = model
+        return _model
+
+def start_background_warmup():
+    global _warmup_thread
+
+    def _run():
+        global _warmup_error
+        try:
+            get_model()
+            _warmup_error = None
+        except Exception as e:
+            # Jangan crash thread; request berikutnya akan mencoba lagi dan menampilkan error-nya.
+            _warmup_error = e
+
+    with _model_lock:
+        if _model is not None or (_warmup_thread is not None and _warmup_thread.is_alive()):
+            return _warmup_thread
+        _warmup_thread = threading.Thread(target=_run, name="model-warmup", daemon=True)
+        _warmup_thread.start()
+        return _warmup_thread
+
+def model_status() -> str:
+    if _model is not None:
+        # Backend registry: tampilkan versi aktif (berubah setelah hot reload).
+        version = getattr(_model, "version", None)
+        return f"siap (versi {version})" if version else "siap"
+    if _warmup_thread is not None and _warmup_thread.is_alive():
+        return "memuat"
+    if _warmup_error is not None:
+        return f"gagal: {_warmup_error}"
+    return "belum dimuat"
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# PREPROCESS & PREDIKSI (SINKRONISASI TOTAL DENGAN COLAB)
+# ═══════════════════════════════════════════════════════════════════════════════
+def preprocess_image(image: Image.Image):
+    # 1. Resize Wajib 64x64 (Sesuai Cell 4 di notebook-mu)
+    with metrics.timer("preprocess"):
+        img = image.convert("RGB").resize(IMAGE_SIZE)
+        img_array = np.array(img).astype(np.float32)
+
+    # 2. JANGAN RESCALE MANUAL, JANGAN PREPROCESS_INPUT MANUAL
+    # Karena di notebook-mu, model sudah punya layer tersebut di dalamnya.
+
+    img_array = np.expand_dims(img_array, axis=0)
+    return img_array
+
+def preprocess_images(images, count: int, out: np.ndarray = None):
+    # Versi batch dari preprocess_image: gambar ditulis langsung ke satu array
+    # (N, 64, 64, 3) float32 yang dialokasikan sekali, tanpa expand_dims/concatenate per gambar.
+    if out is None:
+        out = np.empty((count, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    n = 0
+    for image in images:
+        if n >= count:
+            break
+        out[n] = np.asarray(image.convert("RGB").resize(IMAGE_SIZE), dtype=np.uint8)
+        n += 1
+    return out[:n]
+
+def _open_rgb(source, draft_side: int):
+    # -> (gambar RGB dengan orientasi EXIF diterapkan, apakah JPEG)
+    with Image.open(source) as img:
+        is_jpeg = img.format == "JPEG"
+        if is_jpeg:
+            img.draft("RGB", (draft_side, draft_side))
+        img = ImageOps.exif_transpose(img)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    return img, is_jpeg
+
+def decode_image(source, out: np.ndarray = None, preview_max: int = None):
+    # Decode cepat untuk input model (+ preview opsional) dari path/file-like/bytes:
+    # 1. draft(): libjpeg men-decode dekat ukuran target, bukan 12 MP penuh
+    # 2. exif_transpose(): orientasi foto kamera HP diterapkan pada gambar yang sudah kecil
+    # 3. hasil resize 64x64 ditulis langsung ke `out` (float32, bisa baris dari batch besar)
+    # Input model SELALU dari draft FAST_DECODE_MIN_SIDE, apa pun preview_max, supaya UI, CLI,
+    # server, evaluasi, dan kalibrasi melihat piksel yang sama. Preview JPEG yang lebih besar
+    # dari itu di-decode terpisah dengan draft-nya sendiri.
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    if out is None:
+        out = np.empty((IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    start = source.tell() if hasattr(source, "seek") else None
+
+    preview = None
+    with metrics.timer("decode"):
+        try:
+            img, is_jpeg = _open_rgb(source, FAST_DECODE_MIN_SIDE)
+            if preview_max and is_jpeg and preview_max > FAST_DECODE_MIN_SIDE:
+                if start is not None:
+                    source.seek(start)
+                preview, _ = _open_rgb(source, preview_max)
+        except Exception:
+            metrics.inc("decode_errors")
+            raise
+    with metrics.timer("preprocess"):
+        out[...] = np.asarray(img.resize(IMAGE_SIZE))
+
+    if preview_max:
+        preview = preview or img
+        preview.thumbnail((preview_max, preview_max))
+    return out, preview
+
+def preprocess_image_bytes(data, out: np.ndarray = None) -> np.ndarray:
+    # Setara preprocess_image(Image.open(...)) tapi lewat decode_image; hasil (1, 64, 64, 3).
+    if out is None:
+        out = np.empty((1, IMAGE_SIZE[1], IMAGE_SIZE[0], 3), dtype=np.float32)
+    decode_image(data, out=out[0])
+    return out
+
+def validate_input_batch(batch) -> np.ndarray:
+    # Tensor dari klien luar (sidecar, server HTTP) dicek SEBELUM masuk InferenceBatcher: batcher
+    # menggabungkan request lain ke batch yang sama, jadi satu bentuk salah menggagalkan semuanya.
+    batch = np.asarray(batch)
+    expected = (IMAGE_SIZE[1], IMAGE_SIZE[0], 3)
+    if batch.ndim != 4 or batch.shape[1:] != expected or batch.shape[0] == 0:
+        raise ValueError(f"Input harus berbentuk (N, {', '.join(map(str, expected))}), bukan {batch.shape}")
+    if not (np.issubdtype(batch.dtype, np.floating) or np.issubdtype(batch.dtype, np.integer)):
+        raise ValueError(f"Tipe input harus angka, bukan {batch.dtype}")
+    return batch.astype(np.float32, copy=False)
+
+def iter_image_paths(root: str):
+    # Walk terurut supaya urutan stabil antar run (penting untuk resume CLI).
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(dirpath, filename)
+
+def load_image_array(path: str, out: np.ndarray = None) -> np.ndarray:
+    # Decode satu file gambar menjadi array (64, 64, 3) float32; dipakai thread prefetch CLI.
+    return decode_image(path, out=out)[0]
+
+def model_predict(model, img_array):
+    with metrics.timer("predict"):
+        return _model_predict(model, img_array)
+
+def _model_predict(model, img_array):
+    # ServingModel & backend lain (TFLite, dst.) cukup dipanggil langsung.
+    if not hasattr(model, "signatures"):
+        return model(img_array)
+
+    # Jalur lama untuk objek hasil tf.saved_model.load mentah.
+    tf = _tf()
+    # PENTING: Memanggil signature 'serving_default'
+    infer = model.signatures["serving_default"]
+    input_name = list(infer.structured_input_signature[1].keys())[0]
+
+    # PENTING SEKALI: Tambahkan training=False agar Augmentasi (Flip/Rotate) MATI
+    # Jika tidak, gambar pisang kamu akan diputar-putar acak oleh AI
+    predictions = infer(**{input_name: tf.constant(img_array)})
+
+    output_name = list(predictions.keys())[0]
+    return predictions[output_name].numpy()
+
+def probabilities_from_logits(logits):
+    # Softmax di NumPy (stabil numerik), supaya hot path tidak perlu bolak-balik ke TF.
+    logits = np.asarray(logits, dtype=np.float32)
+    shifted = logits - logits.max(axis=-1, keepdims=True)
+    exp = np.exp(shifted)
+    return exp / exp.sum(axis=-1, keepdims=True)
+
+def top1(probs: np.ndarray):
+    # (N, C) -> indeks kelas & confidence (%) per baris.
+    idxs = np.argmax(probs, axis=1)
+    confs = probs[np.arange(len(idxs)), idxs] * 100.0
+    return idxs, confs
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TOP-K, KALIBRASI SUHU & PENOLAKAN "UNKNOWN"
+# ═══════════════════════════════════════════════════════════════════════════════
+# Temperature scaling: probabilitas = softmax(logits / T), T di-fit offline pada folder
+# berlabel (calibrate.py) lalu disimpan ke calibration.json. Prediksi dengan confidence
+# terkalibrasi di bawah ambang ditandai "unknown" (foto bukan buah / di luar 50 kelas).
+UNKNOWN_LABEL = "unknown"
+CALIBRATION_PATH = os.environ.get("FRUITSCAN_CALIBRATION", os.path.join(APP_DIR, "calibration.json"))
+# Ambang 0-1; kalau tidak di-set dipakai nilai dari calibration.json (0 = tidak pernah menolak).
+REJECT_THRESHOLD = os.environ.get("FRUITSCAN_REJECT_THRESHOLD") or None
+
+def _log_normalizer(scaled: np.ndarray) -> np.ndarray:
+    m = scaled.max(axis=1, keepdims=True)
+    return m + np.log(np.exp(scaled - m).sum(axis=1, keepdims=True))
+
+def top_k(logits, k: int = 3, temperature: float = 1.0):
+    # (N, C) logits -> indeks (N, k) terurut menurun & probabilitasnya (N, k).
+    # argpartition O(C) memilih k kandidat; hanya k itu yang diurutkan.
+    scaled = np.asarray(logits, dtype=np.float32)
+    if scaled.ndim == 1:
+        scaled = scaled[np.newaxis]
+    if temperature != 1.0:
+        scaled = scaled / np.float32(temperature)
+    n, c = scaled.shape
+    k = max(1, min(int(k), c))
+    if k < c:
+        idxs = np.argpartition(-scaled, k - 1, axis=1)[:, :k]
+    else:
+        idxs = np.broadcast_to(np.arange(c), (n, c))
+    top_logits = np.take_along_axis(scaled, idxs, axis=1)
+    order = np.argsort(-top_logits, axis=1, kind="stable")
+    idxs = np.take_along_axis(idxs, order, axis=1)
+    top_logits = np.take_along_axis(top_logits, order, axis=1)
+    return idxs, np.exp(top_logits - _log_normalizer(scaled))
+
+def softmax_nll(logits, labels, temperature: float = 1.0) -> float:
+    scaled = np.asarray(logits, dtype=np.float64) / temperature
+    labels = np.asarray(labels, dtype=np.int64)
+    picked = scaled[np.arange(len(labels)), labels]
+    return float(np.mean(_log_normalizer(scaled)[:, 0] - picked))
+
+def fit_temperature(logits, labels, low: float = 0.05, high: float = 20.0, iters: int = 60) -> float:
+    # NLL unimodal terhadap log T -> golden-section search, cukup NumPy tanpa optimizer.
+    lo, hi = np.log(low), np.log(high)
+    ratio = (np.sqrt(5.0) - 1.0) / 2.0
+    a, b = hi - ratio * (hi - lo), lo + ratio * (hi - lo)
+    fa, fb = softmax_nll(logits, labels, np.exp(a)), softmax_nll(logits, labels, np.exp(b))
+    for _ in range(iters):
+        if fa < fb:
+            hi, b, fb = b, a, fa
+            a = hi - ratio * (hi - lo)
+            fa = softmax_nll(logits, labels, np.exp(a))
+        else:
+            lo, a, fa = a, b, fb
+            b = lo + ratio * (hi - lo)
+            fb = softmax_nll(logits, labels, np.exp(b))
+    return float(np.exp((lo + hi) / 2.0))
+
+def expected_calibration_error(confidence, correct, bins: int = 15) -> float:
+    confidence = np.asarray(confidence, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    if confidence.size == 0:
+        return 0.0
+    which = np.minimum((confidence * bins).astype(np.int64), bins - 1)
+    conf_sum = np.bincount(which, weights=confidence, minlength=bins)
+    acc_sum = np.bincount(which, weights=correct, minlength=bins)
+    return float(np.abs(conf_sum - acc_sum).sum() / confidence.size)
+
+class Calibration:
+    def __init__(self, temperature: float = 1.0, reject_threshold: float = 0.0, meta: dict = None):
+        self.temperature = float(temperature)
+        self.reject_threshold = float(reject_threshold)
+        self.meta = dict(meta or {})
+
+    @classmethod
+    def load(cls, path: str = None):
+        path = path or CALIBRATION_PATH
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            calibration = cls(
+                temperature=data.get("temperature", 1.0),
+                reject_threshold=data.get("reject_threshold", 0.0),
+                meta={k: v for k, v in data.items() if k not in ("temperature", "reject_threshold")},
+            )
+        except (OSError, ValueError, TypeError):
+            calibration = cls()
+        if calibration.temperature <= 0:
+            calibration.temperature = 1.0
+        return calibration
+
+    def save(self, path: str = None):
+        path = os.path.abspath(path or CALIBRATION_PATH)
+        data = {"temperature": self.temperature, "reject_threshold": self.reject_threshold}
+        data.update(self.meta)
+        model_download.write_text_atomic(path, json.dumps(data, indent=2, ensure_ascii=False) + "\n")
+
+_calibration = None
+
+def get_calibration() -> Calibration:
+    global _calibration
+    if _calibration is None:
+        calibration = Calibration.load()
+        if REJECT_THRESHOLD is not None:
+            calibration.reject_threshold = float(REJECT_THRESHOLD)
+        _calibration = calibration
+    return _calibration
+
+def rank_predictions(logits, k: int = 3, calibration: Calibration = None):
+    # Dipakai UI, server & CLI: top-k terkalibrasi + masker "unknown" per baris.
+    calibration = calibration or get_calibration()
+    with metrics.timer("rank"):
+        idxs, probs = top_k(logits, k=k, temperature=calibration.temperature)
+        rejected = probs[:, 0] < calibration.reject_threshold
+    metrics.inc("predictions", len(rejected))
+    metrics.inc("predictions_unknown", int(rejected.sum()))
+    return idxs, probs, rejected
+
+def get_display_name(class_name: str) -> str:
+    tokens = class_name.split()
+    if tokens and tokens[-1].isdigit():
+        return " ".join(tokens[:-1])
+    return class_name
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# INSTRUMENTASI RINGAN: TIMER PER TAHAP, COUNTER, GAUGE
+# ═══════════════════════════════════════════════════════════════════════════════
+# Satu registry per proses. Tiap tahap (decode, preprocess, predict, rank, render, ...)
+# menyimpan jendela STATS_WINDOW sampel terakhir dalam ring buffer NumPy -> p50/p95/p99,
+# ditambah count & sum kumulatif. Ekspor: teks Prometheus (GET /metrics di server.py),
+# dump JSONL berkala (FRUITSCAN_METRICS_JSONL), dan panel admin di sidebar Streamlit.
+# FRUITSCAN_METRICS=0 mematikan semuanya: timer() mengembalikan context manager kosong yang
+# sama, inc()/observe() langsung return -> biaya hanya satu cek boolean per panggilan.
+
+ENABLED = os.environ.get("FRUITSCAN_METRICS", "1") != "0"
+JSONL_PATH = os.environ.get("FRUITSCAN_METRICS_JSONL") or None
+JSONL_INTERVAL_S = float(os.environ.get("FRUITSCAN_METRICS_INTERVAL_S", "60"))
+STATS_WINDOW = 2048
+PROMETHEUS_PREFIX = "fruitscan"
+QUANTILES = (50, 95, 99)
+
+class Histogram:
+    __slots__ = ("_samples", "_pos", "count", "total")
+
+    def __init__(self, window: int = STATS_WINDOW):
+        self._samples = np.zeros(window, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self._samples[self._pos] = value
+        self._pos = (self._pos + 1) % len(self._samples)
+        self.count += 1
+        self.total += value
+
+    def snapshot(self) -> dict:
+        window = self._samples[:min(self.count, len(self._samples))]
+        result = {"count": self.count, "sum": self.total}
+        if window.size:
+            for q, v in zip(QUANTILES, np.percentile(window, QUANTILES)):
+                result[f"p{q}"] = float(v)
+        else:
+            result.update({f"p{q}": 0.0 for q in QUANTILES})
+        return result
+
+class MetricsRegistry:
+    def __init__(self, window: int = STATS_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._collectors = {}
+        self.started_at = time.time()
+
+    def observe(self, stage: str, ms: float):
+        with self._lock:
+            hist = self._histograms.get(stage)
+            if hist is None:
+                hist = self._histograms[stage] = Histogram(self.window)
+            hist.observe(ms)
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self._gauges[name] = float(value)
+
+    def register_collector(self, name: str, fn):
+        # fn() -> dict angka; dibaca saat snapshot (mis. batcher.stats(), cache.stats()).
+        with self._lock:
+            self._collectors[name] = fn
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stages = {name: hist.snapshot() for name, hist in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            collectors = dict(self._collectors)
+        for prefix, fn in collectors.items():
+            try:
+                values = fn()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    gauges[f"{prefix}_{key}"] = float(value)
+        return {
+            "time": time.time(),
+            "uptime_s": time.time() - self.started_at,
+            "stages_ms": dict(sorted(stages.items())),
+            "counters": dict(sorted(counters.items())),
+            "gauges": dict(sorted(gauges.items())),
+        }
+
+    def prometheus_text(self) -> str:
+        snap = self.snapshot()
+        p = PROMETHEUS_PREFIX
+        lines = [
+            f"# HELP {p}_stage_seconds Latensi per tahap (jendela {self.window} sampel terakhir untuk quantile).",
+            f"# TYPE {p}_stage_seconds summary",
+        ]
+        for stage, s in snap["stages_ms"].items():
+            for q in QUANTILES:
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="{q / 100:g}"}} {s[f"p{q}"] / 1000.0:.6g}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {s["sum"] / 1000.0:.6g}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {s["count"]}')
+        for name, value in snap["counters"].items():
+            lines.append(f"# TYPE {p}_{name}_total counter")
+            lines.append(f"{p}_{name}_total {value}")
+        for name, value in snap["gauges"].items():
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {value:.6g}")
+        lines.append(f"# TYPE {p}_uptime_seconds gauge")
+        lines.append(f"{p}_uptime_seconds {snap['uptime_s']:.3f}")
+        return "\n".join(lines) + "\n"
+
+    def dump_jsonl(self, path: str):
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + "\n")
+
+REGISTRY = MetricsRegistry()
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+@contextmanager
+def _timer(stage: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(stage, (time.perf_counter() - started) * 1000.0)
+
+def enabled() -> bool:
+    return ENABLED
+
+def set_enabled(value: bool):
+    global ENABLED
+    ENABLED = bool(value)
+
+def timer(stage: str):
+    # with metrics.timer("decode"): ...
+    return _timer(stage) if ENABLED else _NULL_TIMER
+
+def observe(stage: str, ms: float):
+    if ENABLED:
+        REGISTRY.observe(stage, ms)
+
+def inc(name: str, amount: int = 1):
+    if ENABLED:
+        REGISTRY.inc(name, amount)
+
+def set_gauge(name: str, value: float):
+    if ENABLED:
+        REGISTRY.set_gauge(name, value)
+
+def register_collector(name: str, fn):
+    REGISTRY.register_collector(name, fn)
+
+def snapshot() -> dict:
+    return REGISTRY.snapshot()
+
+def prometheus_text() -> str:
+    return REGISTRY.prometheus_text()
+
+_dumper = None
+_dumper_lock = threading.Lock()
+
+def start_jsonl_dumper(path: str = None, interval_s: float = None):
+    # Thread daemon yang menambahkan satu snapshot per interval ke file JSONL (sekali per proses).
+    global _dumper
+    path = path or JSONL_PATH
+    if not path or not ENABLED:
+        return None
+    interval_s = interval_s or JSONL_INTERVAL_S
+    with _dumper_lock:
+        if _dumper is not None and _dumper.is_alive():
+            return _dumper
+
+        def _run():
+            while True:
+                time.sleep(interval_s)
+                try:
+                    REGISTRY.dump_jsonl(path)
+                except OSError:
+                    pass
+
+        _dumper = threading.Thread(target=_run, name="metrics-jsonl", daemon=True)
+        _dumper.start()
+        return _dumper
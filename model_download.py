@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import zipfile
+from contextlib import contextmanager
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# DOWNLOAD & EKSTRAK MODEL (resumable, terverifikasi SHA-256, aman multi-proses)
+# ═══════════════════════════════════════════════════════════════════════════════
+# - Download ditulis ke "<file>.part" dan dilanjutkan dengan header Range kalau terputus.
+# - Sumber bisa http(s)://, file:// atau path lokal (mirror / test offline).
+# - Hanya satu proses yang mengunduh: yang lain menunggu lock lalu memakai hasilnya.
+# - Ekstraksi ke folder sementara lalu di-rename, jadi tidak pernah ada model setengah jadi.
+
+CHUNK_SIZE = 1024 * 1024
+
+@contextmanager
+def file_lock(lock_path: str):
+    os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+    with open(lock_path, "a+b") as f:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.5)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def load_manifest(path: str) -> dict:
+    # Manifest JSON opsional: {"sha256": "...", "url": "...", "size": 123}
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _local_path_from_source(source: str):
+    parsed = urllib.parse.urlparse(source)
+    if parsed.scheme == "file":
+        return urllib.request.url2pathname(parsed.path)
+    if parsed.scheme == "" or (len(parsed.scheme) == 1 and os.name == "nt"):
+        return source
+    return None
+
+def _parse_content_range(value):
+    # "bytes 100-199/200" -> (100, 200); "bytes */200" -> (None, 200); header kosong/aneh -> (None, None)
+    try:
+        unit, spec = (value or "").strip().split(" ", 1)
+        if unit != "bytes":
+            return None, None
+        span, total = spec.split("/", 1)
+        start = None if span == "*" else int(span.split("-", 1)[0])
+        return start, None if total == "*" else int(total)
+    except ValueError:
+        return None, None
+
+def _download_http(source: str, part_path: str, offset: int, status_callback, timeout: float):
+    while True:
+        request = urllib.request.Request(source)
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+        try:
+            response = urllib.request.urlopen(request, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code != 416 or not offset:
+                raise
+            # 416: .part sudah lengkap -> anggap selesai, checksum yang memutuskan. Kalau server
+            # menyebut ukuran file dan .part lebih besar, .part itu sampah: unduh ulang dari nol.
+            _, total = _parse_content_range(e.headers.get("Content-Range"))
+            if total is None or total == offset:
+                return
+            offset = 0
+            if status_callback is not None:
+                status_callback("File sementara tidak cocok dengan server, mengunduh ulang dari awal...")
+            continue
+
+        with response:
+            resumed = False
+            if offset and response.status == 206:
+                # Hanya sambung kalau potongan yang dikirim benar-benar mulai di offset kita.
+                start, _ = _parse_content_range(response.headers.get("Content-Range"))
+                if start != offset:
+                    offset = 0
+                    if status_callback is not None:
+                        status_callback("Content-Range dari server tidak cocok, mengunduh ulang dari awal...")
+                    continue
+                resumed = True
+                if status_callback is not None:
+                    status_callback(f"Melanjutkan download dari {offset / 1e6:.1f} MB...")
+            elif offset:
+                # Server tidak mendukung Range: mulai ulang dari nol.
+                if status_callback is not None:
+                    status_callback("Server tidak mendukung resume, mengunduh ulang dari awal...")
+
+            with open(part_path, "ab" if resumed else "wb") as dst:
+                shutil.copyfileobj(response, dst, CHUNK_SIZE)
+            return
+
+def download_resumable(source: str, dest_path: str, status_callback=None, timeout: float = 60.0) -> str:
+    part_path = dest_path + ".part"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+
+    local_path = _local_path_from_source(source)
+    if local_path is not None:
+        total = os.path.getsize(local_path)
+        if offset > total:
+            offset = 0
+        with open(local_path, "rb") as src, open(part_path, "ab" if offset else "wb") as dst:
+            src.seek(offset)
+            shutil.copyfileobj(src, dst, CHUNK_SIZE)
+    else:
+        _download_http(source, part_path, offset, status_callback, timeout)
+
+    try:
+        os.replace(part_path, dest_path)
+    except FileNotFoundError:
+        raise RuntimeError(f"Download dari {source} tidak menghasilkan file") from None
+    return dest_path
+
+def verify_sha256(path: str, expected: str):
+    actual = sha256_file(path)
+    if expected and actual.lower() != expected.lower():
+        os.remove(path)
+        raise RuntimeError(f"Checksum model tidak cocok (diharapkan {expected}, didapat {actual})")
+    return actual
+
+def _saved_model_root_in_zip(infos):
+    # Cari folder yang berisi saved_model.pb langsung dari daftar isi ZIP (tanpa os.walk).
+    candidates = [i.filename.replace("\\", "/") for i in infos if i.filename.replace("\\", "/").endswith("saved_model.pb")]
+    if not candidates:
+        return None
+    best = min(candidates, key=lambda name: name.count("/"))
+    return os.path.dirname(best)
+
+def extract_zip_atomic(zip_path: str, dest_dir: str) -> str:
+    # Ekstrak (streaming per member) ke folder sementara di parent yang sama, lalu rename.
+    # Kembalikan path folder yang berisi saved_model.pb.
+    parent = os.path.dirname(os.path.abspath(dest_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".extract-", dir=parent)
+    os.chmod(tmp_dir, 0o755)  # mkdtemp membuat 0700; samakan dengan folder biasa
+    tmp_abs = os.path.abspath(tmp_dir)
+    try:
+        with zipfile.ZipFile(zip_path, "r") as z:
+            infos = z.infolist()
+            model_root = _saved_model_root_in_zip(infos)
+            if model_root is None:
+                raise RuntimeError("Model berhasil diunduh tapi saved_model.pb tidak ditemukan")
+
+            for info in infos:
+                member_name = info.filename.replace("\\", "/")
+                if member_name.endswith("/"):
+                    continue
+
+                target_path = os.path.abspath(os.path.join(tmp_dir, member_name))
+                if not target_path.startswith(tmp_abs + os.sep):
+                    raise RuntimeError("Unsafe ZIP path detected")
+
+                os.makedirs(os.path.dirname(target_path), exist_ok=True)
+                with z.open(info, "r") as src, open(target_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+        if os.path.exists(dest_dir):
+            shutil.rmtree(dest_dir)
+        os.replace(tmp_dir, dest_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    return os.path.join(dest_dir, model_root) if model_root else dest_dir
+
+def write_text_atomic(path: str, text: str):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    finally:
+        # Setelah os.replace berhasil tmp_path sudah tidak ada; kalau gagal, jangan tinggalkan sampah.
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,445 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+import inference
+import metrics
+import model_download
+from inference import IMAGE_SIZE, MODEL_CACHE_ROOT, probabilities_from_logits
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# REGISTRY MODEL LOKAL (versi, pointer "current" atomik, hot reload tanpa downtime)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Struktur folder (FRUITSCAN_MODEL_REGISTRY, default MODEL_CACHE_ROOT/registry):
+#   versions/<versi>/model/          SavedModel
+#   versions/<versi>/metadata.json   {version, created_at, class_names, num_classes,
+#                                     input_size, sha256, size_bytes, source}
+#   CURRENT                          nama versi aktif (ditulis via rename -> atomik)
+#   leases/<versi>.lock              flock bersama selama ada proses yang memakai versi itu
+# Deploy model baru = `python model_registry.py publish <folder SavedModel>`; worker yang
+# memakai FRUITSCAN_BACKEND=registry mendeteksi perubahan CURRENT lewat thread watcher,
+# memuat + warm-up versi baru di samping versi lama, lalu menukar referensinya. Request yang
+# sedang berjalan selesai di versi lama; request baru langsung memakai versi baru. Daftar
+# kelas tiap versi wajib sama dengan CLASS_NAMES (urutan indeks = tabel nutrisi).
+
+REGISTRY_ROOT = os.environ.get("FRUITSCAN_MODEL_REGISTRY", os.path.join(MODEL_CACHE_ROOT, "registry"))
+# Batas total ukuran folder versi di disk; versi aktif + MIN_KEEP_VERSIONS terbaru tidak pernah dihapus.
+REGISTRY_MAX_MB = float(os.environ.get("FRUITSCAN_MODEL_REGISTRY_MB", "2048"))
+MIN_KEEP_VERSIONS = 2
+WATCH_INTERVAL_S = float(os.environ.get("FRUITSCAN_MODEL_WATCH_S", "5"))
+CURRENT_FILE = "CURRENT"
+METADATA_FILE = "metadata.json"
+MODEL_SUBDIR = "model"
+
+def _versions_dir(root: str) -> str:
+    return os.path.join(root, "versions")
+
+def version_dir(version: str, root: str = None) -> str:
+    return os.path.join(_versions_dir(root or REGISTRY_ROOT), version)
+
+def model_dir(version: str, root: str = None) -> str:
+    return os.path.join(version_dir(version, root), MODEL_SUBDIR)
+
+def _lock_path(root: str) -> str:
+    return os.path.join(root, ".lock")
+
+def _lease_path(version: str, root: str) -> str:
+    return os.path.join(root, "leases", f"{version}.lock")
+
+class VersionLease:
+    # Lock bersama (flock LOCK_SH) yang dipegang selama proses ini memuat/memakai satu versi;
+    # evict() melewati versi yang lease-nya masih dipegang proses mana pun. Lock lepas otomatis
+    # kalau proses mati. Di Windows (tanpa flock) lease tidak berlaku, hanya aturan `keep`.
+    def __init__(self, version: str, root: str):
+        self.version = version
+        self._f = None
+        if os.name == "nt":
+            return
+        import fcntl
+        path = _lease_path(version, root)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._f = open(path, "a+b")
+        fcntl.flock(self._f.fileno(), fcntl.LOCK_SH)
+
+    def release(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+@contextmanager
+def _unused_version(version: str, root: str):
+    # -> True (dan lease dikunci eksklusif selama blok) kalau tidak ada proses yang memakai versi ini.
+    if os.name == "nt":
+        yield True
+        return
+    import fcntl
+    try:
+        f = open(_lease_path(version, root), "rb")
+    except FileNotFoundError:
+        yield True
+        return
+    with f:
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+def directory_checksum(path: str):
+    # -> (sha256, total byte): hash atas (path relatif, isi) semua file, urutan deterministik.
+    h = hashlib.sha256()
+    total = 0
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for name in sorted(filenames):
+            full = os.path.join(dirpath, name)
+            h.update(os.path.relpath(full, path).replace(os.sep, "/").encode("utf-8") + b"\0")
+            with open(full, "rb") as f:
+                for chunk in iter(lambda: f.read(model_download.CHUNK_SIZE), b""):
+                    h.update(chunk)
+                    total += len(chunk)
+    return h.hexdigest(), total
+
+def check_classes(class_names, expected=None):
+    from nutrisi import CLASS_NAMES
+
+    expected = list(CLASS_NAMES if expected is None else expected)
+    class_names = list(class_names)
+    if class_names == expected:
+        return
+    if len(class_names) != len(expected):
+        raise ValueError(f"Model punya {len(class_names)} kelas, aplikasi butuh {len(expected)}")
+    diff = [(i, a, b) for i, (a, b) in enumerate(zip(class_names, expected)) if a != b]
+    i, got, want = diff[0]
+    raise ValueError(f"Daftar kelas berbeda di {len(diff)} indeks (pertama #{i}: {got!r}, aplikasi {want!r})")
+
+def read_current(root: str = None):
+    try:
+        with open(os.path.join(root or REGISTRY_ROOT, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    return version or None
+
+def load_metadata(version: str, root: str = None) -> dict:
+    with open(os.path.join(version_dir(version, root), METADATA_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def list_versions(root: str = None) -> list:
+    # Metadata semua versi lengkap (yang punya metadata.json), urut dari yang tertua.
+    root = root or REGISTRY_ROOT
+    try:
+        names = os.listdir(_versions_dir(root))
+    except OSError:
+        return []
+    versions = []
+    for name in names:
+        if name.startswith("."):
+            continue
+        try:
+            versions.append(load_metadata(name, root))
+        except (OSError, ValueError):
+            continue
+    return sorted(versions, key=lambda m: (m["created_at"], m["version"]))
+
+def verify(version: str, root: str = None) -> dict:
+    meta = load_metadata(version, root)
+    sha256, _ = directory_checksum(model_dir(version, root))
+    if sha256 != meta["sha256"]:
+        raise RuntimeError(f"Checksum versi {version} tidak cocok (diharapkan {meta['sha256']}, didapat {sha256})")
+    return meta
+
+def set_current(version: str, root: str = None):
+    root = root or REGISTRY_ROOT
+    load_metadata(version, root)  # versi harus ada & lengkap
+    model_download.write_text_atomic(os.path.join(root, CURRENT_FILE), version)
+
+def publish(source_dir: str, version: str = None, class_names=None, root: str = None, make_current: bool = True) -> dict:
+    # Salin SavedModel ke versions/<versi> (lewat folder sementara + rename), tulis metadata,
+    # lalu (opsional) arahkan CURRENT ke versi ini.
+    from nutrisi import CLASS_NAMES
+
+    root = root or REGISTRY_ROOT
+    if not os.path.exists(os.path.join(source_dir, "saved_model.pb")):
+        raise RuntimeError(f"saved_model.pb tidak ditemukan di {source_dir}")
+    class_names = list(CLASS_NAMES if class_names is None else class_names)
+    check_classes(class_names)
+
+    sha256, size = directory_checksum(source_dir)
+    version = version or f"{time.strftime('%Y%m%d-%H%M%S')}-{sha256[:8]}"
+    meta = {
+        "version": version,
+        "created_at": time.time(),
+        "class_names": class_names,
+        "num_classes": len(class_names),
+        "input_size": list(IMAGE_SIZE),
+        "sha256": sha256,
+        "size_bytes": size,
+        "source": os.path.abspath(source_dir),
+    }
+
+    versions = _versions_dir(root)
+    os.makedirs(versions, exist_ok=True)
+    with model_download.file_lock(_lock_path(root)):
+        target = version_dir(version, root)
+        if os.path.exists(target):
+            raise RuntimeError(f"Versi {version} sudah ada di registry")
+        tmp_dir = tempfile.mkdtemp(prefix=".publish-", dir=versions)
+        try:
+            shutil.copytree(source_dir, os.path.join(tmp_dir, MODEL_SUBDIR))
+            with open(os.path.join(tmp_dir, METADATA_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False, indent=2)
+            os.chmod(tmp_dir, 0o755)
+            os.replace(tmp_dir, target)
+        except BaseException:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            raise
+        if make_current:
+            set_current(version, root)
+    return meta
+
+def evict(root: str = None, max_bytes: int = None, keep=()) -> list:
+    # Hapus versi tertua sampai total <= max_bytes. Versi aktif, versi di `keep` (mis. yang
+    # sedang dimuat proses ini), MIN_KEEP_VERSIONS terbaru, dan versi yang masih punya lease
+    # (dimuat proses lain) selalu dipertahankan.
+    root = root or REGISTRY_ROOT
+    max_bytes = int(REGISTRY_MAX_MB * 1024 * 1024) if max_bytes is None else int(max_bytes)
+    removed = []
+    with model_download.file_lock(_lock_path(root)):
+        versions = list_versions(root)
+        protected = {read_current(root), *keep}
+        protected.update(m["version"] for m in versions[-MIN_KEEP_VERSIONS:])
+        total = sum(m["size_bytes"] for m in versions)
+        for meta in versions:
+            if total <= max_bytes:
+                break
+            if meta["version"] in protected:
+                continue
+            with _unused_version(meta["version"], root) as unused:
+                if not unused:
+                    continue
+                shutil.rmtree(version_dir(meta["version"], root), ignore_errors=True)
+                try:
+                    os.remove(_lease_path(meta["version"], root))
+                except OSError:
+                    pass
+            total -= meta["size_bytes"]
+            removed.append(meta["version"])
+            metrics.inc("model_versions_evicted")
+    return removed
+
+def load_savedmodel(path: str):
+    saved_model = inference._tf().saved_model.load(path)
+    serving = inference.ServingModel(saved_model)
+    serving.warmup()
+    return serving
+
+class HotSwapModel:
+    # Antarmuka sama dengan backend lain (lihat backends.py). Model aktif dipegang sebagai satu
+    # tuple (versi, model) supaya pembacaan & penukaran atomik tanpa lock di jalur prediksi.
+    def __init__(self, root: str = None, loader=load_savedmodel, max_bytes: int = None):
+        self.name = "registry"
+        self.root = root or REGISTRY_ROOT
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self._active = None
+        self._lease = None
+        self._reload_lock = threading.Lock()
+        self._listeners = []
+        self._watcher = None
+        self._stop = threading.Event()
+        self._pointer_stat = None
+        self.loaded_at = None
+        self.reloads = 0
+        self.last_error = None
+
+        version = read_current(self.root)
+        if version is None:
+            raise RuntimeError(
+                f"Registry {self.root} belum punya versi aktif; jalankan `python model_registry.py publish <folder>`"
+            )
+        self._swap(version, *self._load(version))
+
+    @property
+    def version(self):
+        return self._active[0]
+
+    @property
+    def identity(self):
+        return f"registry-{self._active[0]}"
+
+    @property
+    def model(self):
+        return self._active[1]
+
+    @property
+    def num_classes(self):
+        return self._active[1].num_classes
+
+    def _load(self, version: str):
+        # -> (model, lease); lease diambil sebelum verifikasi supaya evict() proses lain tidak
+        # menghapus folder versi ini selagi dimuat.
+        lease = VersionLease(version, self.root)
+        try:
+            meta = verify(version, self.root)
+            check_classes(meta["class_names"])
+            with metrics.timer("model_load"):
+                model = self.loader(model_dir(version, self.root))
+            if int(model.num_classes) != meta["num_classes"]:
+                raise ValueError(f"Output model {model.num_classes} kelas, metadata {meta['num_classes']}")
+        except BaseException:
+            lease.release()
+            raise
+        return model, lease
+
+    def _swap(self, version: str, model, lease=None):
+        # Referensi ke model lama dilepas di sini (memori dibebaskan setelah request terakhirnya selesai).
+        self._active = (version, model)
+        previous_lease, self._lease = self._lease, lease
+        if previous_lease is not None:
+            previous_lease.release()
+        self.loaded_at = time.time()
+        metrics.set_gauge("model_loaded_at", self.loaded_at)
+        for fn in list(self._listeners):
+            fn(version)
+
+    def add_swap_listener(self, fn):
+        # fn(versi) dipanggil setelah swap (mis. log atau notifikasi).
+        self._listeners.append(fn)
+
+    def reload_if_changed(self) -> bool:
+        version = read_current(self.root)
+        if version is None or version == self.version:
+            return False
+        with self._reload_lock:
+            if version == self.version:
+                return False
+            try:
+                model, lease = self._load(version)
+            except Exception as e:
+                # Versi rusak / kelas tidak cocok: tetap di versi lama, coba lagi saat CURRENT berubah.
+                self.last_error = f"{version}: {e}"
+                metrics.inc("model_reload_errors")
+                return False
+            previous = self.version
+            self._swap(version, model, lease)
+            self.reloads += 1
+            self.last_error = None
+            metrics.inc("model_reloads")
+        try:
+            evict(self.root, self.max_bytes, keep=(version, previous))
+        except OSError:
+            pass
+        return True
+
+    def _pointer_changed(self) -> bool:
+        try:
+            st = os.stat(os.path.join(self.root, CURRENT_FILE))
+        except OSError:
+            return False
+        key = (st.st_mtime_ns, st.st_size, st.st_ino)
+        changed = key != self._pointer_stat
+        self._pointer_stat = key
+        return changed
+
+    def start_watcher(self, interval_s: float = None):
+        interval_s = interval_s or WATCH_INTERVAL_S
+        if self._watcher is not None and self._watcher.is_alive():
+            return self._watcher
+
+        def _run():
+            while not self._stop.wait(interval_s):
+                if self._pointer_changed():
+                    self.reload_if_changed()
+
+        self._pointer_changed()
+        self._watcher = threading.Thread(target=_run, name="model-registry-watch", daemon=True)
+        self._watcher.start()
+        return self._watcher
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
+
+    def __call__(self, img_array) -> np.ndarray:
+        return self._active[1](img_array)
+
+    @property
+    def embedding_source(self):
+        return getattr(self._active[1], "embedding_source", "logits")
+
+    def predict_with_embedding(self, img_array):
+        model = self._active[1]
+        if hasattr(model, "predict_with_embedding"):
+            return model.predict_with_embedding(img_array)
+        logits = model(img_array)
+        return logits, logits
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        self._active[1].warmup(batch_sizes)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kelola registry model FruitScan (versi + pointer CURRENT).")
+    parser.add_argument("--root", default=REGISTRY_ROOT)
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_publish = sub.add_parser("publish", help="Tambah versi baru dari folder SavedModel")
+    p_publish.add_argument("source_dir")
+    p_publish.add_argument("--version", default=None)
+    p_publish.add_argument("--classes", default=None, help="File teks satu nama kelas per baris (default CLASS_NAMES)")
+    p_publish.add_argument("--no-activate", action="store_true", help="Jangan pindahkan CURRENT ke versi ini")
+    p_activate = sub.add_parser("activate", help="Arahkan CURRENT ke versi yang sudah ada (juga untuk rollback)")
+    p_activate.add_argument("version")
+    sub.add_parser("list", help="Daftar versi")
+    p_gc = sub.add_parser("gc", help="Hapus versi lama sampai di bawah batas ukuran")
+    p_gc.add_argument("--max-mb", type=float, default=REGISTRY_MAX_MB)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "publish":
+            class_names = None
+            if args.classes:
+                with open(args.classes, "r", encoding="utf-8") as f:
+                    class_names = [line.strip() for line in f if line.strip()]
+            meta = publish(args.source_dir, version=args.version, class_names=class_names,
+                           root=args.root, make_current=not args.no_activate)
+            print(f"{meta['version']}  {meta['size_bytes'] / 1e6:.1f} MB  sha256 {meta['sha256'][:16]}")
+        elif args.command == "activate":
+            verify(args.version, args.root)
+            set_current(args.version, args.root)
+            print(f"CURRENT -> {args.version}")
+        elif args.command == "list":
+            current = read_current(args.root)
+            for meta in list_versions(args.root):
+                mark = "*" if meta["version"] == current else " "
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(meta["created_at"]))
+                print(f"{mark} {meta['version']:32s} {created}  {meta['size_bytes'] / 1e6:8.1f} MB  {meta['num_classes']} kelas")
+        elif args.command == "gc":
+            removed = evict(args.root, int(args.max_mb * 1024 * 1024))
+            print(f"Dihapus: {', '.join(removed) if removed else '-'}")
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
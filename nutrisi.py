@@ -1,4 +1,8 @@
 # nutrisi.py
+import re
+from collections import namedtuple
+
+import numpy as np
 
 # --- 1. DAFTAR 50 KELAS (Urutan Alfabetis MUTLAK - Sesuai Dataset Folder) ---
 # JANGAN MENGUBAH URUTAN INI karena model AI menggunakan indeks posisi.
@@ -66,4 +70,70 @@ NUTRISI_DATA = {
     'Nut': {"Kalori": "600 kcal", "Vitamin": "E", "Serat": "7.0g", "Manfaat": "Energi tahan lama."},
     'Onion': {"Kalori": "40 kcal", "Vitamin": "C, B6", "Serat": "1.7g", "Manfaat": "Antibakteri alami."},
     'Orange': {"Kalori": "47 kcal", "Vitamin": "C", "Serat": "2.4g", "Manfaat": "Vitamin C harian."}
-}
\ No newline at end of file
+}
+
+# --- 3. TABEL NUTRISI TERINDEKS ---
+# Dibangun SEKALI saat import: kolom NumPy sejajar CLASS_NAMES (baris i = output model ke-i),
+# nilai sudah numerik (kcal, gram), jadi jalur prediksi cukup NUTRITION[idx] tanpa parsing string.
+# Kelas yang tidak punya entri (atau nilainya tidak bisa dibaca) -> ValueError saat import.
+NUTRIENT_COLUMNS = ("kalori_kcal", "serat_g")
+
+NutritionInfo = namedtuple("NutritionInfo", ["class_name", "kalori_kcal", "serat_g", "vitamin", "manfaat"])
+
+_AMOUNT_RE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*([a-zA-Z]*)\s*$")
+
+def _parse_amount(text: str, unit: str, class_name: str) -> float:
+    match = _AMOUNT_RE.match(str(text))
+    if match is None or match.group(2).lower() != unit:
+        raise ValueError(f"Nilai nutrisi {class_name!r} tidak valid: {text!r} (harus angka + '{unit}')")
+    return float(match.group(1).replace(",", "."))
+
+class NutritionTable:
+    def __init__(self, class_names, data: dict):
+        missing = [name for name in class_names if name not in data]
+        unknown = sorted(set(data) - set(class_names))
+        if missing or unknown:
+            raise ValueError(f"NUTRISI_DATA tidak sejajar dengan CLASS_NAMES: tanpa data {missing}, kunci asing {unknown}")
+
+        self.class_names = tuple(class_names)
+        rows = [data[name] for name in self.class_names]
+        amounts = [(_parse_amount(r["Kalori"], "kcal", n), _parse_amount(r["Serat"], "g", n)) for n, r in zip(self.class_names, rows)]
+        # Matriks (n_kelas, len(NUTRIENT_COLUMNS)) float32, read-only; kolom = view ke matriks ini.
+        self.matrix = np.array(amounts, dtype=np.float32)
+        self.matrix.setflags(write=False)
+        self.kalori_kcal = self.matrix[:, 0]
+        self.serat_g = self.matrix[:, 1]
+        self.vitamin = tuple(tuple(v.strip() for v in r["Vitamin"].split(",") if v.strip()) for r in rows)
+        self.manfaat = tuple(r["Manfaat"] for r in rows)
+        # Teks tampilan asli ("52 kcal", "2.4g") untuk kartu UI & API, tidak dibentuk ulang per render.
+        self.labels = tuple(dict(r) for r in rows)
+        self._records = tuple(
+            NutritionInfo(n, kcal, serat, v, m)
+            for n, (kcal, serat), v, m in zip(self.class_names, amounts, self.vitamin, self.manfaat)
+        )
+        self._index = {name: i for i, name in enumerate(self.class_names)}
+        self._index_lower = {name.lower(): i for i, name in enumerate(self.class_names)}
+
+    def __len__(self) -> int:
+        return len(self.class_names)
+
+    def __getitem__(self, idx: int) -> NutritionInfo:
+        return self._records[idx]
+
+    def index_of(self, name: str):
+        # Nama kelas persis, lalu tanpa beda huruf besar/kecil; None kalau tidak ada.
+        idx = self._index.get(name)
+        if idx is None:
+            idx = self._index_lower.get(str(name).strip().lower())
+        return idx
+
+    def as_dict(self, idx: int) -> dict:
+        record = self._records[idx]
+        return {
+            "kalori_kcal": record.kalori_kcal,
+            "serat_g": record.serat_g,
+            "vitamin": list(record.vitamin),
+            "manfaat": record.manfaat,
+        }
+
+NUTRITION = NutritionTable(CLASS_NAMES, NUTRISI_DATA)
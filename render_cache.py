@@ -0,0 +1,137 @@
+import re
+from functools import lru_cache
+
+from inference import get_display_name
+from nutrisi import CLASS_NAMES, NUTRITION
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# CACHE RENDER PANEL HASIL (warna, grafik, potongan HTML per kelas)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Streamlit menjalankan ulang streamlit_app.py di setiap rerun, jadi apa pun yang dibangun di
+# sana ikut dibangun ulang. Modul ini di-import sekali per proses: tabel warna dibentuk sekali
+# dari CLASS_NAMES, figure nutrisi dibuat sekali per indeks kelas, dan HTML yang sama
+# (kotak hasil, bar confidence, kartu nutrisi) di-memo per (kelas, confidence 1 desimal).
+# Ukur: python -m benchmarks.bench_render
+
+# Aturan warna lama (substring nama buah) -> (warna1, warna2, bayangan). Urutan = prioritas.
+FRUIT_COLOR_RULES = [
+    (['apple red', 'apple crimson', 'apple hit', 'apple rotten', 'banana red', 'blackberrie not rippen',
+      'cherry', 'strawberry', 'tomato', 'cabbage red', 'onion red'],
+     ("#ef4444", "#b91c1c", "rgba(239, 68, 68, 0.4)")),
+    (['apple granny', 'avocado', 'beans', 'cabbage white', 'apple green', 'kiwi', 'lime', 'pear',
+      'cucumber', 'watermelon'],
+     ("#10b981", "#059669", "rgba(16, 185, 129, 0.4)")),
+    (['apple golden', 'apricot', 'banana', 'lemon', 'orange', 'cantaloupe', 'papaya', 'mango', 'peach', 'corn'],
+     ("#f59e0b", "#d97706", "rgba(245, 158, 11, 0.4)")),
+    (['blueberry', 'blackberrie', 'beetroot', 'grape', 'plum', 'eggplant'],
+     ("#8b5cf6", "#7c3aed", "rgba(139, 92, 246, 0.4)")),
+    (['apple pink lady', 'peach', 'pitaya'],
+     ("#ec4899", "#be185d", "rgba(236, 72, 153, 0.4)")),
+    (['potato', 'ginger', 'chestnut', 'coconut'],
+     ("#a8a29e", "#78716c", "rgba(168, 162, 158, 0.4)")),
+]
+APPLE_COLORS = ("#ef4444", "#b91c1c", "rgba(239, 68, 68, 0.4)")
+DEFAULT_COLORS = ("#10b981", "#059669", "rgba(16, 185, 129, 0.4)")
+UNKNOWN_COLORS = ("#64748b", "#475569", "rgba(100, 116, 139, 0.4)")
+
+def fruit_color(name: str):
+    name_lower = name.lower()
+    for keywords, colors in FRUIT_COLOR_RULES:
+        if any(x in name_lower for x in keywords):
+            return colors
+    return APPLE_COLORS if 'apple' in name_lower else DEFAULT_COLORS
+
+# Tabel warna per indeks kelas, dihitung sekali saat import.
+CLASS_COLORS = tuple(fruit_color(get_display_name(name)) for name in CLASS_NAMES)
+DISPLAY_NAMES = tuple(get_display_name(name) for name in CLASS_NAMES)
+
+def class_colors(idx) -> tuple:
+    return UNKNOWN_COLORS if idx is None else CLASS_COLORS[idx]
+
+@lru_cache(maxsize=len(CLASS_NAMES))
+def nutrition_chart(idx: int):
+    # Figure dibangun sekali per kelas lalu dipakai ulang (hanya dibaca oleh st.plotly_chart).
+    # Yang di-cache objek Figure, bukan dict/JSON: st.plotly_chart memvalidasi ulang dict
+    # dengan membangun Figure baru, sedangkan Figure cukup di-serialisasi.
+    import plotly.graph_objects as go
+
+    kalori = float(NUTRITION.kalori_kcal[idx])
+    serat = float(NUTRITION.serat_g[idx])
+    fig = go.Figure(data=[go.Pie(
+        labels=['Kalori', 'Serat', 'Lainnya'],
+        values=[kalori, serat * 10, max(0, 100 - kalori - serat * 10)],
+        hole=0.6,
+        marker=dict(colors=['#667eea', '#10b981', '#e2e8f0']),
+        textinfo='label+percent',
+        textfont=dict(size=12, family='Inter'),
+        hovertemplate='%{label}: %{value:.1f}<extra></extra>'
+    )])
+    fig.update_layout(
+        height=250,
+        margin=dict(l=20, r=20, t=20, b=20),
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        annotations=[dict(
+            text=f'{kalori:.0f}<br>kcal',
+            x=0.5, y=0.5,
+            font=dict(size=20, family='Inter', color='#1e293b'),
+            showarrow=False
+        )]
+    )
+    return fig
+
+@lru_cache(maxsize=4096)
+def result_box_html(idx, display_name: str, confidence: str, label: str, animate: bool = True) -> str:
+    # idx None = "unknown"; confidence sudah diformat 1 desimal oleh pemanggil (kunci cache kecil).
+    color1, color2, shadow_color = class_colors(idx)
+    return (
+        f"<div class='result-box{' animate-pulse' if animate else ''}' style='background: linear-gradient(135deg, "
+        f"{color1} 0%, {color2} 100%); box-shadow: 0 8px 25px {shadow_color};'>"
+        f"<div class='result-label'>{label}</div>"
+        f"<div class='result-value'>{display_name}</div>"
+        f"<div class='result-confidence'>Confidence: {confidence}%</div>"
+        f"</div>"
+    )
+
+@lru_cache(maxsize=4096)
+def confidence_bar_html(idx, confidence: str) -> str:
+    bar_color = class_colors(idx)[0]
+    return (
+        "<div style='margin: 1rem 0;'>"
+        "<div style='display:flex; justify-content:space-between; margin-bottom:0.5rem;'>"
+        "<span style='font-weight:600; color:#1e293b;'>Tingkat Keyakinan</span>"
+        f"<span style='font-weight:700; color:{bar_color};'>{confidence}%</span>"
+        "</div>"
+        "<div class='confidence-bar-container'>"
+        f"<div class='confidence-bar' style='width:{confidence}%; background:{bar_color};'></div>"
+        "</div></div>"
+    )
+
+@lru_cache(maxsize=4096)
+def prediction_item_html(rank: int, name: str, prob: str) -> str:
+    return (
+        "<div class='prediction-item'><div style='display:flex; align-items:center; gap:0.75rem;'>"
+        f"<div class='prediction-rank rank-{rank}'>{rank}</div>"
+        f"<span style='font-weight:600; color:#1e293b;'>{name}</span></div>"
+        f"<span style='font-weight:700; color:#475569;'>{prob}%</span></div>"
+    )
+
+@lru_cache(maxsize=len(CLASS_NAMES))
+def nutrition_cards_html(idx: int):
+    # -> (kolom kiri, kolom kanan), isi sama seperti kartu lama: satu kartu per field NUTRISI_DATA.
+    items = list(NUTRITION.labels[idx].items())
+    half = len(items) // 2 + len(items) % 2
+    cards = [
+        f"<div class='nutrition-item'><div class='nutrition-label'>{key}</div><div class='nutrition-value'>{value}</div></div>"
+        for key, value in items
+    ]
+    return "".join(cards[:half]), "".join(cards[half:])
+
+@lru_cache(maxsize=4)
+def minify_css(css: str) -> str:
+    # Buang komentar & spasi berlebih; blok CSS tetap dikirim tiap rerun (Streamlit menghapus
+    # elemen yang tidak dirender ulang), tapi payload-nya jauh lebih kecil.
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
@@ -0,0 +1,291 @@
+import argparse
+import asyncio
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from aiohttp import web
+
+import metrics
+from batching import InferenceBatcher
+from inference import UNKNOWN_LABEL, decode_image, get_display_name, rank_predictions, validate_input_batch
+from nutrisi import CLASS_NAMES, NUTRITION
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SERVER INFERENSI HTTP (terpisah dari UI Streamlit)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Endpoint:
+#   POST /predict              gambar tunggal (body image/jpeg|png), multipart (banyak file),
+#                              atau tensor .npy (application/x-npy -> balasan logits .npy)
+#   GET  /classes              daftar CLASS_NAMES
+#   GET  /nutrition/{name}     data nutrisi satu kelas (teks asli + nilai numerik per 100g)
+#   GET  /healthz, GET /stats
+#   GET  /metrics              teks Prometheus (latensi per tahap, counter, gauge)
+# Semua request masuk ke satu InferenceBatcher (micro-batching). Kalau antrian penuh
+# (lebih dari --max-pending gambar sedang di-decode/diproses) server membalas 503 + Retry-After.
+# Tensor .npy dicek bentuknya sebelum masuk batcher (satu request salah bentuk akan menggagalkan
+# seluruh batch gabungan), dan multipart dibatasi MAX_FILES file per request dan MAX_PART_BYTES
+# per file (dibaca per chunk, jadi satu file raksasa tidak pernah ditampung utuh di memori).
+#
+#   python server.py --port 8500                 # model sesuai FRUITSCAN_BACKEND
+#   python server.py --port 8500 --backend stub  # model pengganti untuk tes
+
+NPY_CONTENT_TYPE = "application/x-npy"
+DEFAULT_MAX_PENDING = 512
+MAX_FILES = 256
+MAX_PART_BYTES = 16 * 1024 * 1024
+TOP_K = 3
+
+class Overloaded(Exception):
+    pass
+
+class PartTooLarge(Exception):
+    pass
+
+class InferenceService:
+    def __init__(self, model, max_batch_size: int = 64, max_wait_ms: float = 5.0, max_pending: int = DEFAULT_MAX_PENDING, decode_workers: int = 4):
+        self.model = model
+        self.batcher = InferenceBatcher(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        self.max_pending = max_pending
+        self.pending = 0
+        self.rejected = 0
+        self.decode_pool = ThreadPoolExecutor(max_workers=decode_workers, thread_name_prefix="decode")
+
+    def close(self):
+        self.batcher.close()
+        self.decode_pool.shutdown(wait=False)
+
+    def reserve(self, n: int):
+        # Backpressure: tolak cepat daripada menumpuk antrian tanpa batas.
+        if self.pending + n > self.max_pending:
+            self.rejected += 1
+            raise Overloaded()
+        self.pending += n
+
+    def release(self, n: int):
+        self.pending -= n
+
+    async def infer(self, batch: np.ndarray) -> np.ndarray:
+        # Tanpa cek kapasitas: pemanggil sudah reserve() untuk gambar-gambar ini.
+        return await asyncio.wrap_future(self.batcher.submit(batch))
+
+    async def predict(self, batch: np.ndarray) -> np.ndarray:
+        n = int(batch.shape[0])
+        self.reserve(n)
+        try:
+            return await self.infer(batch)
+        finally:
+            self.release(n)
+
+    async def decode(self, data: bytes) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.decode_pool, _decode_image_bytes, data)
+
+SERVICE_KEY = web.AppKey("service", InferenceService)
+
+def _decode_image_bytes(data: bytes) -> np.ndarray:
+    return decode_image(data)[0]
+
+def _prediction_rows(logits: np.ndarray, names):
+    # Confidence terkalibrasi (calibration.json); di bawah ambang -> class_name "unknown".
+    idxs, probs, rejected = rank_predictions(logits, k=TOP_K)
+    rows = []
+    for name, row_idxs, row_probs, is_unknown in zip(names, idxs, probs, rejected):
+        best = int(row_idxs[0])
+        rows.append({
+            "file": name,
+            "class_index": None if is_unknown else best,
+            "class_name": UNKNOWN_LABEL if is_unknown else CLASS_NAMES[best],
+            "display_name": UNKNOWN_LABEL if is_unknown else get_display_name(CLASS_NAMES[best]),
+            "confidence": round(float(row_probs[0] * 100.0), 4),
+            "unknown": bool(is_unknown),
+            "top": [{"class_name": CLASS_NAMES[int(i)], "confidence": round(float(p * 100.0), 4)} for i, p in zip(row_idxs, row_probs)],
+        })
+    return rows
+
+async def _read_part(part, limit: int) -> bytes:
+    # part.read() menampung seluruh isi dulu; di sini berhenti begitu melewati batas.
+    chunks, size = [], 0
+    while True:
+        chunk = await part.read_chunk()
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise PartTooLarge()
+        chunks.append(chunk)
+
+def _overloaded_response():
+    return web.json_response({"error": "Server sibuk, coba lagi"}, status=503, headers={"Retry-After": "1"})
+
+def lookup_nutrition(name: str):
+    # -> indeks kelas (NUTRITION/CLASS_NAMES) atau None; kata pertama sebagai fallback ("apple" -> Apple).
+    for candidate in (name, name.split()[0] if name.split() else name):
+        idx = NUTRITION.index_of(candidate)
+        if idx is not None:
+            return idx
+    return None
+
+async def handle_predict(request: web.Request):
+    service: InferenceService = request.app[SERVICE_KEY]
+    content_type = request.content_type
+
+    reserved = 0
+    try:
+        if content_type == NPY_CONTENT_TYPE:
+            try:
+                batch = np.load(io.BytesIO(await request.read()), allow_pickle=False)
+            except Exception as e:
+                return web.json_response({"error": f"Tensor .npy tidak valid: {e}"}, status=400)
+            if batch.ndim == 3:
+                batch = batch[np.newaxis]
+            logits = await service.predict(validate_input_batch(batch))
+            body = io.BytesIO()
+            np.save(body, np.asarray(logits, dtype=np.float32), allow_pickle=False)
+            return web.Response(body=body.getvalue(), content_type=NPY_CONTENT_TYPE)
+
+        # Kapasitas dipesan per gambar SEBELUM decode, supaya server penuh tidak tetap men-decode.
+        names, arrays, errors = [], [], []
+        if content_type.startswith("multipart/"):
+            reader = await request.multipart()
+            async for part in reader:
+                if part.filename is None:
+                    continue
+                if len(names) + len(errors) >= MAX_FILES:
+                    return web.json_response({"error": f"Terlalu banyak file (maks. {MAX_FILES} per request)"}, status=413)
+                service.reserve(1)
+                reserved += 1
+                data = await _read_part(part, MAX_PART_BYTES)
+                try:
+                    arrays.append(await service.decode(data))
+                    names.append(part.filename)
+                except Exception as e:
+                    errors.append({"file": part.filename, "error": str(e)})
+        else:
+            service.reserve(1)
+            reserved += 1
+            try:
+                arrays.append(await service.decode(await request.read()))
+                names.append(None)
+            except Exception as e:
+                return web.json_response({"error": f"Gambar tidak valid: {e}"}, status=400)
+
+        if not arrays:
+            return web.json_response({"predictions": [], "errors": errors}, status=400)
+
+        logits = await service.infer(np.stack(arrays, axis=0))
+        return web.json_response({"predictions": _prediction_rows(logits, names), "errors": errors})
+    except Overloaded:
+        return _overloaded_response()
+    except PartTooLarge:
+        return web.json_response({"error": f"File terlalu besar (maks. {MAX_PART_BYTES} byte per file)"}, status=413)
+    except ValueError as e:
+        return web.json_response({"error": str(e)}, status=400)
+    finally:
+        service.release(reserved)
+
+async def handle_classes(request: web.Request):
+    return web.json_response({"classes": CLASS_NAMES})
+
+async def handle_nutrition(request: web.Request):
+    idx = lookup_nutrition(request.match_info["name"])
+    if idx is None:
+        return web.json_response({"error": "Data nutrisi tidak ditemukan"}, status=404)
+    return web.json_response({
+        "name": CLASS_NAMES[idx],
+        "class_index": idx,
+        "nutrition": NUTRITION.labels[idx],
+        "per_100g": NUTRITION.as_dict(idx),
+    })
+
+async def handle_health(request: web.Request):
+    body = {"status": "ok"}
+    status = getattr(request.app[SERVICE_KEY].model, "status", None)
+    if status is not None:
+        # Backend registry: versi aktif + error reload terakhir (kalau ada).
+        body["model"] = status()
+    return web.json_response(body)
+
+async def handle_metrics(request: web.Request):
+    return web.Response(
+        body=metrics.prometheus_text().encode("utf-8"),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+    )
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    if not metrics.enabled():
+        return await handler(request)
+    started = time.perf_counter()
+    try:
+        response = await handler(request)
+    except web.HTTPException:
+        raise
+    except Exception:
+        metrics.inc("http_errors")
+        raise
+    finally:
+        route = request.match_info.route.resource
+        name = route.canonical if route is not None else "unmatched"
+        metrics.observe(f"http {request.method} {name}", (time.perf_counter() - started) * 1000.0)
+    if response.status >= 500:
+        metrics.inc("http_errors")
+    return response
+
+async def handle_stats(request: web.Request):
+    service: InferenceService = request.app[SERVICE_KEY]
+    stats = service.batcher.stats()
+    stats.update(pending_images=service.pending, rejected_requests=service.rejected)
+    return web.json_response(stats)
+
+def create_app(model, max_batch_size: int = 64, max_wait_ms: float = 5.0, max_pending: int = DEFAULT_MAX_PENDING, client_max_size: int = 64 * 1024 * 1024):
+    app = web.Application(client_max_size=client_max_size, middlewares=[metrics_middleware])
+    service = InferenceService(model, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, max_pending=max_pending)
+    app[SERVICE_KEY] = service
+    metrics.register_collector("batcher", service.batcher.stats)
+    metrics.register_collector("server", lambda: {"pending_images": service.pending, "rejected_requests": service.rejected})
+    metrics.start_jsonl_dumper()
+    app.router.add_post("/predict", handle_predict)
+    app.router.add_get("/classes", handle_classes)
+    app.router.add_get("/nutrition/{name}", handle_nutrition)
+    app.router.add_get("/healthz", handle_health)
+    app.router.add_get("/stats", handle_stats)
+    app.router.add_get("/metrics", handle_metrics)
+
+    async def _on_cleanup(app):
+        app[SERVICE_KEY].close()
+
+    app.on_cleanup.append(_on_cleanup)
+    return app
+
+def main(argv=None):
+    from backends import BACKEND_NAMES, load_backend
+
+    parser = argparse.ArgumentParser(description="Server inferensi HTTP FruitScan.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8500)
+    parser.add_argument("--unix-socket", default=None, help="Dengarkan di Unix socket, bukan TCP")
+    parser.add_argument("--backend", default=None, choices=[b for b in BACKEND_NAMES if b != "remote"])
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING, help="Batas gambar dalam antrian sebelum 503")
+    parser.add_argument("--keepalive-timeout", type=float, default=75.0)
+    args = parser.parse_args(argv)
+
+    backend_name = args.backend or os.environ.get("FRUITSCAN_BACKEND", "savedmodel")
+    if backend_name == "remote":
+        backend_name = "savedmodel"
+    model = load_backend(backend_name, status_callback=lambda msg: print(msg, file=sys.stderr))
+    app = create_app(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms, max_pending=args.max_pending)
+
+    if args.unix_socket:
+        web.run_app(app, path=args.unix_socket, keepalive_timeout=args.keepalive_timeout)
+    else:
+        web.run_app(app, host=args.host, port=args.port, keepalive_timeout=args.keepalive_timeout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
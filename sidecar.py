@@ -0,0 +1,192 @@
+import argparse
+import io
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+
+import numpy as np
+
+import inference
+from batching import InferenceBatcher
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# SIDECAR INFERENSI LOKAL (satu salinan bobot untuk semua worker Streamlit)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Satu proses sidecar memuat model sekali; setiap worker Streamlit memakai
+# FRUITSCAN_BACKEND=sidecar dan mengirim batch lewat Unix socket. Request dari semua
+# worker masuk ke InferenceBatcher yang sama, jadi sekaligus di-micro-batch.
+#
+# Protokol (koneksi persisten, satu request per frame):
+#   request  : uint64 big-endian panjang payload + payload .npy (float32, (N, 64, 64, 3))
+#   response : 1 byte status (0 = OK, 1 = error) + uint64 panjang + payload
+#              (.npy logits kalau OK, pesan UTF-8 kalau error)
+#
+# Jalankan:  python sidecar.py --socket /tmp/fruitscan.sock
+
+DEFAULT_SOCKET = os.environ.get("FRUITSCAN_SIDECAR_SOCKET", os.path.join(inference.MODEL_CACHE_ROOT, "sidecar.sock"))
+STATUS_OK = 0
+STATUS_ERROR = 1
+_HEADER = struct.Struct(">Q")
+_STATUS_HEADER = struct.Struct(">BQ")
+MAX_PAYLOAD = 256 * 1024 * 1024
+
+def _recv_exact(sock, n: int) -> bytes:
+    buf = bytearray(n)
+    view = memoryview(buf)
+    got = 0
+    while got < n:
+        k = sock.recv_into(view[got:], n - got)
+        if k == 0:
+            raise ConnectionError("Koneksi ditutup")
+        got += k
+    return bytes(buf)
+
+def _encode_array(arr: np.ndarray) -> bytes:
+    out = io.BytesIO()
+    np.save(out, np.ascontiguousarray(arr), allow_pickle=False)
+    return out.getvalue()
+
+def _decode_array(payload: bytes) -> np.ndarray:
+    return np.load(io.BytesIO(payload), allow_pickle=False)
+
+class _Handler(socketserver.BaseRequestHandler):
+    def _reply(self, status: int, body: bytes) -> bool:
+        try:
+            self.request.sendall(_STATUS_HEADER.pack(status, len(body)) + body)
+            return True
+        except OSError:
+            return False
+
+    def handle(self):
+        batcher = self.server.batcher
+        while True:
+            try:
+                (length,) = _HEADER.unpack(_recv_exact(self.request, _HEADER.size))
+            except ConnectionError:
+                return
+            if length > MAX_PAYLOAD:
+                # Payload tidak dibaca, jadi sisa stream tidak bisa diparse lagi: balas error lalu tutup.
+                self._reply(STATUS_ERROR, f"Payload terlalu besar ({length} byte)".encode("utf-8"))
+                return
+            try:
+                payload = _recv_exact(self.request, length)
+            except ConnectionError:
+                return
+
+            try:
+                # Bentuk/tipe dicek dulu: error di sini hanya untuk request ini, bukan batch gabungan.
+                batch = inference.validate_input_batch(_decode_array(payload))
+                logits = batcher.predict(batch)
+                body = _encode_array(np.asarray(logits, dtype=np.float32))
+                status = STATUS_OK
+            except Exception as e:
+                body = str(e).encode("utf-8")
+                status = STATUS_ERROR
+            if not self._reply(status, body):
+                return
+
+class SidecarServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, batcher: InferenceBatcher):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.batcher = batcher
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+class SidecarBackend:
+    # Klien sidecar dengan antarmuka backend yang sama (dipanggil -> logits NumPy).
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, timeout: float = 60.0):
+        self.name = "sidecar"
+        # Model dipegang proses sidecar dan bisa berganti tanpa sepengetahuan klien: tanpa identitas.
+        self.identity = None
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.num_classes = None
+
+    def _connection(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _reset(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            try:
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def __call__(self, img_array) -> np.ndarray:
+        payload = _encode_array(np.asarray(img_array, dtype=np.float32))
+        frame = _HEADER.pack(len(payload)) + payload
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(frame)
+                status, length = _STATUS_HEADER.unpack(_recv_exact(sock, _STATUS_HEADER.size))
+                body = _recv_exact(sock, length)
+                break
+            except (ConnectionError, OSError):
+                # Sidecar mungkin baru restart: sambung ulang sekali.
+                self._reset()
+                if attempt == 1:
+                    raise
+        if status != STATUS_OK:
+            raise RuntimeError(f"Sidecar error: {body.decode('utf-8', 'replace')}")
+        logits = _decode_array(body)
+        self.num_classes = int(logits.shape[-1])
+        return logits
+
+    def predict_proba(self, img_array) -> np.ndarray:
+        return inference.probabilities_from_logits(self(img_array))
+
+    def warmup(self, batch_sizes=(1,)):
+        for n in batch_sizes:
+            self(np.zeros((n, inference.IMAGE_SIZE[1], inference.IMAGE_SIZE[0], 3), dtype=np.float32))
+
+def main(argv=None):
+    from backends import BACKEND_NAMES, load_backend
+
+    parser = argparse.ArgumentParser(description="Sidecar inferensi FruitScan lewat Unix socket.")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--backend", default=None, choices=[b for b in BACKEND_NAMES if b != "sidecar"],
+                        help="Backend model di dalam sidecar (default: FRUITSCAN_BACKEND, atau savedmodel)")
+    parser.add_argument("--max-batch-size", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    backend_name = args.backend
+    if backend_name is None:
+        env_backend = os.environ.get("FRUITSCAN_BACKEND", "savedmodel")
+        backend_name = "savedmodel" if env_backend == "sidecar" else env_backend
+
+    log = lambda msg: print(msg, file=sys.stderr)
+    model = load_backend(backend_name, status_callback=log)
+    batcher = InferenceBatcher(model, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    server = SidecarServer(args.socket, batcher)
+    log(f"Sidecar ({backend_name}) mendengarkan di {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,19 +1,34 @@
 import streamlit as st
-import tensorflow as tf
 import numpy as np
-from PIL import Image
 import os
 import io
 import time
 import zipfile
-import tempfile
-import shutil
-import plotly.graph_objects as go
-import gdown
+from concurrent.futures import ThreadPoolExecutor, wait
+from PIL import Image
+
+import inference
+import metrics
+from inference import (
+    IMAGE_EXTENSIONS,
+    decode_image,
+    get_display_name,
+    model_predict,
+    rank_predictions,
+)
+from batching import InferenceBatcher
+from prediction_cache import PredictionCache, predict_with_cache
+from image_artifacts import SessionArtifactStore, image_signature
+from tta import MAX_VIEWS, TTAPredictor
+import detection
+import camera_stream
+import embeddings
+from basket import DEFAULT_GRAMS, Basket
+import render_cache
 
 # --- 1. IMPORT DATA ---
 try:
-    from nutrisi import CLASS_NAMES, NUTRISI_DATA
+    from nutrisi import CLASS_NAMES, NUTRITION
 except ImportError:
     st.error("File 'nutrisi.py' tidak ditemukan!")
     st.stop()
@@ -27,229 +42,727 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded",
 )
-APP_DIR = os.path.dirname(os.path.abspath(__file__))
-
-MODEL_CACHE_ROOT = os.path.join(tempfile.gettempdir(), "fruit_scan_model")
-# Folder awal hanya placeholder; setelah ekstrak ZIP, MODEL_DIR akan diarahkan ke folder
-# yang benar (yang berisi saved_model.pb) lewat hasil scan/marker.
-MODEL_DIR = os.path.join(MODEL_CACHE_ROOT, "model")
-MODEL_DIR_MARKER = os.path.join(MODEL_CACHE_ROOT, ".model_dir_path")
-GOOGLE_DRIVE_ID = "1Lli5EyHbikpE10LoaQ0s9HE7j7vSH0RG"
-
-os.makedirs(MODEL_CACHE_ROOT, exist_ok=True)
-
-def _find_saved_model_dir(search_root: str):
-    for root, _dirs, files in os.walk(search_root):
-        if "saved_model.pb" in files:
-            return root
-    return None
-
-def _safe_extract_zip(zip_path: str, dest_dir: str):
-    dest_dir_abs = os.path.abspath(dest_dir)
-    with zipfile.ZipFile(zip_path, "r") as z:
-        for info in z.infolist():
-            member_name = info.filename.replace("\\", "/")
-            if member_name.endswith("/"):
-                continue
 
-            target_path = os.path.abspath(os.path.join(dest_dir, member_name))
-            if not target_path.startswith(dest_dir_abs + os.sep) and target_path != dest_dir_abs:
-                raise RuntimeError("Unsafe ZIP path detected")
+# TensorFlow & model dimuat di thread background setelah halaman pertama tampil
+# (set FRUITSCAN_BACKGROUND_WARMUP=0 untuk memuat hanya saat prediksi pertama).
+BACKGROUND_WARMUP = os.environ.get("FRUITSCAN_BACKGROUND_WARMUP", "1") != "0"
 
-            os.makedirs(os.path.dirname(target_path), exist_ok=True)
-            with z.open(info, "r") as src, open(target_path, "wb") as dst:
-                shutil.copyfileobj(src, dst)
+# Micro-batching lintas sesi: request digabung sampai BATCH_MAX_SIZE gambar
+# atau BATCH_MAX_WAIT_MS milidetik, mana yang lebih dulu.
+BATCH_MAX_SIZE = int(os.environ.get("FRUITSCAN_BATCH_MAX_SIZE", "32"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("FRUITSCAN_BATCH_MAX_WAIT_MS", "10"))
 
-def ensure_model_ready():
-    global MODEL_DIR
+# Cache prediksi lintas sesi (key = hash isi input 64x64). Direktori disk opsional.
+PREDICTION_CACHE_MB = float(os.environ.get("FRUITSCAN_PREDICTION_CACHE_MB", "64"))
+PREDICTION_CACHE_DIR = os.environ.get("FRUITSCAN_PREDICTION_CACHE_DIR") or None
 
-    if os.path.exists(MODEL_DIR_MARKER):
-        try:
-            with open(MODEL_DIR_MARKER, "r", encoding="utf-8") as f:
-                saved_dir = f.read().strip()
-            if saved_dir and os.path.exists(os.path.join(saved_dir, "saved_model.pb")):
-                MODEL_DIR = saved_dir
-        except Exception:
-            pass
+# Mode TTA (opsional, toggle di sidebar): beberapa view per foto dalam satu batch; jumlah view
+# disesuaikan otomatis supaya latensi inferensi tetap di bawah anggaran.
+TTA_DEFAULT = os.environ.get("FRUITSCAN_TTA", "0") == "1"
+TTA_MAX_VIEWS = int(os.environ.get("FRUITSCAN_TTA_MAX_VIEWS", str(MAX_VIEWS)))
+TTA_LATENCY_BUDGET_MS = float(os.environ.get("FRUITSCAN_TTA_BUDGET_MS", "150"))
 
-    if os.path.exists(os.path.join(MODEL_DIR, "saved_model.pb")):
-        return MODEL_DIR
+# Jumlah kandidat di daftar peringkat hasil (CSS .rank-1 s/d .rank-3).
+PREDICTION_TOP_K = 3
+UNKNOWN_DISPLAY_NAME = "Tidak Dikenali"
 
-    zip_path = os.path.join(MODEL_CACHE_ROOT, "model.zip")
-    if os.path.exists(zip_path):
-        try:
-            os.remove(zip_path)
-        except Exception:
-            pass
+# Anggaran memori per sesi untuk artefak upload (thumbnail preview + input 64x64).
+SESSION_ARTIFACT_KB = int(os.environ.get("FRUITSCAN_SESSION_ARTIFACT_KB", "2048"))
 
-    with st.spinner("Mengunduh model dari Google Drive..."):
-        gdown.download(id=GOOGLE_DRIVE_ID, output=zip_path, quiet=False)
+@st.cache_resource
+def load_trained_model():
+    try:
+        with st.spinner("Menyiapkan model..."):
+            return inference.get_model()
+    except Exception as e:
+        st.error(f"Gagal memuat model: {e}")
+        return None
 
-    if not zipfile.is_zipfile(zip_path):
-        raise RuntimeError("File yang terunduh bukan ZIP yang valid")
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3. FUNGSI PREDIKSI (SINKRONISASI TOTAL DENGAN COLAB)
+# ═══════════════════════════════════════════════════════════════════════════════
+@st.cache_resource
+def get_inference_batcher():
+    # Satu antrian per proses, dipakai bersama semua sesi (ikut umur model yang di-cache).
+    model = load_trained_model()
+    if model is None:
+        return None
+    batcher = InferenceBatcher(
+        lambda batch: model_predict(model, batch),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+    )
+    metrics.register_collector("batcher", batcher.stats)
+    return batcher
 
-    with st.spinner("Mengekstrak model..."):
-        _safe_extract_zip(zip_path, MODEL_CACHE_ROOT)
+@st.cache_resource
+def get_embedding_batcher():
+    # Hanya kalau store embedding aktif: antrian kedua yang mengembalikan logits + embedding dari
+    # SATU forward pass (embeddings.joint_predict_fn), dipakai prediksi foto tunggal.
+    model = load_trained_model()
+    if model is None or get_embedding_store() is None:
+        return None
+    batcher = InferenceBatcher(
+        embeddings.joint_predict_fn(model),
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+    )
+    metrics.register_collector("embedding_batcher", batcher.stats)
+    return batcher
 
-    found_dir = _find_saved_model_dir(MODEL_CACHE_ROOT)
-    if found_dir is None:
-        raise RuntimeError("Model berhasil diunduh tapi saved_model.pb tidak ditemukan")
+@st.cache_resource
+def get_prediction_cache():
+    # Namespace = identitas model (backend + sidik jari bobot), supaya logits dari model lama
+    # tidak dipakai lagi setelah model diunduh ulang atau FRUITSCAN_BACKEND diganti. Backend
+    # tanpa identitas (sidecar/remote: modelnya di proses lain) hanya memakai tier memori.
+    # Identitas dibaca per prediksi karena backend registry bisa menukar versi saat berjalan.
+    model = load_trained_model()
+    namespace = getattr(model, "identity", None)
+    cache = PredictionCache(
+        max_bytes=int(PREDICTION_CACHE_MB * 1024 * 1024),
+        disk_dir=PREDICTION_CACHE_DIR if namespace else None,
+        namespace=namespace or "",
+        namespace_fn=(lambda: model.identity) if hasattr(model, "add_swap_listener") else None,
+    )
+    metrics.register_collector("prediction_cache", cache.stats)
+    return cache
 
-    MODEL_DIR = found_dir
-    try:
-        with open(MODEL_DIR_MARKER, "w", encoding="utf-8") as f:
-            f.write(MODEL_DIR)
-    except Exception:
-        pass
+def cached_predict(batcher, batch):
+    return predict_with_cache(get_prediction_cache(), batcher.predict, batch)
 
-    return MODEL_DIR
+@st.cache_resource
+def get_tta_predictor(with_embedding: bool = False):
+    # with_embedding: view diprediksi lewat get_embedding_batcher(), jadi embedding ikut dirata-rata.
+    batcher = get_embedding_batcher() if with_embedding else get_inference_batcher()
+    if batcher is None:
+        return None
+    cache = get_prediction_cache()
+    variant = embeddings.CACHE_VARIANT if with_embedding else ""
+    return TTAPredictor(
+        lambda views: predict_with_cache(cache, batcher.predict, views, variant=variant),
+        max_views=TTA_MAX_VIEWS,
+        latency_budget_ms=TTA_LATENCY_BUDGET_MS,
+    )
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3a. PREDIKSI DI LATAR (executor bersama, hasil di-poll oleh fragment)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Skrip tidak lagi menunggu model: main() mengirim job ke executor, menyimpan (sig, future)
+# di session_state, lalu panel hasil menampilkan placeholder yang di-poll fragment. Selama
+# menunggu, kolom input tetap bisa dipakai (ganti/hapus gambar, ganti mode). Job untuk gambar
+# yang sudah diganti dibatalkan kalau belum mulai; kalau sudah jalan, hasilnya dibuang.
+PREDICT_WORKERS = int(os.environ.get("FRUITSCAN_PREDICT_WORKERS", "4"))
+PREDICT_POLL_S = float(os.environ.get("FRUITSCAN_PREDICT_POLL_S", "0.25"))
+# Cache hit / antrian kosong biasanya selesai dalam beberapa ms: tunggu sebentar di rerun yang
+# sama supaya hasilnya langsung tampil tanpa placeholder yang berkedip.
+PREDICT_INLINE_WAIT_S = float(os.environ.get("FRUITSCAN_PREDICT_INLINE_WAIT_MS", "50")) / 1000.0
 
 @st.cache_resource
-def load_trained_model():
-    local_pb = os.path.exists(os.path.join(APP_DIR, "saved_model.pb"))
-    if local_pb:
-        try:
-            # MEMUAT MODEL (Format SavedModel)
-            return tf.saved_model.load(APP_DIR)
-        except Exception as e:
-            st.error(f"Gagal memuat model: {e}")
-            return None
+def get_prediction_executor():
+    # Dipakai bersama semua sesi; worker hanya menunggu batcher, jadi sedikit thread sudah cukup.
+    return ThreadPoolExecutor(max_workers=PREDICT_WORKERS, thread_name_prefix="fruitscan-predict")
 
-    try:
-        model_dir = ensure_model_ready()
-        return tf.saved_model.load(model_dir)
-    except Exception as e:
-        st.error(f"Gagal menyiapkan model: {e}")
+@st.cache_resource
+def get_embedding_store():
+    # None kalau FRUITSCAN_EMBEDDINGS_DIR tidak di-set (panel "Gambar mirip" disembunyikan).
+    return embeddings.open_store()
+
+def run_prediction(batch, predict_fn, tta_predictor=None, embedding_store=None, embedding_source: str = None, thumbnail: bytes = None) -> dict:
+    # Jalan di thread executor: tidak boleh memanggil st.* (tidak ada konteks skrip di sana).
+    # Dengan store embedding, predict_fn/tta_predictor mengembalikan baris logits + embedding.
+    tta_views = 1
+    if tta_predictor is not None:
+        preds, tta_views = tta_predictor(batch)
+    else:
+        preds = predict_fn(batch)
+    if embedding_store is not None:
+        preds, emb = embeddings.split_joint(preds, len(CLASS_NAMES))
+    idxs, probs, rejected = rank_predictions(preds, k=PREDICTION_TOP_K)
+    idx = int(idxs[0, 0])
+    is_unknown = bool(rejected[0])
+    return {
+        "raw_name": CLASS_NAMES[idx],
+        "display_name": UNKNOWN_DISPLAY_NAME if is_unknown else get_display_name(CLASS_NAMES[idx]),
+        "confidence": float(probs[0, 0] * 100),
+        "class_index": idx,
+        "info": None if is_unknown else NUTRITION.labels[idx],
+        "is_unknown": is_unknown,
+        "top": [(get_display_name(CLASS_NAMES[int(i)]), float(p * 100)) for i, p in zip(idxs[0], probs[0])],
+        "tta_views": tta_views,
+        # Scan sebelumnya yang paling mirip (QA); None kalau store embedding tidak aktif.
+        "similar": None if embedding_store is None else embeddings.record_scan(
+            embedding_store, emb[:1], idx, float(probs[0, 0]), embedding_source, thumbnail=thumbnail
+        ),
+    }
+
+def cancel_prediction():
+    job = st.session_state.get("prediction_job")
+    if job is None:
+        return
+    st.session_state.prediction_job = None
+    if job["future"].cancel():
+        metrics.inc("predictions_cancelled")
+    elif not job["future"].done():
+        # Sudah jalan di worker: dibiarkan selesai (batcher melayani sesi lain juga), hasilnya dibuang.
+        metrics.inc("predictions_dropped")
+
+def submit_prediction(sig: str, artifacts, use_tta: bool):
+    cancel_prediction()
+    batcher = get_inference_batcher()
+    if batcher is None:
         return None
+    # Objek cache_resource diambil di thread skrip, worker hanya menerima hasilnya.
+    cache = get_prediction_cache()
+    embedding_store = get_embedding_store()
+    with_embedding = embedding_store is not None
+    if with_embedding:
+        batcher = get_embedding_batcher()
+    variant = embeddings.CACHE_VARIANT if with_embedding else ""
+    future = get_prediction_executor().submit(
+        run_prediction,
+        artifacts.input_batch(),
+        lambda batch: predict_with_cache(cache, batcher.predict, batch, variant=variant),
+        get_tta_predictor(with_embedding) if use_tta else None,
+        embedding_store,
+        getattr(load_trained_model(), "embedding_source", "logits") if with_embedding else None,
+        artifacts.thumbnail,
+    )
+    job = {"sig": sig, "future": future, "submitted_at": time.perf_counter()}
+    st.session_state.prediction_job = job
+    st.session_state.prediction_error = None
+    return job
+
+def collect_prediction() -> bool:
+    # Pindahkan hasil job yang sudah selesai ke prediction_result (dipanggil dari main & fragment).
+    # Job yang gagal dilepas dan error-nya disimpan per sig: tidak dikirim ulang otomatis (bisa
+    # gagal terus), user memilih "Coba lagi" di panel error.
+    job = st.session_state.get("prediction_job")
+    if job is None or not job["future"].done() or job["future"].cancelled():
+        return False
+    error = job["future"].exception()
+    st.session_state.prediction_job = None
+    if error is not None:
+        st.session_state.prediction_error = {"sig": job["sig"], "message": str(error) or type(error).__name__}
+        return False
+    st.session_state.prediction_result = job["future"].result()
+    st.session_state.last_prediction_sig = job["sig"]
+    return True
+
+def ensure_prediction(artifacts) -> bool:
+    # True kalau prediction_result sudah untuk gambar (+ mode TTA) sekarang; kalau belum,
+    # pastikan ada job yang berjalan untuknya.
+    use_tta = st.session_state.get("tta_enabled", TTA_DEFAULT)
+    sig = st.session_state.uploaded_image_sig + (":tta" if use_tta else "")
+    if sig == st.session_state.last_prediction_sig and st.session_state.prediction_result is not None:
+        return True
+    error = st.session_state.get("prediction_error")
+    if error is not None and error["sig"] == sig:
+        return False
+    job = st.session_state.get("prediction_job")
+    if job is None or job["sig"] != sig:
+        job = submit_prediction(sig, artifacts, use_tta)
+        if job is None:
+            st.error("Model tidak ditemukan atau gagal dimuat.")
+            st.stop()
+        wait([job["future"]], timeout=PREDICT_INLINE_WAIT_S)
+    return collect_prediction()
+
+def retry_prediction():
+    # Callback tombol "Coba lagi": tanpa error tersimpan, ensure_prediction() mengirim job baru.
+    st.session_state.prediction_error = None
+
+def render_prediction_status():
+    # Panel selama belum ada hasil: error (tanpa polling) atau placeholder yang di-poll fragment.
+    error = st.session_state.get("prediction_error")
+    if error is not None:
+        st.error(f"Analisis gagal: {error['message']}")
+        st.button("Coba lagi", key="retry_prediction", on_click=retry_prediction, use_container_width=True)
+        return
+    render_prediction_pending()
+
+@st.fragment(run_every=PREDICT_POLL_S)
+def render_prediction_pending():
+    job = st.session_state.get("prediction_job")
+    if job is None:
+        return
+    future = job["future"]
+    if future.done() and not future.cancelled():
+        # Panel hasil lengkap (atau panel error) dirender oleh rerun penuh; fragment ini tidak
+        # ikut dirender lagi sehingga polling-nya berhenti.
+        collect_prediction()
+        st.rerun()
+    elapsed = time.perf_counter() - job["submitted_at"]
+    st.markdown(
+        "<div class='glass-card animate-fade-in' style='text-align:center; padding:3rem 2rem;'>"
+        "<h3 style='color:#1e293b; margin-bottom:0.5rem;'>Analisis AI...</h3>"
+        f"<p style='color:#64748b;'>Hasil muncul otomatis ({elapsed:.1f} s). "
+        "Gambar lain tetap bisa dipilih sambil menunggu.</p>"
+        "</div>",
+        unsafe_allow_html=True,
+    )
 
 # ═══════════════════════════════════════════════════════════════════════════════
-# 3. FUNGSI PREDIKSI (SINKRONISASI TOTAL DENGAN COLAB)
+# 3b. BATCH SCAN (banyak foto / ZIP sekaligus)
 # ═══════════════════════════════════════════════════════════════════════════════
-def preprocess_image(image: Image.Image):
-    # 1. Resize Wajib 64x64 (Sesuai Cell 4 di notebook-mu)
-    img = image.convert("RGB").resize((64, 64)) 
-    img_array = np.array(img).astype(np.float32)
-    
-    # 2. JANGAN RESCALE MANUAL, JANGAN PREPROCESS_INPUT MANUAL
-    # Karena di notebook-mu, model sudah punya layer tersebut di dalamnya.
-    
-    img_array = np.expand_dims(img_array, axis=0)
-    return img_array
-
-def model_predict(model, img_array):
-    # PENTING: Memanggil signature 'serving_default'
-    infer = model.signatures["serving_default"]
-    input_name = list(infer.structured_input_signature[1].keys())[0]
-    
-    # PENTING SEKALI: Tambahkan training=False agar Augmentasi (Flip/Rotate) MATI
-    # Jika tidak, gambar pisang kamu akan diputar-putar acak oleh AI
-    predictions = infer(**{input_name: tf.constant(img_array)})
-    
-    output_name = list(predictions.keys())[0]
-    return predictions[output_name].numpy()
-
-def get_display_name(class_name: str) -> str:
-    tokens = class_name.split()
-    if tokens and tokens[-1].isdigit():
-        return " ".join(tokens[:-1])
-    return class_name
-
-def get_fruit_color(name: str):
-    name_lower = name.lower()
-    if any(x in name_lower for x in [
-        'apple red', 'apple crimson', 'apple hit', 'apple rotten',
-        'banana red', 'blackberrie not rippen', 'cherry', 'strawberry', 'tomato',
-        'cabbage red', 'onion red'
-    ]):
-        color1, color2 = "#ef4444", "#b91c1c"
-        shadow_color = "rgba(239, 68, 68, 0.4)"
-    elif any(x in name_lower for x in [
-        'apple granny', 'avocado', 'beans', 'cabbage white', 'apple green',
-        'kiwi', 'lime', 'pear', 'cucumber', 'watermelon'
-    ]):
-        color1, color2 = "#10b981", "#059669"
-        shadow_color = "rgba(16, 185, 129, 0.4)"
-    elif any(x in name_lower for x in [
-        'apple golden', 'apricot', 'banana', 'lemon', 'orange',
-        'cantaloupe', 'papaya', 'mango', 'peach', 'corn'
-    ]):
-        color1, color2 = "#f59e0b", "#d97706"
-        shadow_color = "rgba(245, 158, 11, 0.4)"
-    elif any(x in name_lower for x in [
-        'blueberry', 'blackberrie', 'beetroot',
-        'grape', 'plum', 'eggplant'
-    ]):
-        color1, color2 = "#8b5cf6", "#7c3aed"
-        shadow_color = "rgba(139, 92, 246, 0.4)"
-    elif any(x in name_lower for x in ['apple pink lady', 'peach', 'pitaya']):
-        color1, color2 = "#ec4899", "#be185d"
-        shadow_color = "rgba(236, 72, 153, 0.4)"
-    elif any(x in name_lower for x in ['potato', 'ginger', 'chestnut', 'coconut']):
-        color1, color2 = "#a8a29e", "#78716c"
-        shadow_color = "rgba(168, 162, 158, 0.4)"
-    else:
-        if 'apple' in name_lower:
-            color1, color2 = "#ef4444", "#b91c1c"
-            shadow_color = "rgba(239, 68, 68, 0.4)"
+BATCH_SCAN_CHUNK = 64
+BATCH_SCAN_PAGE_SIZE = 25
+
+def iter_batch_sources(uploaded_files):
+    # Hasilkan (nama, fungsi_pembuka) tanpa membaca isi gambar dulu, supaya
+    # isi ZIP baru didekompresi saat gambar itu benar-benar diproses.
+    for uploaded in uploaded_files:
+        name = uploaded.name
+        if name.lower().endswith(".zip"):
+            zf = zipfile.ZipFile(uploaded)
+            for info in zf.infolist():
+                member = info.filename.replace("\\", "/")
+                if member.endswith("/") or member.startswith("__MACOSX/"):
+                    continue
+                if not member.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                yield f"{name}/{member}", (lambda zf=zf, info=info: zf.open(info, "r"))
+        elif name.lower().endswith(IMAGE_EXTENSIONS):
+            yield name, (lambda uploaded=uploaded: io.BytesIO(uploaded.getvalue()))
+
+def nutrition_summary(idx) -> str:
+    if idx is None:
+        return "-"
+    info = NUTRITION.labels[idx]
+    return f"{info['Kalori']} · Serat {info['Serat']} · Vit. {info['Vitamin']}"
+
+def run_batch_scan(batcher, sources, progress_callback=None):
+    sources = list(sources)
+    total = len(sources)
+    rows = []
+    buffer = np.empty((BATCH_SCAN_CHUNK, 64, 64, 3), dtype=np.float32)
+
+    for start in range(0, total, BATCH_SCAN_CHUNK):
+        chunk = sources[start:start + BATCH_SCAN_CHUNK]
+        ok_names, errors = [], []
+
+        # Setiap gambar di-decode (jalur cepat) langsung ke baris berikutnya di buffer.
+        for name, opener in chunk:
+            try:
+                with opener() as fh:
+                    decode_image(fh, out=buffer[len(ok_names)])
+            except Exception as e:
+                errors.append((name, str(e)))
+                continue
+            ok_names.append(name)
+
+        batch = buffer[:len(ok_names)]
+        if len(ok_names):
+            idxs, probs, rejected = rank_predictions(cached_predict(batcher, batch), k=1)
+            for name, idx, prob, is_unknown in zip(ok_names, idxs[:, 0], probs[:, 0], rejected):
+                raw_name = CLASS_NAMES[int(idx)]
+                rows.append({
+                    "File": name,
+                    "Kelas": UNKNOWN_DISPLAY_NAME if is_unknown else get_display_name(raw_name),
+                    "Confidence (%)": round(float(prob * 100.0), 1),
+                    "Nutrisi (100g)": "-" if is_unknown else nutrition_summary(int(idx)),
+                })
+        for name, err in errors:
+            rows.append({"File": name, "Kelas": "Gagal dibaca", "Confidence (%)": None, "Nutrisi (100g)": err})
+
+        if progress_callback is not None:
+            progress_callback(min(start + len(chunk), total), total)
+
+    return rows
+
+def render_batch_mode():
+    if "batch_results" not in st.session_state:
+        st.session_state.batch_results = None
+    if "batch_page" not in st.session_state:
+        st.session_state.batch_page = 1
+
+    st.markdown(
+        "<div class='glass-card animate-fade-in'>"
+        "<div class='section-header'>Batch Scan</div>",
+        unsafe_allow_html=True,
+    )
+    uploaded_files = st.file_uploader(
+        "Upload banyak foto atau file ZIP",
+        type=["jpg", "jpeg", "png", "zip"],
+        accept_multiple_files=True,
+        label_visibility="collapsed",
+        key="batch_input",
+    )
+
+    if uploaded_files and st.button("Mulai Scan", use_container_width=True, type="primary"):
+        batcher = get_inference_batcher()
+        if batcher is None:
+            st.error("Model tidak ditemukan atau gagal dimuat.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.stop()
+
+        progress = st.progress(0.0, text="Memproses gambar...")
+
+        def _on_progress(done, total):
+            progress.progress(done / max(total, 1), text=f"Memproses gambar {done}/{total}")
+
+        st.session_state.batch_results = run_batch_scan(
+            batcher, iter_batch_sources(uploaded_files), progress_callback=_on_progress
+        )
+        st.session_state.batch_page = 1
+        progress.empty()
+
+    results = st.session_state.batch_results
+    if results:
+        n_pages = max(1, -(-len(results) // BATCH_SCAN_PAGE_SIZE))
+        ok = [r for r in results if r["Confidence (%)"] is not None]
+        mcol1, mcol2, mcol3 = st.columns(3)
+        mcol1.metric("Total gambar", len(results))
+        mcol2.metric("Berhasil", len(ok))
+        mcol3.metric("Rata-rata confidence", f"{np.mean([r['Confidence (%)'] for r in ok]):.1f}%" if ok else "-")
+
+        page = st.number_input("Halaman", min_value=1, max_value=n_pages, step=1, key="batch_page")
+        start = (int(page) - 1) * BATCH_SCAN_PAGE_SIZE
+        st.dataframe(results[start:start + BATCH_SCAN_PAGE_SIZE], use_container_width=True, hide_index=True)
+        st.caption(f"Halaman {int(page)} dari {n_pages}")
+    elif not uploaded_files:
+        st.markdown(
+            "<div style='text-align:center; padding:3rem 1rem; color:#64748b;'>"
+            "<p>Upload beberapa foto atau satu ZIP berisi foto buah untuk scan sekaligus</p>"
+            "</div>",
+            unsafe_allow_html=True,
+        )
+
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3c. DETEKSI BANYAK BUAH (satu foto rak/keranjang)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Tiling dijalankan pada thumbnail artefak upload (<= PREVIEW_MAX_SIZE), bukan foto asli,
+# jadi tidak ada decode ulang dan kerja per foto tetap terbatas.
+DETECTION_MIN_SCORE = float(os.environ.get("FRUITSCAN_DETECTION_MIN_SCORE", str(detection.MIN_SCORE)))
+
+def render_detection_mode(artifacts):
+    if "detection_result" not in st.session_state:
+        st.session_state.detection_result = None
+
+    st.markdown(
+        "<div class='glass-card animate-fade-in'>"
+        "<div class='section-header'>Deteksi Banyak Buah</div>",
+        unsafe_allow_html=True,
+    )
+    if artifacts is None:
+        st.markdown(
+            "<div style='text-align:center; padding:3rem 1rem; color:#64748b;'>"
+            "<p>Upload foto rak atau keranjang berisi beberapa jenis buah di panel kiri</p>"
+            "</div>",
+            unsafe_allow_html=True,
+        )
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    result = st.session_state.detection_result
+    if result is None or result["sig"] != artifacts.sig:
+        batcher = get_inference_batcher()
+        if batcher is None:
+            st.error("Model tidak ditemukan atau gagal dimuat.")
+            st.markdown("</div>", unsafe_allow_html=True)
+            st.stop()
+        with st.spinner("Memindai region..."):
+            image, _ = detection.load_detection_image(artifacts.thumbnail)
+            # Kotak dalam koordinat thumbnail supaya bisa langsung digambar di preview.
+            scale_to_thumb = max(artifacts.thumbnail_size) / max(image.shape[:2])
+            detections, n_tiles = detection.detect_fruits(
+                image,
+                lambda tiles: cached_predict(batcher, tiles),
+                scale_to_original=scale_to_thumb,
+                min_score=DETECTION_MIN_SCORE,
+            )
+        result = {"sig": artifacts.sig, "detections": detections, "tiles": n_tiles}
+        st.session_state.detection_result = result
+
+    detections = result["detections"]
+    preview = Image.open(io.BytesIO(artifacts.thumbnail))
+    st.image(detection.draw_detections(preview, detections), use_container_width=True)
+    st.caption(f"{len(detections)} region terdeteksi dari {result['tiles']} tile")
+
+    summary = detection.summarize_detections(detections)
+    if not summary:
+        st.info("Tidak ada buah yang dikenali dengan yakin. Coba foto lebih dekat atau dengan cahaya lebih terang.")
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    mcol1, mcol2 = st.columns(2)
+    mcol1.metric("Jenis buah", len(summary))
+    mcol2.metric("Total kalori (100g per jenis)", f"{detection.total_kcal(summary):.0f} kcal")
+
+    st.markdown("<div class='section-header'>Ringkasan Nutrisi</div>", unsafe_allow_html=True)
+    st.dataframe(
+        [
+            {
+                "Buah": row["display_name"],
+                "Region": row["count"],
+                "Confidence (%)": round(row["best_score"] * 100.0, 1),
+                "Nutrisi (100g)": nutrition_summary(row["class_index"]),
+                "Manfaat": NUTRITION.manfaat[row["class_index"]],
+            }
+            for row in summary
+        ],
+        use_container_width=True,
+        hide_index=True,
+    )
+    kcol1, kcol2 = st.columns([1, 1])
+    grams = kcol1.number_input("Berat per region (g)", min_value=1.0, value=DEFAULT_GRAMS, step=10.0, key="detection_grams")
+    if kcol2.button("Tambah semua ke keranjang", use_container_width=True):
+        added = get_basket().add_detections(detections, grams_per_item=grams)
+        st.toast(f"{added} item masuk keranjang")
+    with st.expander("Detail region"):
+        st.dataframe(
+            [
+                {
+                    "Buah": det["display_name"],
+                    "Confidence (%)": round(det["score"] * 100.0, 1),
+                    "Kotak (x0, y0, x1, y1)": ", ".join(f"{v:.0f}" for v in det["box"]),
+                }
+                for det in detections
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3d. STREAM KAMERA / VIDEO LANGSUNG
+# ═══════════════════════════════════════════════════════════════════════════════
+# StreamClassifier (thread capture + thread inferensi) disimpan per sesi; panel hasil
+# di-refresh oleh fragment tanpa rerun seluruh halaman. Fragment itu juga "detak" sesi:
+# kalau tab ditutup, snapshot() berhenti dipanggil dan stream berhenti sendiri setelah
+# FRUITSCAN_STREAM_IDLE_S detik (lihat camera_stream.py).
+STREAM_REFRESH_S = float(os.environ.get("FRUITSCAN_STREAM_REFRESH_S", "0.5"))
+
+def stop_camera_stream():
+    stream = st.session_state.get("camera_stream")
+    if stream is not None:
+        stream.stop()
+        st.session_state.camera_stream = None
+
+def render_stream_controls():
+    if not camera_stream.opencv_available():
+        st.caption("Webcam & file video butuh OpenCV (`pip install opencv-python-headless`); folder frame tetap bisa dipakai.")
+    source = st.text_input(
+        "Sumber video",
+        value=camera_stream.DEFAULT_SOURCE,
+        help="Indeks webcam (mis. 0), path file video, atau folder berisi frame JPG/PNG",
+        key="stream_source",
+    )
+    stream = st.session_state.get("camera_stream")
+    scol1, scol2 = st.columns(2)
+    with scol1:
+        # Stream yang sudah berhenti sendiri (video habis / idle) boleh langsung diganti.
+        if st.button("Mulai", use_container_width=True, type="primary", disabled=stream is not None and stream.running):
+            batcher = get_inference_batcher()
+            if batcher is None:
+                st.error("Model tidak ditemukan atau gagal dimuat.")
+                return
+            stop_camera_stream()
+            try:
+                st.session_state.camera_stream = camera_stream.StreamClassifier(
+                    camera_stream.open_source(source), batcher.predict, k=PREDICTION_TOP_K
+                ).start()
+            except RuntimeError as e:
+                st.error(str(e))
+                return
+            st.rerun()
+    with scol2:
+        if st.button("Berhenti", use_container_width=True, disabled=stream is None):
+            stop_camera_stream()
+            st.rerun()
+
+@st.fragment(run_every=STREAM_REFRESH_S)
+def render_stream_panel():
+    stream = st.session_state.get("camera_stream")
+    st.markdown("<div class='glass-card animate-fade-in'>", unsafe_allow_html=True)
+    if stream is None:
+        st.markdown(
+            "<div style='text-align:center; padding:3rem 1rem; color:#64748b;'>"
+            "<p>Tekan Mulai untuk mengklasifikasi video secara langsung</p>"
+            "</div>",
+            unsafe_allow_html=True,
+        )
+        st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    snap = stream.snapshot()
+    if snap["preview"] is not None:
+        st.image(snap["preview"], use_container_width=True)
+    if snap["top"]:
+        idx, prob = snap["top"][0]
+        if snap["unknown"]:
+            # Di bawah ambang reject terkalibrasi, sama seperti mode foto.
+            box = render_cache.result_box_html(
+                None, UNKNOWN_DISPLAY_NAME, f"{prob * 100:.1f}", "Bukan salah satu buah yang dikenal", animate=False
+            )
         else:
-            color1, color2 = "#10b981", "#059669"
-            shadow_color = "rgba(16, 185, 129, 0.4)"
-    return color1, color2, shadow_color
-
-def create_nutrition_chart(nutrisi: dict):
-    def _parse_float(value) -> float:
-        if value is None:
-            return 0.0
-        s = str(value).strip().lower()
-        s = s.replace(",", ".")
-        allowed = set("0123456789.")
-        filtered = "".join(ch for ch in s if ch in allowed)
-        if filtered in ("", "."):
-            return 0.0
-        try:
-            return float(filtered)
-        except Exception:
-            return 0.0
-
-    kalori = _parse_float(nutrisi.get("Kalori (100g)", "0 kcal"))
-    serat = _parse_float(nutrisi.get("Serat", "0 g"))
-    fig = go.Figure(data=[go.Pie(
-        labels=['Kalori', 'Serat', 'Lainnya'],
-        values=[kalori, serat * 10, max(0, 100 - kalori - serat * 10)],
-        hole=0.6,
-        marker=dict(colors=['#667eea', '#10b981', '#e2e8f0']),
-        textinfo='label+percent',
-        textfont=dict(size=12, family='Inter'),
-        hovertemplate='%{label}: %{value:.1f}<extra></extra>'
-    )])
-    fig.update_layout(
-        height=250,
-        margin=dict(l=20, r=20, t=20, b=20),
-        paper_bgcolor='rgba(0,0,0,0)',
-        showlegend=False,
-        annotations=[dict(
-            text=f'{kalori:.0f}<br>kcal',
-            x=0.5, y=0.5,
-            font=dict(size=20, family='Inter', color='#1e293b'),
-            showarrow=False
-        )]
+            box = render_cache.result_box_html(
+                idx, render_cache.DISPLAY_NAMES[idx], f"{prob * 100:.1f}", "Buah Terdeteksi (rata-rata bergerak)", animate=False
+            )
+        st.markdown(box, unsafe_allow_html=True)
+        for rank, (i, p) in enumerate(snap["top"], start=1):
+            st.markdown(
+                render_cache.prediction_item_html(rank, render_cache.DISPLAY_NAMES[i], f"{p * 100:.1f}"),
+                unsafe_allow_html=True,
+            )
+
+    mcol1, mcol2, mcol3 = st.columns(3)
+    mcol1.metric("FPS inferensi", f"{snap['fps']:.1f}")
+    mcol2.metric("Frame dilewati", snap["frames_dropped"])
+    mcol3.metric("Latensi p50", f"{snap['latency_ms_p50']:.0f} ms")
+    st.caption(
+        f"Inferensi p50 {snap['infer_ms_p50']:.1f} ms · p95 {snap['infer_ms_p95']:.1f} ms · "
+        f"{snap['frames_inferred']}/{snap['frames_captured']} frame diproses · sumber {snap['capture_fps']:.1f} FPS"
     )
+    if snap["error"]:
+        st.error(f"Stream berhenti: {snap['error']}")
+    elif snap["idle_stopped"]:
+        st.info("Stream dihentikan karena panel tidak dibuka. Tekan Mulai untuk melanjutkan.")
+    elif snap["finished"] and not snap["running"]:
+        st.info("Video selesai.")
+    st.markdown("</div>", unsafe_allow_html=True)
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3f. PANEL METRIK (sidebar, admin)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Angka langsung dari registry metrics (satu per proses, semua sesi); fragment
+# me-refresh dirinya sendiri tanpa rerun halaman. Versi mesin: GET /metrics di server.py.
+METRICS_REFRESH_S = float(os.environ.get("FRUITSCAN_METRICS_REFRESH_S", "2"))
+
+@st.fragment(run_every=METRICS_REFRESH_S)
+def render_metrics_panel():
+    snap = metrics.snapshot()
+    if snap["stages_ms"]:
+        st.dataframe(
+            [
+                {
+                    "Tahap": stage,
+                    "n": s["count"],
+                    "p50 ms": round(s["p50"], 2),
+                    "p95 ms": round(s["p95"], 2),
+                    "p99 ms": round(s["p99"], 2),
+                }
+                for stage, s in snap["stages_ms"].items()
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+    else:
+        st.caption("Belum ada sampel.")
+    for name, value in snap["counters"].items():
+        st.caption(f"{name}: {value}")
+    gauges = snap["gauges"]
+    if "prediction_cache_hit_rate" in gauges:
+        st.caption(f"Hit rate cache prediksi: {gauges['prediction_cache_hit_rate'] * 100:.0f}%")
+    if st.button("Reset metrik", use_container_width=True):
+        metrics.REGISTRY.reset()
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 3e. KERANJANG (total nutrisi banyak item per sesi)
+# ═══════════════════════════════════════════════════════════════════════════════
+# Grafik keranjang dibuat sekali per sesi lalu hanya trace-nya yang diganti saat isi
+# keranjang berubah (basket.version), bukan dibangun ulang di setiap rerun.
+BASKET_CHART_COLORS = ['#667eea', '#10b981', '#f59e0b', '#ef4444', '#8b5cf6', '#06b6d4', '#ec4899', '#84cc16']
+
+def get_basket():
+    if "basket" not in st.session_state:
+        st.session_state.basket = Basket()
+    return st.session_state.basket
+
+def basket_chart(basket):
+    import plotly.graph_objects as go
+
+    fig = st.session_state.get("basket_chart")
+    if fig is None:
+        fig = go.Figure(data=[go.Pie(
+            hole=0.6,
+            textinfo='label+percent',
+            textfont=dict(size=12, family='Inter'),
+            hovertemplate='%{label}: %{value:.0f} kcal<extra></extra>'
+        )])
+        fig.update_layout(
+            height=250,
+            margin=dict(l=20, r=20, t=20, b=20),
+            paper_bgcolor='rgba(0,0,0,0)',
+            showlegend=False,
+            annotations=[dict(
+                x=0.5, y=0.5,
+                font=dict(size=20, family='Inter', color='#1e293b'),
+                showarrow=False
+            )]
+        )
+        st.session_state.basket_chart = fig
+        st.session_state.basket_chart_version = None
+
+    if st.session_state.basket_chart_version != basket.version:
+        breakdown = basket.breakdown()
+        with fig.batch_update():
+            fig.data[0].labels = [get_display_name(CLASS_NAMES[i]) for i, _, _ in breakdown]
+            fig.data[0].values = [float(values[0]) for _, _, values in breakdown]
+            fig.data[0].marker.colors = [BASKET_CHART_COLORS[n % len(BASKET_CHART_COLORS)] for n in range(len(breakdown))]
+            fig.layout.annotations[0].text = f"{basket.totals()['kalori_kcal']:.0f}<br>kcal"
+        st.session_state.basket_chart_version = basket.version
     return fig
 
+def render_basket_panel():
+    basket = get_basket()
+    if not len(basket):
+        return
+    totals = basket.totals()
+    st.markdown("<div class='glass-card animate-fade-in'><div class='section-header'>Keranjang</div>", unsafe_allow_html=True)
+    bcol1, bcol2, bcol3 = st.columns(3)
+    bcol1.metric("Item", totals["items"])
+    bcol2.metric("Total kalori", f"{totals['kalori_kcal']:.0f} kcal")
+    bcol3.metric("Total serat", f"{totals['serat_g']:.1f} g")
+    st.plotly_chart(basket_chart(basket), use_container_width=True, config={"displayModeBar": False})
+
+    with st.expander(f"Isi keranjang ({totals['grams']:.0f} g)"):
+        st.dataframe(
+            [
+                {
+                    "Buah": row["display_name"],
+                    "Berat (g)": row["grams"],
+                    "Kalori (kcal)": row["kalori_kcal"],
+                    "Serat (g)": row["serat_g"],
+                    "Sumber": row["source"],
+                }
+                for row in basket.rows()
+            ],
+            use_container_width=True,
+            hide_index=True,
+        )
+    dcol1, dcol2, dcol3, dcol4 = st.columns(4)
+    dcol1.download_button("CSV", basket.to_csv(), file_name="keranjang.csv", mime="text/csv", use_container_width=True)
+    dcol2.download_button("JSON", basket.to_json(), file_name="keranjang.json", mime="application/json", use_container_width=True)
+    if dcol3.button("Hapus terakhir", use_container_width=True):
+        basket.remove(len(basket) - 1)
+        st.rerun()
+    if dcol4.button("Kosongkan", use_container_width=True):
+        basket.clear()
+        st.rerun()
+    st.markdown("</div>", unsafe_allow_html=True)
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # 4. TAMPILAN UTAMA
 # ═══════════════════════════════════════════════════════════════════════════════
 def main():
     if "input_mode" not in st.session_state:
         st.session_state.input_mode = "upload"
-    if "uploaded_image_bytes" not in st.session_state:
-        st.session_state.uploaded_image_bytes = None
+    if "image_artifacts" not in st.session_state:
+        st.session_state.image_artifacts = SessionArtifactStore(max_bytes=SESSION_ARTIFACT_KB * 1024)
+    if "uploaded_file_id" not in st.session_state:
+        st.session_state.uploaded_file_id = None
     if "uploaded_image_sig" not in st.session_state:
         st.session_state.uploaded_image_sig = None
     if "last_prediction_sig" not in st.session_state:
         st.session_state.last_prediction_sig = None
     if "prediction_result" not in st.session_state:
         st.session_state.prediction_result = None
+    if "prediction_job" not in st.session_state:
+        st.session_state.prediction_job = None
+    if "prediction_error" not in st.session_state:
+        st.session_state.prediction_error = None
 
     st.markdown(
         "<div class='glass-card animate-fade-in'>"
@@ -270,7 +783,7 @@ def main():
             unsafe_allow_html=True
         )
 
-        btn_col1, btn_col2 = st.columns(2)
+        btn_col1, btn_col2, btn_col3, btn_col4 = st.columns(4)
         with btn_col1:
             if st.button(
                 "Upload File",
@@ -289,6 +802,24 @@ def main():
                 st.session_state.input_mode = "kamera"
                 st.rerun()
 
+        with btn_col3:
+            if st.button(
+                "Batch",
+                use_container_width=True,
+                type="primary" if st.session_state.input_mode == "batch" else "secondary",
+            ):
+                st.session_state.input_mode = "batch"
+                st.rerun()
+
+        with btn_col4:
+            if st.button(
+                "Deteksi",
+                use_container_width=True,
+                type="primary" if st.session_state.input_mode == "deteksi" else "secondary",
+            ):
+                st.session_state.input_mode = "deteksi"
+                st.rerun()
+
         uploaded_file = None
         if st.session_state.input_mode == "upload":
             uploaded_file = st.file_uploader(
@@ -297,33 +828,78 @@ def main():
                 label_visibility="collapsed",
                 key="file_input",
             )
-        else:
-            uploaded_file = st.camera_input(
-                "Ambil foto",
+        elif st.session_state.input_mode == "deteksi":
+            uploaded_file = st.file_uploader(
+                "Upload foto berisi beberapa buah",
+                type=["jpg", "jpeg", "png"],
+                label_visibility="collapsed",
+                key="detect_input",
+            )
+        elif st.session_state.input_mode == "kamera":
+            camera_kind = st.radio(
+                "Jenis kamera",
+                ["Foto", "Video langsung"],
+                horizontal=True,
                 label_visibility="collapsed",
-                key="cam_input",
+                key="camera_kind",
             )
+            if camera_kind == "Foto":
+                uploaded_file = st.camera_input(
+                    "Ambil foto",
+                    label_visibility="collapsed",
+                    key="cam_input",
+                )
+            else:
+                render_stream_controls()
+
+        live_stream = st.session_state.input_mode == "kamera" and st.session_state.get("camera_kind") == "Video langsung"
+        if not live_stream:
+            stop_camera_stream()
 
+        artifact_store = st.session_state.image_artifacts
+        artifacts = None
         if uploaded_file is not None:
-            img_bytes = uploaded_file.getvalue()
-            img_sig = (len(img_bytes),)
-            if st.session_state.uploaded_image_sig != img_sig:
-                st.session_state.uploaded_image_bytes = img_bytes
-                st.session_state.uploaded_image_sig = img_sig
-                st.session_state.last_prediction_sig = None
-                st.session_state.prediction_result = None
+            # Upload yang sama (file_id sama) tidak di-hash/di-decode ulang di tiap rerun.
+            file_id = getattr(uploaded_file, "file_id", None)
+            if file_id is None or file_id != st.session_state.uploaded_file_id:
+                img_bytes = uploaded_file.getvalue()
+                img_sig = image_signature(img_bytes)
+                try:
+                    artifact_store.get_or_build(img_bytes, sig=img_sig)
+                except Exception as e:
+                    st.error(f"Gambar tidak bisa dibaca: {e}")
+                    st.stop()
+                st.session_state.uploaded_file_id = file_id
+                if st.session_state.uploaded_image_sig != img_sig:
+                    st.session_state.uploaded_image_sig = img_sig
+                    cancel_prediction()
+                    st.session_state.last_prediction_sig = None
+                    st.session_state.prediction_result = None
+
+            artifacts = artifact_store.get(st.session_state.uploaded_image_sig)
+            if artifacts is None:
+                # Terbuang dari anggaran sesi (jarang): bangun ulang dari upload yang masih ada.
+                artifacts = artifact_store.get_or_build(uploaded_file.getvalue(), sig=st.session_state.uploaded_image_sig)
 
-            image = Image.open(io.BytesIO(st.session_state.uploaded_image_bytes))
             st.markdown("<div class='section-header' style='margin-top:1rem;'>Preview</div>", unsafe_allow_html=True)
-            st.image(image, use_container_width=True)
+            st.image(artifacts.thumbnail, use_container_width=True)
 
             if st.button("Hapus Gambar", use_container_width=True):
-                st.session_state.uploaded_image_bytes = None
+                artifact_store.discard(st.session_state.uploaded_image_sig)
+                cancel_prediction()
+                st.session_state.uploaded_file_id = None
                 st.session_state.uploaded_image_sig = None
                 st.session_state.last_prediction_sig = None
                 st.session_state.prediction_result = None
                 st.rerun()
-        else:
+        elif st.session_state.input_mode == "batch":
+            st.markdown(
+                "<div style='text-align:center; padding:3rem 1rem; color:#64748b;'>"
+                "<p>Mode batch: upload banyak foto atau ZIP di panel kanan</p>"
+                "</div>",
+                unsafe_allow_html=True,
+            )
+        elif not live_stream:
             st.markdown(
                 "<div style='text-align:center; padding:3rem 1rem; color:#64748b;'>"
                 "<p>Upload atau ambil foto buah untuk memulai analisis</p>"
@@ -334,120 +910,110 @@ def main():
         st.markdown("</div>", unsafe_allow_html=True)
 
     with col_result:
-        has_image = st.session_state.get("uploaded_image_bytes") is not None
-        if has_image:
+        if artifacts is None and st.session_state.uploaded_image_sig is not None:
+            # Ganti mode input tanpa menghapus gambar: hasil terakhir tetap tampil.
+            artifacts = artifact_store.get(st.session_state.uploaded_image_sig)
+        has_image = artifacts is not None
+        if st.session_state.input_mode == "batch":
+            render_batch_mode()
+        elif live_stream:
+            render_stream_panel()
+        elif st.session_state.input_mode == "deteksi":
+            render_detection_mode(artifacts)
+        elif has_image and not ensure_prediction(artifacts):
+            render_prediction_status()
+        elif has_image:
             st.markdown(
                 "<div class='glass-card animate-fade-in'>",
                 unsafe_allow_html=True,
             )
 
-            current_sig = st.session_state.uploaded_image_sig
-            is_new_image = current_sig != st.session_state.last_prediction_sig
+            result = st.session_state.prediction_result
+            display_name = result["display_name"]
+            confidence = result["confidence"]
+            idx = result["class_index"]
+            info = result["info"]
+            is_unknown = result["is_unknown"]
+            top_predictions = result["top"]
+            tta_views = result["tta_views"]
 
-            if is_new_image or st.session_state.prediction_result is None:
-                image = Image.open(io.BytesIO(st.session_state.uploaded_image_bytes))
-                model = load_trained_model()
-                if model is None:
-                    st.error("Model tidak ditemukan atau gagal dimuat.")
-                    st.markdown("</div>", unsafe_allow_html=True)
-                    st.stop()
-
-                with st.spinner("Analisis AI..."):
-                    processed_img = preprocess_image(image)
-                    preds = model_predict(model, processed_img)
-                    prob = tf.nn.softmax(preds[0]).numpy()
-                    idx = int(np.argmax(prob))
-                    confidence = float(prob[idx] * 100)
-                    raw_name = CLASS_NAMES[idx]
-
-                display_name = get_display_name(raw_name)
-                clean_name = raw_name.split()[0]
-                info = NUTRISI_DATA.get(clean_name)
-
-                st.session_state.last_prediction_sig = current_sig
-                st.session_state.prediction_result = {
-                    "raw_name": raw_name,
-                    "display_name": display_name,
-                    "confidence": confidence,
-                    "clean_name": clean_name,
-                    "info": info,
-                }
-            else:
-                result = st.session_state.prediction_result
-                raw_name = result["raw_name"]
-                display_name = result["display_name"]
-                confidence = result["confidence"]
-                clean_name = result["clean_name"]
-                info = result["info"]
-
-            color1, color2, shadow_color = get_fruit_color(display_name)
+            # Potongan HTML di-memo per (kelas, confidence 1 desimal) di render_cache.
+            color_idx = None if is_unknown else idx
+            confidence_text = f"{confidence:.1f}"
+            result_label = "Bukan salah satu buah yang dikenal" if is_unknown else "Buah Terdeteksi"
             st.markdown(
-                f"""
-                <div class='result-box animate-pulse' style='background: linear-gradient(135deg, {color1} 0%, {color2} 100%); box-shadow: 0 8px 25px {shadow_color};'>
-                    <div class='result-label'>Buah Terdeteksi</div>
-                    <div class='result-value'>{display_name}</div>
-                    <div class='result-confidence'>Confidence: {confidence:.1f}%</div>
-                </div>
-                """,
+                render_cache.result_box_html(color_idx, display_name, confidence_text, result_label),
                 unsafe_allow_html=True,
             )
+            st.markdown(render_cache.confidence_bar_html(color_idx, confidence_text), unsafe_allow_html=True)
 
-            bar_color = color1
-            st.markdown(
-                f"""
-                <div style='margin: 1rem 0;'>
-                    <div style='display:flex; justify-content:space-between; margin-bottom:0.5rem;'>
-                        <span style='font-weight:600; color:#1e293b;'>Tingkat Keyakinan</span>
-                        <span style='font-weight:700; color:{bar_color};'>{confidence:.1f}%</span>
-                    </div>
-                    <div class='confidence-bar-container'>
-                        <div class='confidence-bar' style='width:{confidence}%; background:{bar_color};'></div>
-                    </div>
-                </div>
-                """,
-                unsafe_allow_html=True,
-            )
+            st.markdown("<div class='section-header'>Prediksi Teratas</div>", unsafe_allow_html=True)
+            if tta_views > 1:
+                st.caption(f"TTA: rata-rata {tta_views} view (flip, crop, zoom)")
+            for rank, (name, prob) in enumerate(top_predictions, start=1):
+                st.markdown(render_cache.prediction_item_html(rank, name, f"{prob:.1f}"), unsafe_allow_html=True)
+
+            if result["similar"] is not None:
+                with st.expander(f"Gambar mirip (QA) · {len(result['similar'])}"):
+                    if not result["similar"]:
+                        st.caption("Belum ada scan sebelumnya yang bisa dibandingkan.")
+                    scols = st.columns(max(1, len(result["similar"])))
+                    for scol, rec in zip(scols, result["similar"]):
+                        if rec["thumbnail"]:
+                            scol.image(rec["thumbnail"], use_container_width=True)
+                        scol.caption(
+                            f"{render_cache.DISPLAY_NAMES[rec['class_index']]} · "
+                            f"cos {rec['score']:.3f} · {rec['confidence'] * 100:.0f}%"
+                        )
 
             st.markdown("<hr style='border:none; border-top:1px solid #e2e8f0; margin:1rem 0;'>", unsafe_allow_html=True)
             st.markdown("<div class='section-header'>Informasi Nutrisi (per 100g)</div>", unsafe_allow_html=True)
 
             if info:
                 ncol1, ncol2 = st.columns(2)
-                items = list(info.items())
-                half = len(items) // 2 + len(items) % 2
-
-                with ncol1:
-                    for key, value in items[:half]:
-                        icon = "" 
-                        st.markdown(
-                            f"""
-                            <div class='nutrition-item'>
-                                <div class='nutrition-label'>{key}</div>
-                                <div class='nutrition-value'>{value}</div>
-                            </div>
-                            """,
-                            unsafe_allow_html=True,
-                        )
-
-                with ncol2:
-                    for key, value in items[half:]:
-                        icon = "" 
-                        st.markdown(
-                            f"""
-                            <div class='nutrition-item'>
-                                <div class='nutrition-label'>{key}</div>
-                                <div class='nutrition-value'>{value}</div>
-                            </div>
-                            """,
-                            unsafe_allow_html=True,
-                        )
+                left_cards, right_cards = render_cache.nutrition_cards_html(idx)
+                ncol1.markdown(left_cards, unsafe_allow_html=True)
+                ncol2.markdown(right_cards, unsafe_allow_html=True)
 
                 st.markdown("<div style='margin-top:1rem;'></div>", unsafe_allow_html=True)
-                fig_nutrition = create_nutrition_chart(info)
-                st.plotly_chart(fig_nutrition, use_container_width=True, config={"displayModeBar": False})
+                with metrics.timer("render_chart"):
+                    st.plotly_chart(render_cache.nutrition_chart(idx), use_container_width=True, config={"displayModeBar": False})
+
+                kcol1, kcol2 = st.columns([1, 1])
+                grams = kcol1.number_input("Berat (g)", min_value=1.0, value=DEFAULT_GRAMS, step=10.0, key="basket_grams")
+                if kcol2.button("Tambah ke keranjang", use_container_width=True):
+                    get_basket().add(idx, grams, source="foto")
+                    st.toast(f"{display_name} ({grams:.0f} g) masuk keranjang")
+            elif is_unknown:
+                st.info("Confidence di bawah ambang, coba foto ulang dengan buah di tengah dan pencahayaan cukup.")
             else:
                 st.info("Data nutrisi untuk buah ini belum tersedia dalam database.")
 
+            batcher = get_inference_batcher()
+            if batcher is not None:
+                with st.expander("Statistik Antrian Inferensi"):
+                    stats = batcher.stats()
+                    scol1, scol2, scol3 = st.columns(3)
+                    scol1.metric("Rata-rata batch", f"{stats['batch_size_mean']:.1f}")
+                    scol2.metric("Tunggu p50", f"{stats['queue_wait_ms_p50']:.1f} ms")
+                    scol3.metric("Tunggu p95", f"{stats['queue_wait_ms_p95']:.1f} ms")
+                    st.caption(
+                        f"{stats['total_requests']} request dalam {stats['total_batches']} batch · "
+                        f"batch terbesar {stats['batch_size_max']} · antrian {stats['queue_depth']}"
+                    )
+                    cache_stats = get_prediction_cache().stats()
+                    st.caption(
+                        f"Cache prediksi: hit rate {cache_stats['hit_rate'] * 100:.0f}% · "
+                        f"{cache_stats['memory_hits']} hit memori, {cache_stats['disk_hits']} hit disk, "
+                        f"{cache_stats['misses']} miss · {cache_stats['entries']} entri"
+                    )
+                    artifact_stats = artifact_store.stats()
+                    st.caption(
+                        f"Artefak sesi: {artifact_stats['entries']} gambar · "
+                        f"{artifact_stats['bytes'] / 1024:.0f}/{artifact_stats['max_bytes'] / 1024:.0f} KB · "
+                        f"{artifact_stats['builds']} decode"
+                    )
+
             st.markdown("</div>", unsafe_allow_html=True)
         else:
             st.markdown(
@@ -457,6 +1023,7 @@ def main():
                 "</div>",
                 unsafe_allow_html=True,
             )
+        render_basket_panel()
 
 # ═══════════════════════════════════════════════════════════════════════════════
 # CUSTOM CSS - Modern Glassmorphism Design
@@ -783,7 +1350,7 @@ CUSTOM_CSS = """
 """
 
 # Inject custom CSS
-st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+st.markdown(render_cache.minify_css(CUSTOM_CSS), unsafe_allow_html=True)
 
 # SIDEBAR
 # ─────────────────────────────────────────────────────────────────────────
@@ -838,6 +1405,30 @@ with st.sidebar:
         """,
         unsafe_allow_html=True
     )
+    st.toggle(
+        "Mode akurasi tinggi (TTA)",
+        value=TTA_DEFAULT,
+        key="tta_enabled",
+        help=f"Gabungkan beberapa view (flip/crop/zoom) per foto; maks. {TTA_MAX_VIEWS} view dalam ~{TTA_LATENCY_BUDGET_MS:.0f} ms.",
+    )
+    with st.expander("Waktu Startup"):
+        report = inference.startup_report()
+        st.caption(f"Status model: {inference.model_status()}")
+        labels = {
+            "import_tensorflow": "Import TensorFlow",
+            "import_gdown": "Import gdown",
+            "download": "Download model",
+            "extract": "Ekstrak ZIP",
+            "saved_model_load": "tf.saved_model.load",
+            "warmup": "Warm-up inferensi",
+            "total": "Total",
+        }
+        for stage, seconds in report.items():
+            st.caption(f"{labels.get(stage, stage)}: {seconds:.2f} s")
+    if metrics.enabled():
+        with st.expander("Metrik (admin)"):
+            render_metrics_panel()
+
     st.markdown("---")
     st.markdown(
         "<div style='text-align:center; opacity:0.7; font-size:0.85rem;'>"
@@ -847,4 +1438,8 @@ with st.sidebar:
     )
 
 if __name__ == "__main__":
-    main()
+    with metrics.timer("rerun"):
+        main()
+    if BACKGROUND_WARMUP:
+        inference.start_background_warmup()
+    metrics.start_jsonl_dumper()
@@ -0,0 +1,37 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# Modul aplikasi ada di root repo (tanpa paket), sama seperti benchmarks/.
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+@pytest.fixture
+def stub_model():
+    from backends import StubBackend
+    return StubBackend()
+
+@pytest.fixture
+def images():
+    # Batch (8, 64, 64, 3) float32 piksel 0-255 acak (seed tetap).
+    return np.random.default_rng(0).uniform(0, 255, (8, 64, 64, 3)).astype(np.float32)
+
+@pytest.fixture
+def toy_model():
+    # Model pengganti: proyeksi linear per baris (64*64*3 -> 10), hasil tiap baris tidak bergantung batch.
+    weights = np.random.default_rng(0).standard_normal((64 * 64 * 3, 10)).astype(np.float32) / 1e4
+
+    def predict(batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        return batch.reshape(len(batch), -1) @ weights
+
+    return predict
+
+@pytest.fixture(scope="session")
+def tf_stub_model_dir(tmp_path_factory):
+    # SavedModel kecil dari benchmarks/stub_model.py (butuh TensorFlow), dibuat sekali per sesi.
+    pytest.importorskip("tensorflow")
+    from benchmarks.stub_model import export_stub_model
+    return export_stub_model(str(tmp_path_factory.mktemp("stub") / "model"))
@@ -0,0 +1,18 @@
+import os
+
+import inference
+from backends import StubBackend
+
+def test_stub_identity_follows_weights():
+    assert StubBackend().identity == StubBackend().identity
+    assert StubBackend(seed=1).identity != StubBackend().identity
+    assert StubBackend(num_classes=10).identity != StubBackend().identity
+
+def test_saved_model_identity_changes_with_model_file(tmp_path):
+    pb = tmp_path / "saved_model.pb"
+    pb.write_bytes(b"versi pertama")
+    first = inference.saved_model_identity(str(tmp_path))
+    assert inference.saved_model_identity(str(tmp_path)) == first
+    pb.write_bytes(b"versi kedua, ukuran lain")
+    os.utime(pb, (1, 1))
+    assert inference.saved_model_identity(str(tmp_path)) != first
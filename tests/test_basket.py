@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from basket import Basket
+from nutrisi import CLASS_NAMES, NUTRIENT_COLUMNS, NUTRITION
+
+def _manual_totals(items):
+    total = np.zeros(len(NUTRIENT_COLUMNS))
+    for class_index, grams in items:
+        total += NUTRITION.matrix[class_index] * grams / 100.0
+    return total
+
+def test_totals_match_per_item_sum():
+    items = [(0, 150.0), (3, 80.0), (0, 50.0), (len(CLASS_NAMES) - 1, 120.0)]
+    basket = Basket(capacity=1)
+    for class_index, grams in items:
+        basket.add(class_index, grams)
+    totals = basket.totals()
+    expected = _manual_totals(items)
+    for name, value in zip(NUTRIENT_COLUMNS, expected):
+        assert totals[name] == pytest.approx(value, rel=1e-5)
+    assert totals["grams"] == pytest.approx(400.0)
+    assert totals["items"] == 4
+    assert basket.grams_per_class()[0] == pytest.approx(200.0)
+
+def test_remove_and_clear_update_totals():
+    basket = Basket()
+    basket.add_many([1, 2, 3], grams=[100.0, 200.0, 300.0])
+    version = basket.version
+    basket.remove(1)
+    assert list(basket.class_indices) == [1, 3]
+    assert list(basket.grams) == [100.0, 300.0]
+    assert basket.version > version
+    expected = _manual_totals([(1, 100.0), (3, 300.0)])
+    assert basket.totals()[NUTRIENT_COLUMNS[0]] == pytest.approx(expected[0], rel=1e-5)
+    with pytest.raises(IndexError):
+        basket.remove(5)
+    basket.clear()
+    assert len(basket) == 0
+    assert basket.totals()["grams"] == 0.0
+
+def test_breakdown_sorted_by_first_nutrient():
+    basket = Basket()
+    basket.add_many([0, 1, 2, 1], grams=100.0)
+    rows = basket.breakdown()
+    assert sorted(i for i, _, _ in rows) == [0, 1, 2]
+    firsts = [nutrients[0] for _, _, nutrients in rows]
+    assert firsts == sorted(firsts, reverse=True)
+
+def test_add_detections_and_exports():
+    basket = Basket()
+    assert basket.add_detections([{"class_index": 4}, {"class_index": 7}], grams_per_item=90.0) == 2
+    data = json.loads(basket.to_json())
+    assert [item["class_index"] for item in data["items"]] == [4, 7]
+    assert {item["source"] for item in data["items"]} == {"deteksi"}
+    assert data["totals"]["items"] == 2
+    assert data["totals"]["grams"] == 180.0
+    csv_text = basket.to_csv()
+    assert csv_text.splitlines()[0].split(",")[:3] == ["class_index", "class_name", "display_name"]
+    assert len(csv_text.strip().splitlines()) == 3
+
+@pytest.mark.parametrize("class_index, grams", [(-1, 100.0), (len(CLASS_NAMES), 100.0), (0, 0.0), (0, float("nan"))])
+def test_invalid_items_rejected(class_index, grams):
+    basket = Basket()
+    with pytest.raises(ValueError):
+        basket.add(class_index, grams)
+    assert len(basket) == 0
@@ -0,0 +1,72 @@
+import threading
+
+import numpy as np
+import pytest
+
+from batching import InferenceBatcher
+
+def test_requests_are_batched_and_sliced_back(images, toy_model):
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        return toy_model(batch)
+
+    batcher = InferenceBatcher(predict, max_batch_size=64, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(images[i:i + 2]) for i in range(0, 8, 2)]
+        results = [f.result(timeout=10) for f in futures]
+    finally:
+        batcher.close()
+    np.testing.assert_allclose(np.concatenate(results), toy_model(images), rtol=1e-4, atol=1e-5)
+    assert sum(calls) == 8
+    assert len(calls) < 4
+
+def test_single_image_is_expanded(images, toy_model):
+    batcher = InferenceBatcher(toy_model)
+    try:
+        assert batcher.predict(images[0], timeout=10).shape == (1, 10)
+    finally:
+        batcher.close()
+
+def test_max_batch_size_splits_queue(images, toy_model):
+    calls = []
+    batcher = InferenceBatcher(lambda b: calls.append(len(b)) or toy_model(b), max_batch_size=4, max_wait_ms=100)
+    try:
+        futures = [batcher.submit(images[i:i + 1]) for i in range(8)]
+        [f.result(timeout=10) for f in futures]
+    finally:
+        batcher.close()
+    assert max(calls) <= 4
+    assert sum(calls) == 8
+    assert batcher.stats()["total_rows"] == 8
+
+def test_one_bad_request_fails_whole_batch(images, toy_model):
+    # Batcher sendiri tidak memvalidasi: bentuk salah menggagalkan semua request di batch yang
+    # sama. Pemanggil yang menerima input dari luar harus memvalidasi sebelum submit().
+    release = threading.Event()
+
+    def predict(batch):
+        release.wait(5)
+        return toy_model(batch)
+
+    batcher = InferenceBatcher(predict, max_batch_size=64, max_wait_ms=200)
+    try:
+        good = batcher.submit(images[:2])
+        bad = batcher.submit(np.zeros((1, 32, 32, 3), np.float32))
+        release.set()
+        with pytest.raises(ValueError):
+            bad.result(timeout=10)
+        with pytest.raises(ValueError):
+            good.result(timeout=10)
+    finally:
+        batcher.close()
+    assert batcher.stats()["total_errors"] == 1
+
+def test_submit_rejects_wrong_rank_and_closed_batcher(toy_model):
+    batcher = InferenceBatcher(toy_model)
+    with pytest.raises(ValueError):
+        batcher.submit(np.zeros((64, 64), np.float32))
+    batcher.close()
+    with pytest.raises(RuntimeError):
+        batcher.submit(np.zeros((1, 64, 64, 3), np.float32))
@@ -0,0 +1,113 @@
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import inference
+from camera_stream import FolderSource, LatestFrameSlot, StreamClassifier, frame_to_input
+from inference import Calibration, rank_predictions
+
+def _write_frames(folder, n, value=90):
+    folder.mkdir()
+    for i in range(n):
+        Image.fromarray(np.full((48, 80, 3), value, np.uint8)).save(folder / f"frame_{i:04d}.png")
+    return str(folder)
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+class _ClosingSource:
+    def __init__(self, source):
+        self.source = source
+        self.closed = 0
+
+    def read(self):
+        return self.source.read()
+
+    def close(self):
+        self.closed += 1
+
+@pytest.fixture
+def calibration(monkeypatch):
+    calibration = Calibration(temperature=1.0, reject_threshold=0.0)
+    monkeypatch.setattr(inference, "_calibration", calibration)
+    return calibration
+
+def test_folder_source_reads_sorted_frames_and_loops(tmp_path):
+    folder = tmp_path / "frames"
+    folder.mkdir()
+    for i, value in enumerate([10, 20, 30]):
+        Image.fromarray(np.full((8, 8, 3), value, np.uint8)).save(folder / f"frame_{i}.png")
+    (folder / "catatan.txt").write_text("bukan frame")
+
+    source = FolderSource(str(folder), realtime=False)
+    assert [int(source.read()[0, 0, 0]) for _ in range(3)] == [10, 20, 30]
+    assert source.read() is None
+
+    looping = FolderSource(str(folder), realtime=False, loop=True)
+    assert [int(looping.read()[0, 0, 0]) for _ in range(4)] == [10, 20, 30, 10]
+
+    with pytest.raises(RuntimeError):
+        FolderSource(str(tmp_path))
+
+def test_latest_frame_slot_drops_stale_frames():
+    slot = LatestFrameSlot()
+    slot.put(1)
+    slot.put(2)
+    assert slot.get(timeout=0.1) == 2
+    assert slot.dropped == 1
+    assert slot.get(timeout=0.01) is None
+
+def test_stream_matches_ranked_prediction(tmp_path, stub_model, calibration):
+    source = _ClosingSource(FolderSource(_write_frames(tmp_path / "frames", 6), realtime=False))
+    stream = StreamClassifier(source, stub_model, k=3).start()
+    assert _wait_until(lambda: not stream.running)
+    snap = stream.snapshot()
+
+    assert snap["error"] is None and snap["finished"]
+    assert snap["frames_captured"] == 6
+    assert snap["frames_inferred"] + snap["frames_dropped"] == 6
+    # Semua frame identik, jadi EMA = probabilitas satu frame.
+    frame = np.full((48, 80, 3), 90, np.uint8)
+    idxs, probs, rejected = rank_predictions(stub_model(frame_to_input(frame)), k=3, calibration=calibration)
+    assert [i for i, _ in snap["top"]] == idxs[0].tolist()
+    np.testing.assert_allclose([p for _, p in snap["top"]], probs[0], rtol=1e-5)
+    assert snap["unknown"] is False
+    assert source.closed >= 1
+
+def test_stream_applies_reject_threshold(tmp_path, stub_model, calibration):
+    calibration.reject_threshold = 1.0
+    stream = StreamClassifier(FolderSource(_write_frames(tmp_path / "frames", 3), realtime=False), stub_model).start()
+    assert _wait_until(lambda: not stream.running)
+    snap = stream.snapshot()
+    assert snap["top"] and snap["unknown"] is True
+
+def test_stream_stops_when_nobody_polls(tmp_path, stub_model, calibration):
+    source = _ClosingSource(FolderSource(_write_frames(tmp_path / "frames", 4), fps=100.0, loop=True))
+    stream = StreamClassifier(source, stub_model, idle_timeout=0.3).start()
+
+    # Selama panel masih me-refresh, stream tetap jalan.
+    for _ in range(15):
+        stream.snapshot()
+        time.sleep(0.05)
+    assert stream.running
+
+    # Tab ditutup: tidak ada snapshot() lagi -> berhenti sendiri dan sumber dilepas.
+    assert _wait_until(lambda: not stream.running and source.closed)
+    snap = stream.snapshot()
+    assert snap["idle_stopped"] and snap["error"] is None
+    stream.stop()
+
+def test_stop_releases_source(tmp_path, stub_model, calibration):
+    source = _ClosingSource(FolderSource(_write_frames(tmp_path / "frames", 4), fps=100.0, loop=True))
+    stream = StreamClassifier(source, stub_model, idle_timeout=0).start()
+    assert _wait_until(lambda: stream.snapshot()["frames_inferred"] > 0)
+    stream.stop()
+    assert not stream.running
+    assert source.closed >= 1
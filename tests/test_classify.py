@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+from PIL import Image
+
+import classify
+
+def _write_images(root):
+    (root / "sub").mkdir()
+    for i, name in enumerate(["a.jpg", "b.png", "sub/c.jpg"]):
+        Image.fromarray(np.full((80, 80, 3), 40 * i, np.uint8)).save(root / name)
+    (root / "bad.jpg").write_bytes(b"not an image")
+
+def _rows(path):
+    return [json.loads(line) for line in path.read_text().splitlines() if line.strip()]
+
+def test_classify_resume_retries_errors(tmp_path, stub_model):
+    images = tmp_path / "img"
+    images.mkdir()
+    _write_images(images)
+    output = tmp_path / "out.jsonl"
+
+    assert classify.classify_directory(stub_model, str(images), str(output), batch_size=2, workers=2, log=lambda m: None) == 4
+    rows = _rows(output)
+    assert sorted(r["path"].rsplit("/", 1)[-1] for r in rows) == ["a.jpg", "b.png", "bad.jpg", "c.jpg"]
+    assert [r["path"] for r in rows if r["error"]] == [str(images / "bad.jpg")]
+
+    done = classify.load_done_paths(str(output), "jsonl")
+    assert len(done) == 3
+    assert str(images / "a.jpg") in done
+    assert str(images / "bad.jpg") not in done
+
+    # Resume: hanya file yang error yang dicoba lagi.
+    assert classify.classify_directory(stub_model, str(images), str(output), batch_size=2, workers=2, log=lambda m: None) == 1
+    assert len(_rows(output)) == 5
+
+def test_truncated_tail_is_repaired(tmp_path, stub_model):
+    images = tmp_path / "img"
+    images.mkdir()
+    Image.fromarray(np.zeros((80, 80, 3), np.uint8)).save(images / "a.jpg")
+    Image.fromarray(np.ones((80, 80, 3), np.uint8)).save(images / "b.jpg")
+    output = tmp_path / "out.jsonl"
+    classify.classify_directory(stub_model, str(images), str(output), log=lambda m: None)
+    # Simulasi proses mati di tengah menulis baris terakhir.
+    output.write_bytes(output.read_bytes()[:-10])
+    assert len(classify.load_done_paths(str(output), "jsonl")) == 1
+    assert classify.classify_directory(stub_model, str(images), str(output), log=lambda m: None) == 1
+
+def test_classify_csv_output(tmp_path, stub_model):
+    images = tmp_path / "img"
+    images.mkdir()
+    _write_images(images)
+    output = tmp_path / "out.csv"
+    classify.classify_directory(stub_model, str(images), str(output), log=lambda m: None)
+    lines = output.read_text().splitlines()
+    assert lines[0] == ",".join(classify.OUTPUT_FIELDS)
+    assert len(lines) == 5
+    assert len(classify.load_done_paths(str(output), "csv")) == 3
+
+def test_main_uses_backend_flag(tmp_path):
+    images = tmp_path / "img"
+    images.mkdir()
+    _write_images(images)
+    output = tmp_path / "out.jsonl"
+    assert classify.main([str(images), "-o", str(output), "--backend", "stub"]) == 0
+    assert len(_rows(output)) == 4
+
+def test_done_paths_lookup():
+    done = classify.DonePaths([classify._path_key(p) for p in ["/x/a.jpg", "/x/b.jpg"]])
+    assert "/x/a.jpg" in done
+    assert "/x/c.jpg" not in done
+    assert len(done) == 2
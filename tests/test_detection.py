@@ -0,0 +1,62 @@
+import numpy as np
+
+from detection import box_iou, detect_fruits, nms, tile_image
+
+def test_box_iou():
+    a = np.array([[0, 0, 10, 10]], dtype=np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], dtype=np.float32)
+    np.testing.assert_allclose(box_iou(a, b), [[1.0, 50 / 150, 0.0]], rtol=1e-6)
+
+def _brute_force_nms(boxes, scores, classes, threshold):
+    keep = []
+    for i in sorted(range(len(boxes)), key=lambda i: -scores[i]):
+        if all(classes[i] != classes[j] or box_iou(boxes[i:i + 1], boxes[j:j + 1])[0, 0] <= threshold for j in keep):
+            keep.append(i)
+    return keep
+
+def test_nms_per_class():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10], [50, 50, 60, 60]], dtype=np.float32)
+    scores = np.array([0.9, 0.8, 0.7, 0.6], dtype=np.float32)
+    classes = np.array([0, 0, 1, 0])
+    # Box 1 ditekan box 0 (kelas sama); box 2 kelas lain jadi tetap.
+    assert list(nms(boxes, scores, classes, 0.5)) == [0, 2, 3]
+
+def test_nms_matches_brute_force():
+    rng = np.random.default_rng(1)
+    xy = rng.uniform(0, 100, (200, 2))
+    wh = rng.uniform(5, 40, (200, 2))
+    boxes = np.concatenate([xy, xy + wh], axis=1).astype(np.float32)
+    scores = rng.uniform(size=200).astype(np.float32)
+    classes = rng.integers(0, 3, 200)
+    assert list(nms(boxes, scores, classes, 0.4)) == _brute_force_nms(boxes, scores, classes, 0.4)
+
+def test_nms_empty():
+    assert nms(np.empty((0, 4)), np.empty(0), np.empty(0, dtype=int)).size == 0
+
+def test_tiles_cover_image_within_budget():
+    image = np.random.default_rng(0).integers(0, 255, (480, 640, 3), dtype=np.uint8)
+    tiles, boxes = tile_image(image, max_tiles=40)
+    assert tiles.shape[1:] == (64, 64, 3) and len(tiles) == len(boxes) <= 40
+    assert boxes[:, 0].min() == 0 and boxes[:, 1].min() == 0
+    assert boxes[:, 2].max() <= 640 and boxes[:, 3].max() <= 480
+    # Skala pertama = jendela selebar sisi pendek.
+    np.testing.assert_allclose(boxes[0], [0, 0, 480, 480], atol=1.0)
+
+def test_detects_red_square():
+    image = np.zeros((300, 600, 3), dtype=np.uint8)
+    image[90:210, 390:510, 0] = 255
+
+    def predict(tiles):
+        # Kelas 0 untuk tile yang sebagian besar merah, kelas 1 untuk sisanya.
+        red = tiles[..., 0].mean(axis=(1, 2)) / 255.0
+        logits = np.zeros((len(tiles), 50), np.float32)
+        logits[:, 0] = 40.0 * (red - 0.5)
+        logits[:, 1] = 40.0 * (0.05 - red)
+        return logits
+
+    detections, n_tiles = detect_fruits(image, predict, scale_to_original=2.0, window_fractions=(0.35,))
+    fruits = [d for d in detections if d["class_index"] == 0]
+    assert n_tiles > 0
+    assert fruits
+    boxes = np.asarray([d["box"] for d in fruits]) / 2.0
+    assert np.all(box_iou(boxes, np.array([[390, 90, 510, 210]]))[:, 0] > 0.4)
@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+import embeddings
+from embeddings import EmbeddingStore, IVFIndex, l2_normalize, record_scan, search_blocked, split_joint
+
+def _brute_force(matrix, queries, k):
+    scores = l2_normalize(queries) @ np.asarray(matrix, dtype=np.float32).T
+    ids = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+    return ids, np.take_along_axis(scores, ids, axis=1)
+
+@pytest.mark.parametrize("block_rows", [7, 64, 10000])
+def test_search_blocked_matches_brute_force(block_rows):
+    rng = np.random.default_rng(0)
+    matrix = l2_normalize(rng.standard_normal((500, 16))).astype(np.float16)
+    queries = rng.standard_normal((9, 16)).astype(np.float32)
+    ids, scores = search_blocked(matrix, queries, k=5, block_rows=block_rows)
+    expected_ids, expected_scores = _brute_force(matrix, queries, 5)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-6)
+    np.testing.assert_array_equal(ids, expected_ids)
+
+def test_search_blocked_pads_when_fewer_rows_than_k():
+    matrix = l2_normalize(np.eye(3, 4, dtype=np.float32))
+    ids, scores = search_blocked(matrix, np.ones(4, dtype=np.float32), k=5)
+    assert ids.shape == (1, 5)
+    assert sorted(ids[0, :3].tolist()) == [0, 1, 2]
+    assert ids[0, 3:].tolist() == [-1, -1]
+    assert np.all(np.isneginf(scores[0, 3:]))
+
+def _clustered_store(root, n=2000, dim=16, clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(0, clusters, n)] + 0.1 * rng.standard_normal((n, dim))
+    store = EmbeddingStore(str(root), initial_capacity=16)
+    store.append(vectors, np.zeros(n, dtype=np.int16), np.ones(n), embedding_source="embedding")
+    return store, rng
+
+def test_store_append_grows_and_reopens(tmp_path):
+    store, _ = _clustered_store(tmp_path, n=100)
+    assert len(store) == 100
+    assert store.capacity >= 100
+    reopened = EmbeddingStore(str(tmp_path))
+    assert len(reopened) == 100
+    np.testing.assert_array_equal(reopened.vectors, store.vectors)
+    with pytest.raises(ValueError):
+        reopened.append(np.ones((1, 8)), 0, 1.0)
+
+def test_ivf_recall_against_exact_search(tmp_path):
+    store, rng = _clustered_store(tmp_path)
+    index = IVFIndex.train(store, n_lists=16, seed=0, n_probe=4)
+    queries = np.asarray(store.vectors[rng.choice(len(store), 50, replace=False)], dtype=np.float32)
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+    exact_ids, _ = search_blocked(store.vectors, queries, k=10)
+    ivf_ids, ivf_scores = index.search(queries, k=10)
+    recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(exact_ids, ivf_ids)])
+    assert recall >= 0.9
+    assert np.all(np.diff(ivf_scores, axis=1) <= 1e-6)
+    # Probe semua list = pencarian exact.
+    full_ids, _ = index.search(queries, k=10, n_probe=index.n_lists)
+    assert all(set(a) == set(b) for a, b in zip(exact_ids, full_ids))
+
+def test_ivf_indexes_rows_added_after_training(tmp_path):
+    store, rng = _clustered_store(tmp_path, n=300)
+    index = IVFIndex.train(store, n_lists=4, seed=0)
+    new = rng.standard_normal((1, 16)).astype(np.float32)
+    (new_id,) = store.append(new, 1, 0.5)
+    ids, _ = index.search(new, k=1, n_probe=index.n_lists)
+    assert ids[0, 0] == new_id
+
+def test_extract_embeddings_from_stub(stub_model, images):
+    emb, logits, source = embeddings.extract_embeddings(stub_model, images[:3])
+    assert source == "embedding"
+    assert emb.shape == (3, 192)
+    np.testing.assert_allclose(np.linalg.norm(emb, axis=1), 1.0, rtol=1e-5)
+    np.testing.assert_allclose(logits, stub_model(images[:3]), rtol=1e-5)
+
+def test_record_scan_uses_joint_rows_and_skips_duplicates(tmp_path, stub_model, images):
+    calls = []
+    predict = embeddings.joint_predict_fn(stub_model)
+
+    def counting(batch):
+        calls.append(len(batch))
+        return predict(batch)
+
+    logits, emb = split_joint(counting(images[:1]), stub_model.num_classes)
+    np.testing.assert_allclose(logits, stub_model(images[:1]), rtol=1e-5)
+    assert emb.shape == (1, 192)
+
+    store = EmbeddingStore(str(tmp_path))
+    assert record_scan(store, emb, 3, 0.9, "embedding") == []
+    assert len(store) == 1
+    # Foto yang sama lagi: tidak ditambah, dan tidak muncul sebagai "mirip" dirinya sendiri.
+    assert record_scan(store, emb, 3, 0.9, "embedding") == []
+    assert len(store) == 1
+    _, other = split_joint(predict(images[1:2]), stub_model.num_classes)
+    similar = record_scan(store, other, 4, 0.8, "embedding")
+    assert [r["id"] for r in similar] == [0]
+    assert len(store) == 2
+    assert calls == [1]
+
+def test_search_sees_rows_appended_by_another_store(tmp_path):
+    vectors = l2_normalize(np.random.default_rng(3).normal(size=(40, 16)))
+    writer = EmbeddingStore(str(tmp_path), initial_capacity=4)
+    writer.append(vectors[:2], 0, 0.5)
+    reader = EmbeddingStore(str(tmp_path))
+    assert len(reader) == 2
+
+    # Proses lain menambah baris (dan memperbesar file): reader tidak perlu refresh() manual.
+    writer.append(vectors[2:], 1, 0.5)
+    ids, scores = reader.search(vectors[30:31], k=1)
+    assert ids[0, 0] == 30 and scores[0, 0] > 0.99
+    assert len(reader) == 40
+
+def test_record_scan_keeps_near_duplicates_when_embedding_is_logits(tmp_path):
+    base = np.zeros((1, 50), np.float32)
+    base[0, 7] = 30.0
+    nearly = base.copy()
+    nearly[0, 8] = 0.5  # foto lain, kelas sama dengan yakin: cosine logits > DUPLICATE_COSINE
+    assert float((l2_normalize(base) @ l2_normalize(nearly).T)[0, 0]) >= embeddings.DUPLICATE_COSINE
+
+    logits_store = EmbeddingStore(str(tmp_path / "logits"))
+    record_scan(logits_store, l2_normalize(base), 7, 0.99, "logits")
+    similar = record_scan(logits_store, l2_normalize(nearly), 7, 0.99, "logits")
+    assert len(logits_store) == 2
+    assert [r["id"] for r in similar] == [0]
+
+    embedding_store = EmbeddingStore(str(tmp_path / "embedding"))
+    record_scan(embedding_store, l2_normalize(base), 7, 0.99, "embedding")
+    record_scan(embedding_store, l2_normalize(nearly), 7, 0.99, "embedding")
+    assert len(embedding_store) == 1
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from evaluate import EvaluationAccumulator
+from inference import Calibration, rank_predictions
+from nutrisi import CLASS_NAMES
+
+def test_accumulator_matches_brute_force():
+    rng = np.random.default_rng(0)
+    c = len(CLASS_NAMES)
+    acc = EvaluationAccumulator(num_classes=c, top_ks=(1, 3, 100))
+    all_labels, all_logits = [], []
+    # Beberapa batch: hasil akumulasi harus sama dengan hitung sekali jalan.
+    for n in (70, 200, 1):
+        labels = rng.integers(0, c, n)
+        logits = rng.standard_normal((n, c)) + 4.0 * np.eye(c)[labels]
+        ranked, _, rejected = rank_predictions(logits, k=c, calibration=Calibration(reject_threshold=0.3))
+        acc.update(labels, ranked, rejected)
+        all_labels.append(labels)
+        all_logits.append(logits)
+    labels = np.concatenate(all_labels)
+    logits = np.concatenate(all_logits)
+
+    confusion = np.zeros((c, c), dtype=np.int64)
+    for t, p in zip(labels, logits.argmax(axis=1)):
+        confusion[t, p] += 1
+    np.testing.assert_array_equal(acc.confusion, confusion)
+    assert acc.top_ks == (1, 3, c)
+
+    order = np.argsort(-logits, axis=1)
+    report = acc.report()
+    for k in (1, 3, c):
+        hits = np.mean([t in row[:k] for t, row in zip(labels, order)])
+        assert report["top_k_accuracy"][str(k)] == pytest.approx(hits)
+    assert report["top_k_accuracy"][str(c)] == 1.0
+    assert report["images"] == len(labels)
+    assert report["accuracy"] == pytest.approx(np.trace(confusion) / len(labels))
+    probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+    probs /= probs.sum(axis=1, keepdims=True)
+    assert report["rejected_fraction"] == pytest.approx(np.mean(probs.max(axis=1) < 0.3), abs=1e-9)
+
+def test_per_class_and_most_confused():
+    acc = EvaluationAccumulator(num_classes=3, top_ks=(1,))
+    labels = np.array([0, 0, 0, 1, 1, 2])
+    predicted = np.array([0, 1, 1, 1, 1, 0])
+    acc.update(labels, predicted[:, None], np.zeros(len(labels), dtype=bool))
+    stats = acc.per_class()
+    np.testing.assert_allclose(stats["precision"], [0.5, 0.5, 0.0])
+    np.testing.assert_allclose(stats["recall"], [1 / 3, 1.0, 0.0])
+    np.testing.assert_array_equal(stats["support"], [3, 2, 1])
+    confused = acc.most_confused(5)
+    assert [(p["count"]) for p in confused] == [2, 1]
+
+def test_evaluate_directory_matches_direct_prediction(tmp_path, stub_model):
+    import inference
+    from evaluate import evaluate_directory
+    from PIL import Image
+
+    rng = np.random.default_rng(0)
+    for class_name in CLASS_NAMES[:2]:
+        class_dir = tmp_path / class_name
+        class_dir.mkdir()
+        for i in range(5):
+            Image.fromarray(rng.integers(0, 255, (70, 70, 3), dtype=np.uint8)).save(class_dir / f"{i}.png")
+    (tmp_path / CLASS_NAMES[0] / "rusak.jpg").write_bytes(b"bukan gambar")
+    (tmp_path / "bukan-kelas").mkdir()
+
+    report = evaluate_directory(stub_model, str(tmp_path), batch_size=4, workers=1, chunk_size=3, log=lambda m: None)
+    assert report["images"] == 10
+    assert report["decode_errors"] == 1
+    assert report["skipped_dirs"] == ["bukan-kelas"]
+
+    expected = np.zeros((len(CLASS_NAMES), len(CLASS_NAMES)), dtype=np.int64)
+    for label, class_name in enumerate(CLASS_NAMES[:2]):
+        for i in range(5):
+            pixels = inference.load_image_array(str(tmp_path / class_name / f"{i}.png"))
+            expected[label, int(np.argmax(stub_model(pixels[None])))] += 1
+    np.testing.assert_array_equal(np.asarray(report["confusion_matrix"]), expected)
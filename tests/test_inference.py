@@ -0,0 +1,164 @@
+import io
+import threading
+
+import numpy as np
+import pytest
+from PIL import Image, ImageOps
+
+import inference
+from inference import (
+    Calibration,
+    expected_calibration_error,
+    fit_temperature,
+    rank_predictions,
+    softmax_nll,
+    top_k,
+    validate_input_batch,
+)
+
+def _encode(img, fmt="JPEG", **kwargs):
+    buf = io.BytesIO()
+    img.save(buf, format=fmt, **kwargs)
+    return buf.getvalue()
+
+def _gradient(width, height):
+    # Gambar halus: beda draft vs decode penuh hanya dari resampling, bukan noise.
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([255 * x / width, 255 * y / height, 128 + 0 * x], axis=-1)
+    return Image.fromarray(rgb.astype(np.uint8))
+
+def _full_decode(data):
+    with Image.open(io.BytesIO(data)) as img:
+        return inference.preprocess_image(ImageOps.exif_transpose(img))[0]
+
+def test_png_matches_full_decode():
+    data = _encode(_gradient(300, 200), "PNG")
+    np.testing.assert_array_equal(inference.preprocess_image_bytes(data)[0], _full_decode(data))
+
+def test_large_jpeg_draft_close_to_full_decode():
+    data = _encode(_gradient(2400, 1800), quality=95)
+    fast = inference.preprocess_image_bytes(data)[0]
+    assert fast.shape == (64, 64, 3)
+    assert np.abs(fast - _full_decode(data)).mean() < 2.0
+
+def test_exif_orientation_is_applied():
+    img = _gradient(400, 200)
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotasi 90° searah jarum jam saat ditampilkan
+    data = _encode(img, quality=95, exif=exif.tobytes())
+    fast = inference.preprocess_image_bytes(data)[0]
+    upright = _full_decode(_encode(img.transpose(Image.Transpose.ROTATE_270), quality=95))
+    assert np.abs(fast - upright).mean() < 3.0
+
+def test_model_input_does_not_depend_on_preview_size():
+    data = _encode(_gradient(2400, 1800), quality=95)
+    plain = inference.preprocess_image_bytes(data)[0]
+    for preview_max in (None, 128, 512, 1024):
+        arr, _ = inference.decode_image(io.BytesIO(data), preview_max=preview_max)
+        np.testing.assert_array_equal(arr, plain)
+
+def test_preview_is_bounded():
+    arr, preview = inference.decode_image(_encode(_gradient(2000, 1000)), preview_max=512)
+    assert arr.shape == (64, 64, 3)
+    assert max(preview.size) == 512
+    assert inference.decode_image(_encode(_gradient(100, 100)))[1] is None
+
+def _softmax(x):
+    e = np.exp(x - x.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+@pytest.mark.parametrize("k", [1, 3, 50])
+def test_top_k_matches_full_sort(k):
+    logits = np.random.default_rng(0).standard_normal((16, 50)).astype(np.float32)
+    idxs, probs = top_k(logits, k=k, temperature=2.0)
+    expected = np.argsort(-logits, axis=1, kind="stable")[:, :k]
+    np.testing.assert_array_equal(idxs, expected)
+    np.testing.assert_allclose(probs, np.take_along_axis(_softmax(logits / 2.0), expected, axis=1), rtol=1e-5)
+
+def test_top_k_single_row_and_clamped_k():
+    idxs, probs = top_k(np.array([0.0, 2.0, 1.0]), k=10)
+    assert idxs.tolist() == [[1, 2, 0]]
+    assert probs.sum() == pytest.approx(1.0, rel=1e-6)
+
+def test_fit_temperature_recovers_known_temperature():
+    # Label diambil dari softmax(logits / 2.5): NLL minimum di sekitar T = 2.5.
+    rng = np.random.default_rng(0)
+    logits = rng.standard_normal((20000, 10)) * 4.0
+    probs = _softmax(logits / 2.5)
+    labels = (probs.cumsum(axis=1) > rng.uniform(size=(len(probs), 1))).argmax(axis=1)
+    t = fit_temperature(logits, labels)
+    assert t == pytest.approx(2.5, rel=0.1)
+    assert softmax_nll(logits, labels, t) <= softmax_nll(logits, labels, 1.0)
+
+def test_expected_calibration_error():
+    assert expected_calibration_error([0.9, 0.9], [1, 1]) == pytest.approx(0.1)
+    assert expected_calibration_error([], []) == 0.0
+
+def test_rank_predictions_rejects_low_confidence():
+    logits = np.array([[10.0, 0.0, 0.0], [0.1, 0.0, 0.0]], dtype=np.float32)
+    idxs, probs, rejected = rank_predictions(logits, k=2, calibration=Calibration(reject_threshold=0.5))
+    assert idxs[:, 0].tolist() == [0, 0]
+    assert rejected.tolist() == [False, True]
+
+def test_calibration_roundtrip(tmp_path):
+    path = str(tmp_path / "calibration.json")
+    Calibration(temperature=1.7, reject_threshold=0.4, meta={"ece": 0.02}).save(path)
+    loaded = Calibration.load(path)
+    assert (loaded.temperature, loaded.reject_threshold, loaded.meta["ece"]) == (1.7, 0.4, 0.02)
+    assert Calibration.load(str(tmp_path / "missing.json")).temperature == 1.0
+
+@pytest.mark.parametrize("batch", [
+    np.zeros((0, 64, 64, 3)),
+    np.zeros((64, 64, 3)),
+    np.zeros((1, 32, 32, 3)),
+    np.zeros((1, 64, 64, 4)),
+    np.array([["a"]]),
+])
+def test_validate_input_batch_rejects(batch):
+    with pytest.raises(ValueError):
+        validate_input_batch(batch)
+
+def test_validate_input_batch_casts_to_float32():
+    out = validate_input_batch(np.zeros((2, 64, 64, 3), dtype=np.uint8))
+    assert out.dtype == np.float32
+    assert out.shape == (2, 64, 64, 3)
+
+def test_draft_decode_agrees_with_full_decode_on_savedmodel(tf_stub_model_dir):
+    import tensorflow as tf
+    from benchmarks.bench_decode import SIZES, prediction_agreement
+
+    # Input model dari draft vs decode penuh (preprocess_image + exif_transpose), lewat SavedModel.
+    model = inference.ServingModel(tf.saved_model.load(tf_stub_model_dir))
+    result = prediction_agreement(model, 8, SIZES["1mp"])
+    assert result["top1_agreement"] == 1.0
+    assert result["max_logit_delta"] < 0.05 * result["logit_std"]
+
+def test_background_warmup_does_not_block_reruns(monkeypatch, stub_model):
+    import backends
+
+    release = threading.Event()
+    loading = threading.Event()
+
+    def slow_load(status_callback=None):
+        loading.set()
+        assert release.wait(5)
+        return stub_model
+
+    monkeypatch.setattr(backends, "load_backend", slow_load)
+    monkeypatch.setattr(inference, "_model", None)
+    monkeypatch.setattr(inference, "_warmup_thread", None)
+    monkeypatch.setattr(inference, "_warmup_error", None)
+
+    thread = inference.start_background_warmup()
+    assert loading.wait(5)
+    # Rerun saat model masih dimuat: cek state harus langsung kembali, bukan menunggu load.
+    checker = threading.Thread(target=inference.start_background_warmup)
+    checker.start()
+    checker.join(1)
+    assert not checker.is_alive()
+    assert inference.model_status() == "memuat"
+
+    release.set()
+    thread.join(5)
+    assert inference.get_model() is stub_model
+    assert inference.model_status() == "siap"
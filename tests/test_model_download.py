@@ -0,0 +1,148 @@
+import hashlib
+import http.server
+import os
+import threading
+import time
+
+import pytest
+
+import model_download
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB, isi tiap offset berbeda
+
+class _RangeHandler(http.server.BaseHTTPRequestHandler):
+    # mode: "range" (206 benar), "bad-range" (206 dengan start salah), "no-range" (selalu 200)
+    mode = "range"
+    requests = []
+
+    def do_GET(self):
+        header = self.headers.get("Range")
+        type(self).requests.append(header)
+        if header and self.mode != "no-range":
+            start = int(header.split("=", 1)[1].rstrip("-"))
+            if start >= len(PAYLOAD):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(PAYLOAD)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            sent_from = 0 if self.mode == "bad-range" else start
+            body = PAYLOAD[sent_from:]
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {sent_from}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}")
+        else:
+            body = PAYLOAD
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def http_source():
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _RangeHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    _RangeHandler.mode = "range"
+    _RangeHandler.requests = []
+    yield f"http://127.0.0.1:{httpd.server_address[1]}/model.zip"
+    httpd.shutdown()
+    httpd.server_close()
+
+@pytest.fixture
+def file_source(tmp_path):
+    path = tmp_path / "src" / "model.zip"
+    path.parent.mkdir()
+    path.write_bytes(PAYLOAD)
+    return path
+
+def _truncated_part(dest, size):
+    with open(str(dest) + ".part", "wb") as f:
+        f.write(PAYLOAD[:size])
+
+def test_file_url_copy(tmp_path, file_source):
+    dest = tmp_path / "model.zip"
+    model_download.download_resumable(file_source.as_uri(), str(dest))
+    assert dest.read_bytes() == PAYLOAD
+    assert not os.path.exists(str(dest) + ".part")
+
+def test_file_url_resumes_truncated_part(tmp_path, file_source):
+    dest = tmp_path / "model.zip"
+    _truncated_part(dest, 300_000)
+    model_download.download_resumable(file_source.as_uri(), str(dest))
+    assert model_download.sha256_file(str(dest)) == hashlib.sha256(PAYLOAD).hexdigest()
+
+def test_oversized_part_restarts(tmp_path, file_source):
+    dest = tmp_path / "model.zip"
+    with open(str(dest) + ".part", "wb") as f:
+        f.write(PAYLOAD + b"sampah")
+    model_download.download_resumable(str(file_source), str(dest))
+    assert dest.read_bytes() == PAYLOAD
+
+def test_sha256_mismatch_removes_file(tmp_path, file_source):
+    dest = tmp_path / "model.zip"
+    model_download.download_resumable(file_source.as_uri(), str(dest))
+    assert model_download.verify_sha256(str(dest), hashlib.sha256(PAYLOAD).hexdigest())
+    with pytest.raises(RuntimeError, match="Checksum"):
+        model_download.verify_sha256(str(dest), "0" * 64)
+    assert not dest.exists()
+
+def test_http_resumes_with_range(tmp_path, http_source):
+    dest = tmp_path / "model.zip"
+    _truncated_part(dest, 123_456)
+    model_download.download_resumable(http_source, str(dest))
+    assert dest.read_bytes() == PAYLOAD
+    assert _RangeHandler.requests == ["bytes=123456-"]
+
+@pytest.mark.parametrize("mode", ["bad-range", "no-range"])
+def test_http_restarts_when_range_not_honoured(tmp_path, http_source, mode):
+    _RangeHandler.mode = mode
+    dest = tmp_path / "model.zip"
+    _truncated_part(dest, 1000)
+    messages = []
+    model_download.download_resumable(http_source, str(dest), status_callback=messages.append)
+    assert dest.read_bytes() == PAYLOAD
+    assert any("dari awal" in m for m in messages)
+
+def test_http_416_keeps_complete_part(tmp_path, http_source):
+    dest = tmp_path / "model.zip"
+    _truncated_part(dest, len(PAYLOAD))
+    model_download.download_resumable(http_source, str(dest))
+    assert dest.read_bytes() == PAYLOAD
+
+def test_http_416_with_oversized_part_redownloads(tmp_path, http_source):
+    dest = tmp_path / "model.zip"
+    with open(str(dest) + ".part", "wb") as f:
+        f.write(PAYLOAD + b"sampah")
+    model_download.download_resumable(http_source, str(dest))
+    assert dest.read_bytes() == PAYLOAD
+    assert _RangeHandler.requests == [f"bytes={len(PAYLOAD) + 6}-", None]
+
+def test_file_lock_is_exclusive(tmp_path):
+    lock_path = str(tmp_path / "locks" / "download.lock")
+    events = []
+
+    def worker(name):
+        with model_download.file_lock(lock_path):
+            events.append(("masuk", name))
+            time.sleep(0.05)
+            events.append(("keluar", name))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(3)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    # Tidak ada dua pemegang lock yang tumpang tindih: masuk/keluar selalu berpasangan.
+    assert [kind for kind, _ in events] == ["masuk", "keluar"] * 3
+    assert all(events[i][1] == events[i + 1][1] for i in range(0, 6, 2))
+
+def test_write_text_atomic_cleans_up_on_failure(tmp_path):
+    target = tmp_path / "current"
+    model_download.write_text_atomic(str(target), "v1")
+    with pytest.raises(TypeError):
+        model_download.write_text_atomic(str(target), None)
+    assert target.read_text() == "v1"
+    assert os.listdir(tmp_path) == ["current"]
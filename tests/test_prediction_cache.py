@@ -0,0 +1,73 @@
+import numpy as np
+
+from prediction_cache import PredictionCache, input_digest, predict_with_cache
+
+def test_hits_skip_model_and_misses_are_batched(images, toy_model):
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        return toy_model(batch)
+
+    cache = PredictionCache()
+    first = predict_with_cache(cache, predict, images[:3])
+    again = predict_with_cache(cache, predict, images[:5])
+    np.testing.assert_allclose(again, toy_model(images[:5]), rtol=1e-4, atol=1e-5)
+    np.testing.assert_array_equal(again[:3], first)
+    assert calls == [3, 2]
+    assert cache.stats()["memory_hits"] == 3
+
+def test_digest_depends_on_pixels_and_shape(images):
+    assert input_digest(images[0]) == input_digest(images[0].copy())
+    assert input_digest(images[0]) != input_digest(images[1])
+    assert input_digest(images[0]) != input_digest(images[0].reshape(32, 128, 3))
+
+def test_disk_tier_survives_restart(tmp_path, images):
+    key = input_digest(images[0])
+    cache = PredictionCache(disk_dir=str(tmp_path))
+    cache.put(key, np.arange(3, dtype=np.float32))
+    fresh = PredictionCache(disk_dir=str(tmp_path))
+    np.testing.assert_array_equal(fresh.get(key), [0, 1, 2])
+    assert fresh.stats()["disk_hits"] == 1
+    assert fresh.get("0" * 64) is None
+
+def test_disk_tier_is_namespaced(tmp_path, images):
+    key = input_digest(images[0])
+    cache = PredictionCache(disk_dir=str(tmp_path), namespace="model-a")
+    cache.put(key, np.arange(3, dtype=np.float32))
+    assert PredictionCache(disk_dir=str(tmp_path), namespace="model-b").get(key) is None
+    np.testing.assert_array_equal(PredictionCache(disk_dir=str(tmp_path), namespace="model-a").get(key), [0, 1, 2])
+
+def test_variant_is_separate_entry(images, stub_model):
+    cache = PredictionCache(namespace=stub_model.identity)
+    predict_with_cache(cache, stub_model, images[:1])
+    joint = predict_with_cache(cache, lambda b: np.ones((len(b), 7), np.float32), images[:1], variant="+embedding")
+    assert joint.shape == (1, 7)
+
+def test_model_swap_during_predict_is_not_stored(tmp_path, images):
+    class Model:
+        identity = "registry-v1"
+
+    model = Model()
+    cache = PredictionCache(disk_dir=str(tmp_path), namespace_fn=lambda: model.identity)
+
+    def swapping_predict(batch):
+        model.identity = "registry-v2"
+        return np.zeros((len(batch), 4), np.float32)
+
+    predict_with_cache(cache, swapping_predict, images[:1])
+    assert cache.stats()["entries"] == 0
+    assert not (tmp_path / "registry-v1").exists()
+    assert not (tmp_path / "registry-v2").exists()
+    out = predict_with_cache(cache, lambda b: np.ones((len(b), 4), np.float32), images[:1])
+    assert out[0, 0] == 1.0
+    assert cache.get(input_digest(images[0]), "registry-v2") is not None
+
+def test_memory_budget_evicts_oldest():
+    cache = PredictionCache(max_bytes=3 * 40)
+    for i in range(5):
+        cache.put(str(i), np.zeros(10, np.float32))
+    assert cache.stats()["entries"] == 3
+    assert cache.stats()["evictions"] == 2
+    assert cache.get("0") is None
+    assert cache.get("4") is not None
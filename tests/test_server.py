@@ -0,0 +1,149 @@
+import asyncio
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp import FormData
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+import server
+from backends import RemoteBackend
+
+def _npy(arr):
+    buf = io.BytesIO()
+    np.save(buf, arr)
+    return buf.getvalue()
+
+def _jpeg(value=200):
+    buf = io.BytesIO()
+    Image.fromarray(np.full((80, 80, 3), value, np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+def _run(model, scenario, **kwargs):
+    async def main():
+        app = server.create_app(model, max_wait_ms=30, **kwargs)
+        async with TestClient(TestServer(app)) as client:
+            result = await scenario(client)
+            stats = await (await client.get("/stats")).json()
+            assert stats["pending_images"] == 0
+            return result
+    return asyncio.run(main())
+
+def test_npy_roundtrip(stub_model, images):
+    async def scenario(client):
+        resp = await client.post("/predict", data=_npy(images[:3]), headers={"Content-Type": server.NPY_CONTENT_TYPE})
+        assert resp.status == 200
+        return np.load(io.BytesIO(await resp.read()))
+    np.testing.assert_allclose(_run(stub_model, scenario), stub_model(images[:3]), rtol=1e-5)
+
+def test_remote_backend_matches_local(stub_model, images):
+    async def scenario(client):
+        remote = RemoteBackend(str(client.make_url("")), timeout=10)
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*[loop.run_in_executor(None, remote, images[i:i + 2]) for i in range(0, 8, 2)])
+    results = _run(stub_model, scenario)
+    np.testing.assert_allclose(np.concatenate(results), stub_model(images), rtol=1e-5)
+
+async def _post_npy(client, data):
+    resp = await client.post("/predict", data=data, headers={"Content-Type": server.NPY_CONTENT_TYPE})
+    return resp.status
+
+def test_bad_npy_does_not_poison_batch(stub_model):
+    async def scenario(client):
+        good, bad = np.zeros((1, 64, 64, 3), np.float32), np.zeros((1, 32, 32, 3), np.float32)
+        return await asyncio.gather(*[_post_npy(client, _npy(good if i % 2 else bad)) for i in range(6)])
+    assert _run(stub_model, scenario) == [400, 200, 400, 200, 400, 200]
+
+@pytest.mark.parametrize("body", [_npy(np.float32(1)), _npy(np.array(["a"])), _npy(np.zeros((1, 64, 64, 4))), b"garbage"])
+def test_invalid_npy_rejected(stub_model, body):
+    async def scenario(client):
+        return await _post_npy(client, body)
+    assert _run(stub_model, scenario) == 400
+
+def test_multipart_reports_per_file_errors(stub_model):
+    async def scenario(client):
+        form = FormData()
+        form.add_field("a", _jpeg(10), filename="a.jpg")
+        form.add_field("b", b"not an image", filename="b.jpg")
+        form.add_field("c", _jpeg(250), filename="c.jpg")
+        resp = await client.post("/predict", data=form)
+        return resp.status, await resp.json()
+    status, body = _run(stub_model, scenario)
+    assert status == 200
+    assert [p["file"] for p in body["predictions"]] == ["a.jpg", "c.jpg"]
+    assert [e["file"] for e in body["errors"]] == ["b.jpg"]
+    assert len(body["predictions"][0]["top"]) == server.TOP_K
+
+def test_raw_image_body_and_invalid_image(stub_model):
+    async def scenario(client):
+        ok = await client.post("/predict", data=_jpeg(), headers={"Content-Type": "image/jpeg"})
+        bad = await client.post("/predict", data=b"nope", headers={"Content-Type": "image/jpeg"})
+        return ok.status, bad.status
+    assert _run(stub_model, scenario) == (200, 400)
+
+def test_overload_returns_503(stub_model, images):
+    async def scenario(client):
+        resp = await client.post("/predict", data=_npy(images), headers={"Content-Type": server.NPY_CONTENT_TYPE})
+        return resp.status, resp.headers.get("Retry-After")
+    assert _run(stub_model, scenario, max_pending=4) == (503, "1")
+
+def test_metadata_endpoints(stub_model):
+    async def scenario(client):
+        classes = await (await client.get("/classes")).json()
+        health = await client.get("/healthz")
+        missing = await client.get("/nutrition/tidak-ada")
+        return len(classes["classes"]), health.status, missing.status
+    assert _run(stub_model, scenario) == (50, 200, 404)
+
+def _form(parts):
+    form = FormData()
+    for i, data in enumerate(parts):
+        form.add_field(f"f{i}", data, filename=f"{i}.jpg")
+    return form
+
+def test_multipart_all_files_invalid(stub_model):
+    async def scenario(client):
+        resp = await client.post("/predict", data=_form([b"bukan gambar", b"x"]))
+        return resp.status, len((await resp.json())["errors"])
+    assert _run(stub_model, scenario) == (400, 2)
+
+def test_multipart_capacity_checked_before_decode(stub_model, monkeypatch):
+    decoded = []
+    decode = server._decode_image_bytes
+    monkeypatch.setattr(server, "_decode_image_bytes", lambda data: decoded.append(1) or decode(data))
+
+    async def scenario(client):
+        resp = await client.post("/predict", data=_form([_jpeg()] * 5))
+        return resp.status
+    assert _run(stub_model, scenario, max_pending=4) == 503
+    assert len(decoded) == 4
+
+def test_multipart_file_count_limit(stub_model, monkeypatch):
+    monkeypatch.setattr(server, "MAX_FILES", 2)
+
+    async def scenario(client):
+        ok = await client.post("/predict", data=_form([_jpeg()] * 2))
+        too_many = await client.post("/predict", data=_form([_jpeg()] * 3))
+        return ok.status, too_many.status
+    assert _run(stub_model, scenario) == (200, 413)
+
+def test_multipart_part_size_limit(stub_model, monkeypatch):
+    monkeypatch.setattr(server, "MAX_PART_BYTES", 4096)
+
+    async def scenario(client):
+        big = await client.post("/predict", data=_form([_jpeg(), np.random.default_rng(0).bytes(64 * 1024)]))
+        ok = await client.post("/predict", data=_form([_jpeg()]))
+        return big.status, ok.status
+    assert _run(stub_model, scenario) == (413, 200)
+
+def test_app_uses_typed_service_key(stub_model):
+    import warnings
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        app = server.create_app(stub_model)
+    assert isinstance(app[server.SERVICE_KEY], server.InferenceService)
+    app[server.SERVICE_KEY].close()
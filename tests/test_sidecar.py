@@ -0,0 +1,77 @@
+import os
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+if os.name == "nt":
+    pytest.skip("Sidecar memakai Unix domain socket", allow_module_level=True)
+
+import sidecar
+from batching import InferenceBatcher
+
+@pytest.fixture
+def sidecar_socket(tmp_path, toy_model):
+    path = str(tmp_path / "sc.sock")
+    batcher = InferenceBatcher(toy_model, max_batch_size=64, max_wait_ms=50)
+    srv = sidecar.SidecarServer(path, batcher)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield path
+    srv.shutdown()
+    srv.server_close()
+    batcher.close()
+
+def test_concurrent_clients_share_batches(sidecar_socket, toy_model, images):
+    client = sidecar.SidecarBackend(sidecar_socket, timeout=10)
+    results = {}
+
+    def call(i):
+        results[i] = client(images[i:i + 1])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(8):
+        np.testing.assert_allclose(results[i], toy_model(images[i:i + 1]), rtol=1e-4, atol=1e-5)
+    assert client.num_classes == 10
+
+def test_error_reply_keeps_connection_usable(sidecar_socket, images):
+    client = sidecar.SidecarBackend(sidecar_socket, timeout=10)
+    with pytest.raises(RuntimeError, match="Sidecar error"):
+        client(np.zeros((64, 64), np.float32))
+    assert client(images[:2]).shape == (2, 10)
+
+def test_bad_request_does_not_poison_batch(sidecar_socket, toy_model, images):
+    client = sidecar.SidecarBackend(sidecar_socket, timeout=10)
+    results = {}
+
+    def call(i):
+        batch = images[:2] if i % 2 else np.zeros((2, 32, 32, 3), np.float32)
+        try:
+            results[i] = client(batch)
+        except RuntimeError as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i, result in results.items():
+        if i % 2:
+            np.testing.assert_allclose(result, toy_model(images[:2]), rtol=1e-4, atol=1e-5)
+        else:
+            assert isinstance(result, RuntimeError)
+
+def test_oversize_payload_gets_error_and_close(sidecar_socket):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(10)
+        s.connect(sidecar_socket)
+        s.sendall(sidecar._HEADER.pack(sidecar.MAX_PAYLOAD + 1))
+        status, length = sidecar._STATUS_HEADER.unpack(sidecar._recv_exact(s, sidecar._STATUS_HEADER.size))
+        sidecar._recv_exact(s, length)
+        assert status == sidecar.STATUS_ERROR
+        assert s.recv(1) == b""
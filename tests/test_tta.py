@@ -0,0 +1,37 @@
+import numpy as np
+
+from tta import MAX_VIEWS, TTAPredictor, aggregate_logits, build_views, predict_tta
+
+def test_identity_and_flip_views(images):
+    views = build_views(images[:2], n_views=2).reshape(2, 2, 64, 64, 3)
+    np.testing.assert_allclose(views[:, 0], images[:2], rtol=1e-5, atol=1e-3)
+    np.testing.assert_allclose(views[:, 1], images[:2, :, ::-1], rtol=1e-5, atol=1e-3)
+
+def test_aggregate_is_per_image_mean():
+    logits = np.arange(12, dtype=np.float32).reshape(4, 3)
+    np.testing.assert_allclose(aggregate_logits(logits, 2, 2), [[1.5, 2.5, 3.5], [7.5, 8.5, 9.5]])
+
+def test_predict_tta_is_one_model_call(images, stub_model):
+    calls = []
+
+    def predict(batch):
+        calls.append(len(batch))
+        return stub_model(batch)
+
+    logits = predict_tta(predict, images[:3], n_views=4)
+    assert logits.shape == (3, stub_model.num_classes)
+    assert calls == [12]
+    np.testing.assert_allclose(predict_tta(stub_model, images[:3], n_views=1), stub_model(images[:3]), rtol=1e-5)
+
+def test_predictor_uses_all_views_without_budget(images, stub_model):
+    predictor = TTAPredictor(stub_model, max_views=4)
+    logits, views = predictor(images[:2])
+    assert views == 4
+    np.testing.assert_allclose(logits, predict_tta(stub_model, images[:2], 4), rtol=1e-5)
+
+def test_latency_budget_limits_views(images, stub_model):
+    predictor = TTAPredictor(stub_model, max_views=MAX_VIEWS, latency_budget_ms=1e-9)
+    _, first = predictor(images[:1])
+    assert first == max(1, MAX_VIEWS // 2)
+    _, second = predictor(images[:1])
+    assert second == 1
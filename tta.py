@@ -0,0 +1,123 @@
+import threading
+import time
+from functools import lru_cache
+
+import numpy as np
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# TEST-TIME AUGMENTATION (TTA) TERVEKTORISASI
+# ═══════════════════════════════════════════════════════════════════════════════
+# Setiap view = satu kotak sampling di koordinat ternormalisasi (y0, x0, y1, x1) pada
+# input 64x64. Flip cukup dengan membalik koordinat (x0 > x1), crop = kotak lebih kecil,
+# zoom-out = kotak lebih besar (tepi di-clamp). Semua view untuk semua gambar dibentuk
+# dengan satu gather bilinear NumPy -> satu batch (N*V, 64, 64, 3) -> satu panggilan model,
+# lalu logits dirata-rata per gambar.
+# Urutan TTA_VIEWS = prioritas: dengan anggaran latensi kecil hanya view awal yang dipakai.
+
+TTA_VIEWS = [
+    ("identity", (0.0, 0.0, 1.0, 1.0)),
+    ("hflip", (0.0, 1.0, 1.0, 0.0)),
+    ("center90", (0.05, 0.05, 0.95, 0.95)),
+    ("center90_hflip", (0.05, 0.95, 0.95, 0.05)),
+    ("crop85_tl", (0.0, 0.0, 0.85, 0.85)),
+    ("crop85_br", (0.15, 0.15, 1.0, 1.0)),
+    ("crop85_tr_hflip", (0.0, 1.0, 0.85, 0.15)),
+    ("zoom_out110", (-0.05, -0.05, 1.05, 1.05)),
+]
+MAX_VIEWS = len(TTA_VIEWS)
+
+@lru_cache(maxsize=32)
+def _sample_grid(n_views: int, height: int, width: int):
+    # V view pertama -> 4 indeks piksel datar + bobot bilinear per titik sampel (V*H*W);
+    # di-cache per ukuran, dipakai untuk semua gambar dalam batch.
+    boxes = np.asarray([box for _, box in TTA_VIEWS[:n_views]], dtype=np.float32)
+    ty = (np.arange(height, dtype=np.float32) + 0.5) / height
+    tx = (np.arange(width, dtype=np.float32) + 0.5) / width
+    ys = (boxes[:, 0:1] + (boxes[:, 2:3] - boxes[:, 0:1]) * ty) * height - 0.5
+    xs = (boxes[:, 1:2] + (boxes[:, 3:4] - boxes[:, 1:2]) * tx) * width - 0.5
+    ys = np.clip(ys, 0, height - 1)[:, :, None]
+    xs = np.clip(xs, 0, width - 1)[:, None, :]
+    y0 = np.floor(ys).astype(np.intp)
+    x0 = np.floor(xs).astype(np.intp)
+    y1 = np.minimum(y0 + 1, height - 1)
+    x1 = np.minimum(x0 + 1, width - 1)
+    wy, wx = ys - y0, xs - x0
+    shape = (boxes.shape[0], height, width)
+    indices = [np.broadcast_to(y * width + x, shape).ravel() for y, x in ((y0, x0), (y0, x1), (y1, x0), (y1, x1))]
+    weights = [np.broadcast_to(w, shape).reshape(-1, 1).astype(np.float32)
+               for w in ((1 - wy) * (1 - wx), (1 - wy) * wx, wy * (1 - wx), wy * wx)]
+    return indices, weights
+
+def build_views(batch: np.ndarray, n_views: int = MAX_VIEWS, out: np.ndarray = None) -> np.ndarray:
+    # (N, H, W, C) -> (N * V, H, W, C), urutan [gambar0 view0..V-1, gambar1 view0.., ...].
+    batch = np.asarray(batch, dtype=np.float32)
+    n, h, w, c = batch.shape
+    n_views = max(1, min(int(n_views), MAX_VIEWS))
+    indices, weights = _sample_grid(n_views, h, w)
+
+    # Layout (H*W, N*C): tiap gather menyalin satu baris kontigu berisi piksel itu untuk semua
+    # gambar, jadi 4 gather (satu per tetangga bilinear) melayani semua gambar & view sekaligus.
+    flat = np.ascontiguousarray(batch.transpose(1, 2, 0, 3)).reshape(h * w, n * c)
+    acc = np.take(flat, indices[0], axis=0)
+    acc *= weights[0]
+    for idx, weight in zip(indices[1:], weights[1:]):
+        acc += np.take(flat, idx, axis=0) * weight
+
+    if out is None:
+        out = np.empty((n * n_views, h, w, c), dtype=np.float32)
+    out.reshape(n, n_views, h, w, c)[...] = acc.reshape(n_views, h, w, n, c).transpose(3, 0, 1, 2, 4)
+    return out
+
+def aggregate_logits(logits, n_images: int, n_views: int) -> np.ndarray:
+    # Rata-rata logits per gambar (geometric mean probabilitas, lebih stabil daripada voting).
+    logits = np.asarray(logits, dtype=np.float32)
+    return logits.reshape(n_images, n_views, -1).mean(axis=1)
+
+def predict_tta(predict_fn, batch: np.ndarray, n_views: int = MAX_VIEWS) -> np.ndarray:
+    batch = np.asarray(batch, dtype=np.float32)
+    n_views = max(1, min(int(n_views), MAX_VIEWS))
+    if n_views == 1:
+        return np.asarray(predict_fn(batch), dtype=np.float32)
+    views = build_views(batch, n_views)
+    return aggregate_logits(predict_fn(views), batch.shape[0], n_views)
+
+class TTAPredictor:
+    # Jumlah view dipilih per panggilan supaya perkiraan latensi <= latency_budget_ms.
+    # Perkiraan = biaya per baris (EMA dari panggilan sebelumnya) x jumlah baris.
+    # Satu instance dipakai bersama banyak thread/sesi, jadi jumlah view yang dipakai dikembalikan
+    # per panggilan, bukan disimpan di atribut yang bisa ditimpa panggilan lain.
+    def __init__(self, predict_fn, max_views: int = MAX_VIEWS, latency_budget_ms: float = None, smoothing: float = 0.3):
+        self.predict_fn = predict_fn
+        self.max_views = max(1, min(int(max_views), MAX_VIEWS))
+        self.latency_budget_ms = latency_budget_ms
+        self.smoothing = smoothing
+        self._ms_per_row = None
+        self._lock = threading.Lock()
+
+    def views_for(self, n_images: int) -> int:
+        if not self.latency_budget_ms:
+            return self.max_views
+        with self._lock:
+            ms_per_row = self._ms_per_row
+        if ms_per_row is None:
+            # Belum ada ukuran: mulai dari separuh, panggilan berikutnya menyesuaikan.
+            return max(1, self.max_views // 2)
+        affordable = int(self.latency_budget_ms / max(ms_per_row * n_images, 1e-6))
+        return max(1, min(self.max_views, affordable))
+
+    def __call__(self, batch: np.ndarray):
+        # -> (logits rata-rata (N, C), jumlah view yang dipakai)
+        batch = np.asarray(batch, dtype=np.float32)
+        n_views = self.views_for(batch.shape[0])
+        started = time.perf_counter()
+        logits = predict_tta(self.predict_fn, batch, n_views)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+
+        rows = batch.shape[0] * n_views
+        with self._lock:
+            sample = elapsed_ms / rows
+            if self._ms_per_row is None:
+                self._ms_per_row = sample
+            else:
+                self._ms_per_row += self.smoothing * (sample - self._ms_per_row)
+        return logits, n_views